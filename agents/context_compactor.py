@@ -0,0 +1,182 @@
+# agents/context_compactor.py
+import ast
+import json
+import logging
+import os
+import re
+import threading
+
+from graph.state import GraphState
+from tools.query_result import QueryResult, ROW_UNITS, render_context
+
+logger = logging.getLogger(__name__)
+
+# --- Context Compaction Settings ---
+# Upper bound on the tokens the data context may take in the response prompt.
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "2000"))
+# Encoding used to count tokens when tiktoken (and its encoding file) is available.
+CONTEXT_TOKENIZER_ENCODING = "cl100k_base"
+# Fallback estimate when no local tokenizer is available.
+CHARS_PER_TOKEN = 4
+
+_TRUNCATION_MARKER = re.compile(r"\n(\[Result truncated: .*\])\s*$")
+
+_encoder = None
+_encoder_loaded = False
+_encoder_lock = threading.Lock()
+
+
+def _get_encoder():
+    """tiktoken encoder, loaded once; None if tiktoken or its encoding file is unavailable."""
+    global _encoder, _encoder_loaded
+    with _encoder_lock:
+        if not _encoder_loaded:
+            _encoder_loaded = True
+            try:
+                import tiktoken
+                _encoder = tiktoken.get_encoding(CONTEXT_TOKENIZER_ENCODING)
+            except Exception as e:
+                logger.warning("tiktoken unavailable (%s); estimating tokens as characters / %s.",
+                               type(e).__name__, CHARS_PER_TOKEN)
+        return _encoder
+
+
+def count_tokens(text: str) -> int:
+    encoder = _get_encoder()
+    if encoder is not None:
+        return len(encoder.encode(text, disallowed_special=()))
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _is_empty(value) -> bool:
+    return value is None or value == "" or value == [] or value == {}
+
+
+def _cell(value) -> str:
+    if isinstance(value, str):
+        return value
+    return json.dumps(value, default=str, ensure_ascii=False)
+
+
+def _compact_lines(rows: list, columns: list = None) -> tuple:
+    """
+    Turns result rows into (header lines, one line per row):
+    tuples become pipe-separated lines under a column-name header (when known),
+    dicts become JSON lines without empty fields, and fields that have the same
+    value in every row are stated once.
+    Duplicate rows are collapsed with a count.
+    """
+    header = []
+    if columns and rows and all(isinstance(row, (tuple, list)) for row in rows):
+        header.append(" | ".join(columns))
+    if len(rows) > 1 and all(isinstance(row, dict) for row in rows):
+        shared = {key: value for key, value in rows[0].items()
+                  if not _is_empty(value) and all(row.get(key) == value for row in rows[1:])}
+        if shared:
+            header.append(f"All rows: {_cell(shared)}")
+            rows = [{k: v for k, v in row.items() if k not in shared} for row in rows]
+
+    lines = []
+    counts = {}
+    for row in rows:
+        if isinstance(row, dict):
+            line = _cell({k: v for k, v in row.items() if not _is_empty(v)})
+        elif isinstance(row, (tuple, list)):
+            line = " | ".join(_cell(value) for value in row)
+        else:
+            line = _cell(row)
+        if line in counts:
+            counts[line] += 1
+        else:
+            counts[line] = 1
+            lines.append(line)
+    lines = [f"{line}  (x{counts[line]})" if counts[line] > 1 else line for line in lines]
+    return header, lines
+
+
+def _fit_to_budget(header: list, lines: list, notes: list, budget: int) -> str:
+    """Keeps the first rows that fit the budget and says how many were left out."""
+    fixed_tokens = sum(count_tokens(line) + 1 for line in header + notes) + 20
+    kept = []
+    used = fixed_tokens
+    for line in lines:
+        cost = count_tokens(line) + 1
+        if used + cost > budget and kept:
+            break
+        kept.append(line)
+        used += cost
+    omitted = len(lines) - len(kept)
+    if omitted:
+        notes = notes + [f"[{omitted} more rows omitted to fit the context budget; answer from the rows shown.]"]
+    return "\n".join(header + kept + notes)
+
+
+def compact_query_result(result: QueryResult, budget: int = CONTEXT_TOKEN_BUDGET) -> str:
+    """Compact, token-budgeted text for a QueryResult; errors and empty results render as usual."""
+    if result.is_error or result.is_empty:
+        return result.to_text()
+    notes = []
+    if result.truncated:
+        notes.append(f"[Result truncated: showing the first {len(result.rows)} of {result.count} "
+                     f"{ROW_UNITS.get(result.data_source, 'rows')}.]")
+    header, lines = _compact_lines(result.rows, result.columns)
+    return _fit_to_budget(header, lines, notes, budget)
+
+
+def compact_context_text(context, budget: int = CONTEXT_TOKEN_BUDGET) -> str:
+    """
+    Compact, token-budgeted form of a tool's output. Anything that is not a list of
+    rows (errors, 'No documents found' messages) is passed through, cut only if it
+    exceeds the budget on its own.
+    """
+    if isinstance(context, QueryResult):
+        return compact_query_result(context, budget)
+    text = context if isinstance(context, str) else str(context)
+    notes = []
+    marker = _TRUNCATION_MARKER.search(text)
+    if marker:
+        notes.append(marker.group(1))
+        text = text[:marker.start()]
+
+    try:
+        rows = ast.literal_eval(text) if isinstance(context, str) else context
+    except (ValueError, SyntaxError, MemoryError, RecursionError):
+        rows = None
+
+    if not isinstance(rows, list) or not rows:
+        if count_tokens(text) <= budget:
+            return context if isinstance(context, str) else text
+        return text[:budget * CHARS_PER_TOKEN] + "\n[Context cut to fit the context budget.]"
+
+    header, lines = _compact_lines(rows)
+    return _fit_to_budget(header, lines, notes, budget)
+
+
+# --- Context Compaction Node ---
+def compact_context(state: GraphState) -> GraphState:
+    """
+    Sits between query execution and response generation: stores a compact,
+    budget-bounded version of state['context'] (a QueryResult) in state['compacted_context']
+    for the response prompt and reports the compression ratio for the turn.
+    """
+    logger.info("---COMPACTING CONTEXT---")
+    context = state.get("context")
+    if context is None or state.get("error"):
+        state["compacted_context"] = None
+        state["context_stats"] = None
+        return state
+
+    original_text = render_context(context)
+    compacted = compact_context_text(context)
+    original_tokens = count_tokens(original_text)
+    compacted_tokens = count_tokens(compacted)
+    state["compacted_context"] = compacted
+    state["context_stats"] = {
+        "original_tokens": original_tokens,
+        "compacted_tokens": compacted_tokens,
+        "compression_ratio": round(original_tokens / compacted_tokens, 2) if compacted_tokens else 1.0,
+        "token_budget": CONTEXT_TOKEN_BUDGET,
+    }
+    logger.info("Context compacted: %s -> %s tokens (ratio %sx, budget %s).", original_tokens, compacted_tokens,
+                state["context_stats"]["compression_ratio"], CONTEXT_TOKEN_BUDGET)
+    return state
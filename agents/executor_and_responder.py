@@ -1,24 +1,79 @@
 # agents/executor_and_responder.py
+import asyncio
+import logging
+import time
+
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser as StringOutputParser
-from langchain_together import ChatTogether
 
 from graph.state import GraphState
-from config import LLM_MODEL, TOGETHER_API_KEY
-from tools.db_tools import run_sqlite_query, run_mongodb_query, run_meilisearch_query, run_neo4j_query
+from agents.llm_registry import get_llm
+from agents.query_cache import query_cache
+from agents.route_stats import route_stats
+from agents.template_responder import template_response
+from agents.response_streaming import RESPONSE_STREAM_TAG, stream_response, astream_response
+from graph.telemetry import set_span_attribute, span_timer
+from tools.db_tools import QUERY_EXECUTORS
+from tools.async_db_tools import ASYNC_QUERY_EXECUTORS
+from tools.query_guard import GUARD_REJECT, GUARD_RUN, check_query
+from tools.query_result import QueryResult, ERROR_REJECTED, ERROR_TIMEOUT, render_context
+from tools.query_timeouts import can_refine_after_timeout, query_timeout, timeout_stats
+from tools.result_cache import result_cache
+
+logger = logging.getLogger(__name__)
 
 # --- Initialize the LLM ---
-llm = ChatTogether(
-    model=LLM_MODEL,
-    together_api_key=TOGETHER_API_KEY
-)
+llm = get_llm() # Shared client with a persistent HTTP session
+
+def _guarded_query(data_source: str, verdict):
+    """The query to run after the pre-flight plan check, or a rejection to send to the refiner."""
+    if verdict.action != GUARD_RUN:
+        set_span_attribute("query_guard", verdict.action)
+    if verdict.action == GUARD_REJECT:
+        return None, QueryResult.failure(data_source, ERROR_REJECTED, verdict.feedback())
+    return verdict.query, None
+
+def run_tool_with_cache(data_source: str, generated_q: str, deadline: float = None) -> QueryResult:
+    """
+    Runs the query on the backend, serving repeated (data_source, query) pairs
+    from the result cache. Errors are never cached. Queries that miss the cache
+    are checked by the query guard first (tools/query_guard.py), and may run for
+    the backend's time limit or until the turn `deadline`, whichever is shorter.
+    """
+    cached_result = result_cache.get(data_source, generated_q)
+    if isinstance(cached_result, QueryResult): # Entries from older versions (plain strings) are ignored
+        logger.info("Result cache hit for %s. Skipping database round trip.", data_source)
+        return cached_result
+    query_to_run, rejection = _guarded_query(data_source, check_query(data_source, generated_q))
+    if rejection is not None:
+        return rejection
+    result = QUERY_EXECUTORS[data_source](query_to_run, timeout=query_timeout(data_source, deadline))
+    if not result.is_error:
+        result_cache.put(data_source, generated_q, result)
+    return result
+
+async def arun_tool_with_cache(data_source: str, generated_q: str, deadline: float = None) -> QueryResult:
+    """Async version of run_tool_with_cache."""
+    cached_result = result_cache.get(data_source, generated_q)
+    if isinstance(cached_result, QueryResult):
+        logger.info("Result cache hit for %s. Skipping database round trip.", data_source)
+        return cached_result
+    # The plan check uses the sync drivers; keep it off the event loop.
+    verdict = await asyncio.to_thread(check_query, data_source, generated_q)
+    query_to_run, rejection = _guarded_query(data_source, verdict)
+    if rejection is not None:
+        return rejection
+    result = await ASYNC_QUERY_EXECUTORS[data_source](query_to_run, timeout=query_timeout(data_source, deadline))
+    if not result.is_error:
+        result_cache.put(data_source, generated_q, result)
+    return result
 
 # --- Query Execution Node ---
-def execute_query(state: GraphState) -> GraphState:
+def _begin_execution(state: GraphState):
     """
-    Executes the generated query and sets flags for refinement if results are not satisfactory.
+    Bookkeeping shared by the sync and async executors before the tool runs.
+    Returns (error carried over from earlier steps, whether a tool should run).
     """
-    print("---EXECUTING QUERY---")
     generated_q = state.get("generated_query")
     data_source = state.get("data_source")
     
@@ -28,136 +83,236 @@ def execute_query(state: GraphState) -> GraphState:
     # The first generated query (before any refinement attempts)
     state["initial_generated_query"] = state.get("initial_generated_query") or generated_q
     
-    current_context = "" 
     current_error = state.get("error") # Preserve error from previous steps if any
-    needs_refinement_flag = False # MODIFIED: Default to False
 
     # Increment attempt count if it exists, otherwise initialize to 1
     attempt_num = state.get("refinement_attempt_count", 0) + 1 # MODIFIED: Start from 0, so first try is 1
     state["refinement_attempt_count"] = attempt_num
     
-    print(f"Query execution attempt: {attempt_num}")
-    print(f"Query for {data_source}: {generated_q}")
+    logger.info("Query execution attempt: %s", attempt_num)
+    logger.debug("Query for %s: %s", data_source, generated_q)
 
     if not generated_q and data_source not in ["end", "general"]:
         err_msg = f"No query was generated for data source: {data_source}."
-        print(err_msg)
+        logger.warning("%s", err_msg)
         state["error"] = current_error or err_msg 
-    elif data_source == 'sqlite':
-        current_context = run_sqlite_query.invoke(generated_q)
-    elif data_source == 'mongodb':
-        current_context = run_mongodb_query.invoke(generated_q)
-    elif data_source == 'meilisearch': 
-        current_context = run_meilisearch_query.invoke(generated_q)
-    elif data_source == 'neo4j': 
-        current_context = run_neo4j_query.invoke(generated_q)
+    elif data_source in QUERY_EXECUTORS:
+        return current_error, True
     elif data_source in ["end", "general"]:
-        print(f"Execution skipped as data_source is '{data_source}'. Prior error (if any): {current_error}")
+        logger.info("Execution skipped as data_source is '%s'. Prior error (if any): %s", data_source, current_error)
     else:
         err_msg = f"Unknown data_source type for query execution: {data_source}"
-        print(err_msg)
+        logger.warning("%s", err_msg)
         state["error"] = current_error or err_msg
 
-    print(f"Raw context from tool: '{current_context}', type: {type(current_context)}")
+    return current_error, False
+
+def _finish_execution(state: GraphState, result: QueryResult, current_error) -> GraphState:
+    """Classifies the QueryResult and sets context, error and the refinement flag."""
+    generated_q = state.get("generated_query")
+    data_source = state.get("data_source")
 
-    is_empty_or_no_results = False
-    # Check if context indicates an error or "not found" from the tool itself
-    if isinstance(current_context, str) and \
-       ("An error occurred" in current_context or \
-        "Failed to parse" in current_context or \
-        "Connection Error" in current_context):
+    needs_refinement_flag = False # MODIFIED: Default to False
+    if result is None:
+        # No query was run (missing query or unknown data source); the error is already set
+        state["context"] = None
+        state["needs_query_refinement"] = False
+        logger.warning("Error state after execution: %s", state.get('error'))
+        return state
+
+    logger.info("Query result from %s: %s of %s rows, error_kind=%s, %s ms",
+                data_source, len(result.rows), result.count, result.error_kind, result.elapsed_ms)
+
+    state["context"] = result
+    MAX_REFINEMENT_ATTEMPTS = 1 # Allow 1 refinement, so total 2 attempts (initial + 1 refined)
+    if result.error_kind == ERROR_TIMEOUT:
+        timeout_stats.record(data_source)
+    if result.error_kind in (ERROR_REJECTED, ERROR_TIMEOUT):
+        # Too expensive: rejected by the query guard, or stopped at its time limit. The refiner gets
+        # the reason (and the plan) in result.error, if attempts and the turn's time budget allow.
+        if state["refinement_attempt_count"] <= MAX_REFINEMENT_ATTEMPTS and \
+                (result.error_kind == ERROR_REJECTED or can_refine_after_timeout(state.get("turn_deadline"))):
+            logger.info("Query for %s was too expensive (%s). Flagging for refinement.", data_source, result.error_kind)
+            needs_refinement_flag = True
+            state["last_failed_query"] = generated_q
+            state["error"] = None
+        else:
+            logger.warning("Query for %s was too expensive (%s); no refinement left: %s",
+                           data_source, result.error_kind, result.error)
+            state["error"] = current_error or result.error
+    elif result.is_error:
         # This is a hard error from the tool, not just empty results
-        print(f"Tool execution resulted in an error: {current_context}")
-        state["error"] = current_error or current_context # Prioritize existing error
-        state["context"] = f"Error during query execution: {current_context}"
+        logger.warning("Tool execution resulted in an error: %s", result.error)
+        state["error"] = current_error or result.error # Prioritize existing error
         needs_refinement_flag = False # Do not refine on hard execution errors
-    elif isinstance(current_context, str) and \
-         (current_context.strip() == "[]" or \
-          "No documents found" in current_context or \
-          "No records found" in current_context):
-        print("Query returned no results or an empty list string.")
-        is_empty_or_no_results = True
-    elif isinstance(current_context, list) and not current_context: # Actual empty list
-        print("Query returned an actual empty list.")
-        is_empty_or_no_results = True
-    
-    # MODIFIED: Logic for setting refinement flag
-    # Allow only one refinement attempt for now (attempt_num == 1 means this is the first try)
-    MAX_REFINEMENT_ATTEMPTS = 1 # Allow 1 refinement, so total 2 attempts (initial + 1 refined)
-    if is_empty_or_no_results and attempt_num <= MAX_REFINEMENT_ATTEMPTS:
-        print(f"Query for {data_source} yielded no results. Flagging for refinement (attempt {attempt_num}).")
-        needs_refinement_flag = True
-        state["last_failed_query"] = generated_q # Store the query that just failed
-        state["context"] = "[]" # Set context to empty list for now
-        # Error from previous steps is preserved or cleared if we are attempting refinement
-        state["error"] = None if needs_refinement_flag else current_error
-    elif is_empty_or_no_results and attempt_num > MAX_REFINEMENT_ATTEMPTS:
-        print("Max refinement attempts reached. Proceeding with empty/no results.")
-        state["context"] = "[]"
-        state["error"] = current_error or "Query and its refinement(s) returned no results."
-    elif state.get("error"): # If a hard error was already set (and not cleared for refinement)
-        state["context"] = state.get("context") or f"Error during query execution: {state.get('error')}"
+    elif result.is_empty:
+        logger.info("Query returned no results.")
+        # MODIFIED: Logic for setting refinement flag
+        # Allow only one refinement attempt for now (attempt_num == 1 means this is the first try)
+        attempt_num = state["refinement_attempt_count"]
+        if attempt_num <= MAX_REFINEMENT_ATTEMPTS:
+            logger.info("Query for %s yielded no results. Flagging for refinement (attempt %s).", data_source, attempt_num)
+            needs_refinement_flag = True
+            state["last_failed_query"] = generated_q # Store the query that just failed
+            state["error"] = None # Errors from previous steps are cleared while we attempt refinement
+        else:
+            logger.info("Max refinement attempts reached. Proceeding with empty/no results.")
+            state["error"] = current_error or "Query and its refinement(s) returned no results."
     else: # Successful execution with data
-        state["context"] = current_context
         state["error"] = None # Clear any previous soft errors if we have good context now
+        # Remember the final working query (possibly refined) for repeat questions
+        query_cache.store(data_source, state["query"], generated_q)
         
     state["needs_query_refinement"] = needs_refinement_flag
+    if state.get("route_path") and state["refinement_attempt_count"] == 1:
+        # How often an LLM-routed turn's first query returns rows, per route path
+        route_stats.record_outcome(state["route_path"], "error" if result.is_error else "empty" if result.is_empty else "rows")
 
-    print(f"Final context for this step: {state.get('context')}")
-    print(f"Needs query refinement: {state.get('needs_query_refinement')}")
+    if logger.isEnabledFor(logging.DEBUG): # Rendering a large result is not free
+        logger.debug("Final context for this step: %s", result.to_text()[:500])
+    logger.debug("Needs query refinement: %s", state.get('needs_query_refinement'))
     if state.get("error"):
-        print(f"Error state after execution: {state['error']}")
+        logger.warning("Error state after execution: %s", state['error'])
     
     return state
 
-# ... (generate_response function remains the same for now) ...
-def generate_response(state: GraphState) -> GraphState:
+def execute_query(state: GraphState) -> GraphState:
     """
-    Generates a natural language response to the user based on the retrieved context.
+    Executes the generated query and sets flags for refinement if results are not satisfactory.
     """
-    print("---GENERATING RESPONSE---")
-    user_query = state["query"]
-    # Use state.get("context") in case 'context' was never set (though execute_query should always set it)
-    context_from_db = state.get("context", "[]") # Default to empty list string if not found
+    logger.info("---EXECUTING QUERY---")
+    current_error, run_tool = _begin_execution(state)
+    result = None
+    if run_tool:
+        with span_timer("db"):
+            result = run_tool_with_cache(state["data_source"], state["generated_query"], state.get("turn_deadline"))
+    return _finish_execution(state, result, current_error)
+
+async def aexecute_query(state: GraphState) -> GraphState:
+    """
+    Async version of execute_query; the database call goes through the async drivers.
+    """
+    logger.info("---EXECUTING QUERY (async)---")
+    current_error, run_tool = _begin_execution(state)
+    result = None
+    if run_tool:
+        with span_timer("db"):
+            result = await arun_tool_with_cache(state["data_source"], state["generated_query"], state.get("turn_deadline"))
+    return _finish_execution(state, result, current_error)
+
+# --- Response Generation Node ---
+RESPONSE_PROMPT = ChatPromptTemplate.from_template(
+    """
+    You are a helpful AI assistant. Your task is to answer the user's original question based on the data context provided below.
+    The context is the output of a database query, usually one result row per line (pipe-separated values or a JSON object; an "All rows:" line lists values shared by every row). It might also be an empty list string like '[]', or a string indicating an error or "No documents found".
 
-    # If an error occurred in a previous step, reflect that in the response
+    **Original Question:**
+    {question}
+
+    **Data Context from Database:**
+    {context}
+
+    **Instructions for your response:**
+    - If the context contains data (i.e., it's not an empty list string like '[]' and not a 'No documents found' message or an error message):
+        - Formulate a clear and direct answer from this data.
+        - If the context is a list of items (e.g., multiple tickets, multiple papers), try to present each item clearly, perhaps as a bullet point, highlighting key information from each item.
+        - If the context ends with a "[Result truncated: showing the first N of M ...]" note, answer from the items shown and mention that only N of the M matching items are listed.
+    - If the context is an empty list string '[]', or explicitly states "No documents found", or indicates an error during query execution:
+        - Politely inform the user that the requested information could not be found in the database.
+        - Do NOT provide any examples, hypothetical scenarios, or additional information beyond stating that the data was not found or an error occurred.
+    - If the original question was very general and the context is empty or indicates 'general query' (and no other specific data source error occurred):
+        - You can say: "I can only answer questions about employees, projects, research papers, or support tickets. How can I help you with those?"
+    
+    **Your Answer:**
+    """
+)
+
+def _response_context(state: GraphState):
+    """The context shown to the response LLM: the compacted form when available."""
+    compacted = state.get("compacted_context")
+    if compacted is not None:
+        return compacted
+    return render_context(state.get("context")) # Rendered to text only here, at the prompt
+
+def _error_response(state: GraphState):
+    """
+    If an error occurred in a previous step, returns the state with an error response
+    instead of asking the LLM to answer from error-laden context. Otherwise None.
+    """
     error_message = state.get("error")
     if error_message and "Query is general" not in error_message : # Don't make general query errors too verbose
         # If a significant error happened, we inform the user about that instead of trying to answer
         # based on potentially empty or error-laden context.
         final_response_text = f"I encountered an issue trying to process your request. Error: {error_message}"
-        print(f"Error flagged, generating error response: {final_response_text}")
+        logger.warning("Error flagged, generating error response: %s", final_response_text)
         state["response"] = final_response_text
         return state
+    return None
 
-    prompt = ChatPromptTemplate.from_template(
-        """
-        You are a helpful AI assistant. Your task is to answer the user's original question based on the data context provided below.
-        The context is the direct output from a database query. It might be a list of tuples, a list of dictionaries, an empty list string like '[]', or a string indicating an error or "No documents found".
-
-        **Original Question:**
-        {question}
-
-        **Data Context from Database:**
-        {context}
-
-        **Instructions for your response:**
-        - If the context contains data (i.e., it's not an empty list string like '[]' and not a 'No documents found' message or an error message):
-            - Formulate a clear and direct answer from this data.
-            - If the context is a list of items (e.g., multiple tickets, multiple papers), try to present each item clearly, perhaps as a bullet point, highlighting key information from each item.
-        - If the context is an empty list string '[]', or explicitly states "No documents found", or indicates an error during query execution:
-            - Politely inform the user that the requested information could not be found in the database.
-            - Do NOT provide any examples, hypothetical scenarios, or additional information beyond stating that the data was not found or an error occurred.
-        - If the original question was very general and the context is empty or indicates 'general query' (and no other specific data source error occurred):
-            - You can say: "I can only answer questions about employees, projects, research papers, or support tickets. How can I help you with those?"
-        
-        **Your Answer:**
-        """
-    )
+def _template_state(state: GraphState, started_at: float):
+    """
+    Small, simple results are answered from a template without the response LLM
+    (agents/template_responder.py). Returns the answered state, or None.
+    """
+    response = template_response(state.get("context"))
+    if response is None:
+        return None
+    logger.info("Answered from a template; response LLM skipped.")
+    logger.debug("Final Response: %s", response)
+    state["response"] = response
+    state["response_metrics"] = {"time_to_first_token_ms": None,
+                                 "total_ms": round((time.perf_counter() - started_at) * 1000, 1), "template": True}
+    return state
+
+def _response_chain():
+    # The tag lets TokenStreamHandler tell answer tokens apart from other LLM calls.
+    return RESPONSE_PROMPT | llm.with_config(tags=[RESPONSE_STREAM_TAG]) | StringOutputParser()
 
-    response_chain = prompt | llm | StringOutputParser()
-    response = response_chain.invoke({"question": user_query, "context": context_from_db})
+def generate_response(state: GraphState) -> GraphState:
+    """
+    Generates a natural language response to the user based on the retrieved context.
+    """
+    logger.info("---GENERATING RESPONSE---")
+    started_at = time.perf_counter()
+    user_query = state["query"]
+    # Prefer the token-budgeted context from the compaction node; fall back to the raw tool output
+    context_from_db = _response_context(state)
+
+    error_state = _error_response(state)
+    if error_state is not None:
+        return error_state
+    template_state = _template_state(state, started_at)
+    if template_state is not None:
+        return template_state
+
+    # Streamed so callers can show tokens as they arrive (see agents/response_streaming.py)
+    response, metrics = stream_response(_response_chain(), {"question": user_query, "context": context_from_db})
     
-    print(f"Final Response: {response}")
+    logger.debug("Final Response: %s", response)
+    logger.info("Response timing: first token after %s ms, total %s ms",
+                metrics["time_to_first_token_ms"], metrics["total_ms"])
     state["response"] = response
-    return state
\ No newline at end of file
+    state["response_metrics"] = metrics
+    return state
+
+async def agenerate_response(state: GraphState) -> GraphState:
+    """
+    Async version of generate_response.
+    """
+    logger.info("---GENERATING RESPONSE (async)---")
+    started_at = time.perf_counter()
+    error_state = _error_response(state)
+    if error_state is not None:
+        return error_state
+    template_state = _template_state(state, started_at)
+    if template_state is not None:
+        return template_state
+
+    response, metrics = await astream_response(_response_chain(), {"question": state["query"], "context": _response_context(state)})
+
+    logger.debug("Final Response: %s", response)
+    logger.info("Response timing: first token after %s ms, total %s ms",
+                metrics["time_to_first_token_ms"], metrics["total_ms"])
+    state["response"] = response
+    state["response_metrics"] = metrics
+    return state
@@ -0,0 +1,168 @@
+# agents/fanout.py
+import asyncio
+import contextvars
+import logging
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from graph.state import GraphState
+from agents.query_generator import generate_query, agenerate_query
+from agents.executor_and_responder import execute_query, aexecute_query
+from tools.query_result import QueryResult
+
+logger = logging.getLogger(__name__)
+
+# --- Speculative Fan-out Settings ---
+# Off by default: each extra branch costs one query-generation LLM call and one database query.
+FANOUT_ENABLED = os.getenv("FANOUT_ENABLED", "0") == "1"
+# Maximum number of backends tried in parallel for one question.
+FANOUT_TOP_K = int(os.getenv("FANOUT_TOP_K", "2"))
+
+DATABASE_SOURCES = ("sqlite", "mongodb", "meilisearch", "neo4j")
+
+# Branch fields copied into the graph state when a branch wins.
+BRANCH_FIELDS = ("data_source", "generated_query", "context", "error", "needs_query_refinement",
+                 "refinement_attempt_count", "initial_generated_query", "last_failed_query")
+
+# Shared by all turns; losing branches cannot be interrupted mid-call, so they finish here in the background.
+_branch_executor = ThreadPoolExecutor(max_workers=FANOUT_TOP_K * 4, thread_name_prefix="fanout")
+
+
+def fanout_candidates(state: GraphState) -> list:
+    """
+    Backends to try in parallel: the router's own pick first (if it chose one),
+    then the backends the routing rules found evidence for, up to FANOUT_TOP_K.
+    """
+    candidates = []
+    if state.get("data_source") in DATABASE_SOURCES:
+        candidates.append(state["data_source"])
+    for data_source in state.get("candidate_data_sources") or []:
+        if data_source in DATABASE_SOURCES and data_source not in candidates:
+            candidates.append(data_source)
+    return candidates[:FANOUT_TOP_K]
+
+
+def should_fan_out(state: GraphState) -> bool:
+    """
+    True for low-confidence routes that have somewhere to fan out to: a general
+    question with at least one rule candidate, or a backend pick the rules disagree with.
+    """
+    if not FANOUT_ENABLED or state.get("route_confidence") != "low":
+        return False
+    candidates = fanout_candidates(state)
+    if state.get("data_source") == "clarification_needed":
+        return len(candidates) >= 1
+    return len(candidates) >= 2
+
+
+def _branch_state(state: GraphState, data_source: str) -> GraphState:
+    return {**state, "data_source": data_source, "generated_query": None, "context": None, "error": None,
+            "needs_query_refinement": False, "refinement_attempt_count": 0,
+            "initial_generated_query": None, "last_failed_query": None, "route_path": None}
+
+
+def _branch_summary(branch_state: GraphState) -> dict:
+    return {field: branch_state.get(field) for field in BRANCH_FIELDS}
+
+
+def branch_has_results(branch: dict) -> bool:
+    result = branch.get("context")
+    return isinstance(result, QueryResult) and not result.is_error and not result.is_empty
+
+
+def _run_branch(branch_state: GraphState, winner_found: threading.Event) -> dict:
+    try:
+        branch_state = generate_query(branch_state)
+        if winner_found.is_set():
+            # Another branch already returned data; don't spend a database query on this one.
+            return {**_branch_summary(branch_state), "error": "Fan-out branch skipped: another branch returned data."}
+        return _branch_summary(execute_query(branch_state))
+    except Exception as e:
+        return {**_branch_summary(branch_state), "error": f"Fan-out branch failed: {e}"}
+
+
+async def _arun_branch(branch_state: GraphState) -> dict:
+    try:
+        return _branch_summary(await aexecute_query(await agenerate_query(branch_state)))
+    except Exception as e:
+        return {**_branch_summary(branch_state), "error": f"Fan-out branch failed: {e}"}
+
+
+# --- Fan-out Node ---
+def fanout_query(state: GraphState) -> GraphState:
+    """
+    Runs query generation + execution for the top candidate backends in parallel and
+    stops waiting as soon as one branch returns data. The merger node picks the result.
+    Threads cannot be preempted: a slower branch whose LLM call is already running finishes
+    that call in the background, but skips its database query once a winner exists.
+    """
+    candidates = fanout_candidates(state)
+    logger.info("---SPECULATIVE FAN-OUT ACROSS: %s---", candidates)
+    winner_found = threading.Event()
+    # Each branch runs in a copy of this context so its LLM and database time land on the fanout span
+    pending = {_branch_executor.submit(contextvars.copy_context().run, _run_branch, _branch_state(state, ds),
+                                       winner_found)
+               for ds in candidates}
+    branches = []
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        branches.extend(future.result() for future in done)
+        if any(branch_has_results(branch) for branch in branches):
+            winner_found.set()
+            break
+    for future in pending:
+        future.cancel() # Not-yet-started branches are dropped; running ones finish unobserved
+    if pending:
+        logger.info("Fan-out: a branch returned data; abandoning %s slower branch(es).", len(pending))
+    state["fanout_branches"] = branches
+    return state
+
+
+async def afanout_query(state: GraphState) -> GraphState:
+    """
+    Async version of fanout_query; slower branches are cancelled once one returns data.
+    """
+    candidates = fanout_candidates(state)
+    logger.info("---SPECULATIVE FAN-OUT ACROSS: %s (async)---", candidates)
+    pending = {asyncio.create_task(_arun_branch(_branch_state(state, ds))) for ds in candidates}
+    branches = []
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            branches.extend(task.result() for task in done)
+            if any(branch_has_results(branch) for branch in branches):
+                break
+    finally:
+        for task in pending:
+            task.cancel()
+    if pending:
+        logger.info("Fan-out: a branch returned data; cancelled %s slower branch(es).", len(pending))
+    state["fanout_branches"] = branches
+    return state
+
+
+# --- Merger Node ---
+def merge_fanout(state: GraphState) -> GraphState:
+    """
+    Keeps the first branch that returned data. If none did, falls back to the router's
+    own pick (so the refiner can still try it), or to the clarification question.
+    """
+    logger.info("---MERGING FAN-OUT BRANCHES---")
+    branches = state.get("fanout_branches") or []
+    winner = next((branch for branch in branches if branch_has_results(branch)), None)
+    if winner is not None:
+        logger.info("Fan-out winner: %s", winner['data_source'])
+        state.update(winner)
+        state["clarification_question_needed"] = False
+        state["clarification_question_text"] = None
+        return state
+
+    routed_branch = next((branch for branch in branches if branch["data_source"] == state.get("data_source")), None)
+    if routed_branch is not None:
+        logger.info("No fan-out branch returned data. Continuing with the router's choice: %s",
+                    routed_branch["data_source"])
+        state.update(routed_branch)
+    else:
+        logger.info("No fan-out branch returned data. Falling back to the clarification question.")
+    return state
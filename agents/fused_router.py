@@ -0,0 +1,208 @@
+# agents/fused_router.py
+#
+# Optional single-call alternative to router -> query_generator: one LLM call returns both
+# the data_source and the query for it, saving one LLM round trip per LLM-routed turn.
+# The prompt reuses the router's category descriptions and the generators' schema notes
+# and few-shot examples. If the answer does not validate, the turn falls back to the
+# two-step path (router LLM call here, then the query_generator node).
+#
+#   FUSED_ROUTING_ENABLED=1   use the fused router as the graph's "router" node
+#
+# Latency and first-query success of both paths are compared in agents/route_stats.py.
+import asyncio
+import json
+import logging
+import os
+import time
+
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.output_parsers import StrOutputParser as StringOutputParser
+
+from graph.state import GraphState
+from graph.telemetry import set_span_attribute, span_timer
+from agents.llm_registry import get_llm
+from agents.query_generator import (
+    SQLITE_RULES, SQLITE_EXAMPLES, MONGODB_RULES, MONGODB_COLLECTION, MONGODB_EXAMPLES,
+    MEILISEARCH_FIELDS, MEILISEARCH_EXAMPLES, NEO4J_SCHEMA, NEO4J_EXAMPLES,
+)
+from agents.route_stats import route_stats
+from agents.router import (
+    CACHEABLE_DECISIONS, ROUTER_CATEGORIES, aroute_with_llm, build_routing_update,
+    extract_json_from_llm_output, route_with_llm, routing_error_values, start_routing,
+    with_route_confidence,
+)
+from agents.routing_cache import routing_cache
+from tools.db_tools import parse_mongodb_query
+from tools.schema_cache import get_cached_schema
+
+logger = logging.getLogger(__name__)
+
+# --- Fused Routing Settings ---
+# Off by default: the longer prompt is only worth it where an LLM round trip costs more than the extra prompt tokens.
+FUSED_ROUTING_ENABLED = os.getenv("FUSED_ROUTING_ENABLED", "0") == "1"
+
+DATABASE_SOURCES = ("sqlite", "mongodb", "meilisearch", "neo4j")
+
+FUSED_PROMPT = ChatPromptTemplate.from_template(
+    """
+    You are an expert routing assistant and database query writer. In a single step, decide which data source
+    answers the user's question and write the query for that data source.
+
+    Here are the available data source categories:""" + ROUTER_CATEGORIES + """
+
+    **sqlite**: a syntactically correct SQLite query.""" + SQLITE_RULES + """
+    Database Schema:
+    {schema}
+    Few-shot Examples:""" + SQLITE_EXAMPLES + """
+
+    **mongodb**: the filter dictionary for a .find() query.""" + MONGODB_RULES + MONGODB_COLLECTION + """
+    Few-shot Examples:""" + MONGODB_EXAMPLES + """
+
+    **meilisearch**: the most relevant keywords or phrases to search the support tickets for.""" + MEILISEARCH_FIELDS + """
+    Few-shot Examples:""" + MEILISEARCH_EXAMPLES + """
+
+    **neo4j**: a Cypher query ending with a semicolon.""" + NEO4J_SCHEMA + """
+    Few-shot Examples:""" + NEO4J_EXAMPLES + """
+
+    Analyze the user's question provided below.
+    User Question: "{query}"
+
+    Respond with a single, raw JSON object with two keys:
+    - "data_source": one of "sqlite", "mongodb", "meilisearch", "neo4j", or "general".
+    - "query": the query for that data source as a string (for mongodb, the filter object itself); an empty string for "general".
+    Do not provide any explanation, preamble, or any text other than the JSON object itself.
+
+    Example for sqlite:
+    User Question: Who is the lead engineer?
+    JSON Response: {{"data_source": "sqlite", "query": "SELECT name FROM employees WHERE LOWER(role) = LOWER('Lead Engineer');"}}
+
+    Example for mongodb:
+    User Question: List papers published in 2024.
+    JSON Response: {{"data_source": "mongodb", "query": {{"year": 2024}}}}
+
+    Example for general:
+    User Question: How are you today?
+    JSON Response: {{"data_source": "general", "query": ""}}
+    """
+)
+
+
+class FusedOutputError(ValueError):
+    """The fused answer cannot be used; `reason` is counted in route_stats' fallback reasons."""
+
+    def __init__(self, reason: str, message: str):
+        super().__init__(message)
+        self.reason = reason
+
+
+def parse_fused_output(raw_llm_output: str) -> tuple:
+    """Validates the fused LLM answer and returns (data_source, query)."""
+    try:
+        decision = json.loads(raw_llm_output.strip())
+    except json.JSONDecodeError:
+        json_string = extract_json_from_llm_output(raw_llm_output)
+        try:
+            decision = json.loads(json_string or "")
+        except json.JSONDecodeError:
+            raise FusedOutputError("no_json", "No JSON object in the fused routing output.")
+    if not isinstance(decision, dict):
+        raise FusedOutputError("no_json", "The fused routing output is not a JSON object.")
+
+    data_source = decision.get("data_source")
+    if data_source not in CACHEABLE_DECISIONS:
+        raise FusedOutputError("unknown_data_source", f"Unexpected data_source value: {data_source}")
+    if data_source == "general":
+        return data_source, ""
+
+    query = decision.get("query")
+    if isinstance(query, dict) and data_source == "mongodb":
+        # A Python literal, as parse_mongodb_query (ast.literal_eval) expects: JSON true/false/null are not
+        query = repr(query)
+    if not isinstance(query, str) or not query.strip():
+        raise FusedOutputError("missing_query", f"No query for data_source '{data_source}'.")
+    query = query.strip()
+    if data_source == "mongodb":
+        try:
+            parse_mongodb_query(query)
+        except (ValueError, SyntaxError) as e:
+            raise FusedOutputError("invalid_mongodb_query", f"Invalid MongoDB query format: {e}")
+    return data_source, query
+
+
+def _fused_prompt_inputs(state: GraphState) -> dict:
+    return {"query": state["query"], "schema": get_cached_schema("sqlite")}
+
+
+def _routed_by_fused_call(current_state_snapshot: GraphState, raw_llm_output: str, llm_ms: float):
+    """The routed state for a valid fused answer, or None when the turn must fall back."""
+    logger.debug("LLM raw output for fused routing: '%s'", raw_llm_output)
+    with span_timer("parse"):
+        try:
+            data_source, query = parse_fused_output(raw_llm_output)
+        except FusedOutputError as e:
+            logger.warning("Fused routing output rejected (%s): %s Falling back to the two-step path.", e.reason, e)
+            route_stats.record_fallback(e.reason)
+            return None
+
+    logger.info("Router decision (fused, query generated in the same call): %s", data_source)
+    route_stats.record_routing("fused", llm_ms)
+    set_span_attribute("route_path", "fused")
+    routing_cache.store(current_state_snapshot["query"], data_source)
+    routed_state = {**current_state_snapshot, **build_routing_update(data_source, current_state_snapshot["query"]),
+                    "route_path": "fused"}
+    if data_source in DATABASE_SOURCES:
+        logger.info("Generated %s query (fused): %s", data_source, query)
+        routed_state["generated_query"] = query
+    return with_route_confidence(routed_state)
+
+
+def fused_route_query(state: GraphState) -> GraphState:
+    """
+    Drop-in replacement for route_query that also fills generated_query, so the graph
+    can go straight to the query executor (see should_route_or_end).
+    """
+    logger.info("---ROUTING AND GENERATING QUERY (fused)---")
+    current_state_snapshot = state.copy()
+    try:
+        current_state_snapshot, finished_state = start_routing(state)
+        if finished_state is not None:
+            return finished_state
+
+        fused_chain = FUSED_PROMPT | get_llm() | StringOutputParser()
+        prompt_inputs = _fused_prompt_inputs(state)
+        started_at = time.perf_counter()
+        raw_llm_output = fused_chain.invoke(prompt_inputs)
+        llm_ms = (time.perf_counter() - started_at) * 1000
+
+        routed_state = _routed_by_fused_call(current_state_snapshot, raw_llm_output, llm_ms)
+        if routed_state is not None:
+            return routed_state
+        return route_with_llm(current_state_snapshot, route_path="fused_fallback", spent_llm_ms=llm_ms)
+
+    except Exception as e: # Same handling as route_query (e.g. connection errors)
+        return {**current_state_snapshot, **routing_error_values(e)}
+
+
+async def afused_route_query(state: GraphState) -> GraphState:
+    """Async version of fused_route_query."""
+    logger.info("---ROUTING AND GENERATING QUERY (fused, async)---")
+    current_state_snapshot = state.copy()
+    try:
+        current_state_snapshot, finished_state = start_routing(state)
+        if finished_state is not None:
+            return finished_state
+
+        fused_chain = FUSED_PROMPT | get_llm() | StringOutputParser()
+        # Reading the SQLite schema for the prompt is blocking; keep it off the event loop.
+        prompt_inputs = await asyncio.to_thread(_fused_prompt_inputs, state)
+        started_at = time.perf_counter()
+        raw_llm_output = await fused_chain.ainvoke(prompt_inputs)
+        llm_ms = (time.perf_counter() - started_at) * 1000
+
+        routed_state = _routed_by_fused_call(current_state_snapshot, raw_llm_output, llm_ms)
+        if routed_state is not None:
+            return routed_state
+        return await aroute_with_llm(current_state_snapshot, route_path="fused_fallback", spent_llm_ms=llm_ms)
+
+    except Exception as e:
+        return {**current_state_snapshot, **routing_error_values(e)}
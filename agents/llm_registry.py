@@ -0,0 +1,91 @@
+# agents/llm_registry.py
+import threading
+
+import httpx
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_together import ChatTogether
+
+from config import LLM_MODEL, TOGETHER_API_KEY
+from graph.telemetry import llm_telemetry_handler
+from agents.llm_replay import with_replay
+
+# --- HTTP Session Settings ---
+LLM_MAX_CONCURRENCY = 8          # Max in-flight requests to Together per client; extra calls wait for a slot
+LLM_KEEPALIVE_CONNECTIONS = 8    # Idle TLS connections kept open for reuse
+LLM_KEEPALIVE_EXPIRY = 120.0     # Seconds an idle keep-alive connection is kept
+LLM_REQUEST_TIMEOUT = 60.0       # Seconds for a single completion request
+LLM_QUEUE_TIMEOUT = 120.0        # Seconds a call may wait for a free slot under the concurrency cap
+
+_clients = {}
+_http_clients = []
+_lock = threading.Lock()
+
+
+def _http_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=LLM_MAX_CONCURRENCY,
+        max_keepalive_connections=LLM_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+    )
+
+
+def _http_timeout() -> httpx.Timeout:
+    return httpx.Timeout(LLM_REQUEST_TIMEOUT, pool=LLM_QUEUE_TIMEOUT)
+
+
+def _build_llm(model: str, settings: dict) -> ChatTogether:
+    # One persistent httpx session per client: connections (and their TLS handshakes)
+    # are reused across turns, and the pool size doubles as the concurrency cap.
+    http_client = httpx.Client(limits=_http_limits(), timeout=_http_timeout())
+    http_async_client = httpx.AsyncClient(limits=_http_limits(), timeout=_http_timeout())
+    _http_clients.extend([http_client, http_async_client])
+    return ChatTogether(
+        model=model,
+        together_api_key=TOGETHER_API_KEY,
+        request_timeout=LLM_REQUEST_TIMEOUT,
+        http_client=http_client,
+        http_async_client=http_async_client,
+        callbacks=[llm_telemetry_handler], # LLM time and token usage per graph node
+        **settings,
+    )
+
+
+def get_llm(model: str = LLM_MODEL, **settings) -> BaseChatModel:
+    """
+    Returns the shared ChatTogether client for `model` and the given settings
+    (e.g. temperature=0). The first call builds it; later calls reuse it.
+    With LLM_REPLAY_MODE set, the client records to / replays from agents/llm_replay.py's store.
+    """
+    key = (model, tuple(sorted(settings.items())))
+    with _lock:
+        llm = _clients.get(key)
+        if llm is None:
+            llm = with_replay(_build_llm(model, settings), model, settings)
+            _clients[key] = llm
+        return llm
+
+
+def close_llm_clients():
+    """Closes the HTTP sessions held by the shared LLM clients. Safe to call more than once."""
+    with _lock:
+        http_clients = list(_http_clients)
+        _http_clients.clear()
+        _clients.clear()
+    for http_client in http_clients:
+        if isinstance(http_client, httpx.Client):
+            http_client.close()
+        # httpx.AsyncClient needs a running loop to close cleanly; its sockets are
+        # released with the process, so there is nothing to do for it here.
+
+
+async def aclose_llm_clients():
+    """Async version of close_llm_clients that also closes the async HTTP sessions."""
+    with _lock:
+        http_clients = list(_http_clients)
+        _http_clients.clear()
+        _clients.clear()
+    for http_client in http_clients:
+        if isinstance(http_client, httpx.AsyncClient):
+            await http_client.aclose()
+        else:
+            http_client.close()
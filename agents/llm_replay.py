@@ -0,0 +1,242 @@
+# agents/llm_replay.py
+#
+# Record/replay layer around the shared LLM clients (agents/llm_registry.py), for
+# deterministic and offline runs. Completions are keyed on (model, rendered prompt hash)
+# and kept in an append-only JSON-lines file.
+#
+#   LLM_REPLAY_MODE=off     call Together as usual (default)
+#   LLM_REPLAY_MODE=record  call Together and store every completion
+#   LLM_REPLAY_MODE=replay  answer from the store only; a prompt that was never recorded fails
+#   LLM_REPLAY_MODE=auto    answer from the store when possible, otherwise call Together and record
+#
+# Replay needs no network, but config.py still requires TOGETHER_API_KEY to be set (any value).
+# Rewrite the store without superseded entries with:  python -m agents.llm_replay compact
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from tools.cache_utils import cache_path, stable_hash
+
+logger = logging.getLogger(__name__)
+
+# --- Replay Settings ---
+LLM_REPLAY_MODE = os.getenv("LLM_REPLAY_MODE", "off")
+LLM_REPLAY_FILE = os.getenv("LLM_REPLAY_FILE") or cache_path("llm_replay.jsonl")
+
+REPLAY_MODES = ("off", "record", "replay", "auto")
+
+
+class LLMReplayMissError(LookupError):
+    """Raised in replay mode for a prompt that has no recorded completion."""
+
+
+class ReplayStore:
+    """
+    Completions by key, loaded from the JSON-lines file and appended to it as they are
+    recorded. A key recorded twice keeps its latest completion; compact() drops the
+    superseded lines.
+    """
+
+    def __init__(self, path: str = LLM_REPLAY_FILE):
+        self.path = path
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+        self._superseded = 0
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                for line_number, line in enumerate(f, 1):
+                    if not line.strip():
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        logger.warning("Skipping unreadable line %s of LLM replay store '%s'.", line_number, self.path)
+                        continue
+                    if entry["key"] in self._entries:
+                        self._superseded += 1
+                    self._entries[entry["key"]] = entry
+        except FileNotFoundError:
+            pass
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry["completion"]
+
+    def put(self, key: str, model: str, prompt_hash: str, completion: str) -> None:
+        entry = {"key": key, "model": model, "prompt_hash": prompt_hash,
+                 "completion": completion, "recorded_at": time.time()}
+        with self._lock:
+            if key in self._entries:
+                self._superseded += 1
+            self._entries[key] = entry
+            self.recorded += 1
+            try:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            except OSError as e:
+                logger.warning("Could not append to LLM replay store '%s': %s", self.path, e)
+
+    def compact(self) -> int:
+        """Rewrites the file with one line per key (via temp file + rename). Returns the lines dropped."""
+        with self._lock:
+            directory = os.path.dirname(self.path) or "."
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".jsonl")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    for entry in self._entries.values():
+                        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            dropped, self._superseded = self._superseded, 0
+            return dropped
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "superseded_lines": self._superseded,
+                    "hits": self.hits, "misses": self.misses, "recorded": self.recorded}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_replay_store() -> ReplayStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ReplayStore()
+        return _store
+
+
+def _render_prompt(messages: List[BaseMessage]) -> str:
+    return "\n".join(f"{message.type}: {message.content}" for message in messages)
+
+
+class ReplayChatModel(BaseChatModel):
+    """
+    Wraps a chat model: completions are served from / recorded to the replay store
+    according to `mode`. The wrapped model is called directly, so callbacks (streaming
+    handlers, telemetry) see one LLM call per request either way.
+    """
+
+    inner: BaseChatModel
+    mode: str = "auto"
+    model_label: str = ""
+
+    @property
+    def _llm_type(self) -> str:
+        return f"replay-{self.inner._llm_type}"
+
+    def _key(self, messages: List[BaseMessage]) -> tuple:
+        prompt_hash = stable_hash(_render_prompt(messages))
+        return stable_hash(self.model_label, prompt_hash), prompt_hash
+
+    def _lookup(self, messages: List[BaseMessage]):
+        """(cached completion or None, key, prompt hash); raises on a miss in replay mode."""
+        key, prompt_hash = self._key(messages)
+        completion = None if self.mode == "record" else get_replay_store().get(key)
+        if completion is None and self.mode == "replay":
+            raise LLMReplayMissError(f"No recorded completion for prompt {prompt_hash} ({self.model_label}). "
+                                     f"Record it first with LLM_REPLAY_MODE=record or auto.")
+        return completion, key, prompt_hash
+
+    def _store(self, key: str, prompt_hash: str, completion: str) -> None:
+        get_replay_store().put(key, self.model_label, prompt_hash, completion)
+
+    @staticmethod
+    def _replayed(completion: str) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=completion))],
+                          llm_output={"replayed": True})
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager=None, **kwargs: Any) -> ChatResult:
+        completion, key, prompt_hash = self._lookup(messages)
+        if completion is not None:
+            return self._replayed(completion)
+        result = self.inner._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        self._store(key, prompt_hash, result.generations[0].message.content)
+        return result
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager=None, **kwargs: Any) -> ChatResult:
+        completion, key, prompt_hash = self._lookup(messages)
+        if completion is not None:
+            return self._replayed(completion)
+        result = await self.inner._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        self._store(key, prompt_hash, result.generations[0].message.content)
+        return result
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager=None, **kwargs: Any):
+        completion, key, prompt_hash = self._lookup(messages)
+        if completion is not None:
+            # A replayed answer arrives as a single chunk
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=completion))
+            if run_manager:
+                run_manager.on_llm_new_token(completion, chunk=chunk)
+            yield chunk
+            return
+        parts = []
+        for chunk in self.inner._stream(messages, stop=stop, run_manager=run_manager, **kwargs):
+            parts.append(chunk.message.content)
+            yield chunk
+        self._store(key, prompt_hash, "".join(parts))
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager=None, **kwargs: Any):
+        completion, key, prompt_hash = self._lookup(messages)
+        if completion is not None:
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=completion))
+            if run_manager:
+                await run_manager.on_llm_new_token(completion, chunk=chunk)
+            yield chunk
+            return
+        parts = []
+        async for chunk in self.inner._astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+            parts.append(chunk.message.content)
+            yield chunk
+        self._store(key, prompt_hash, "".join(parts))
+
+
+def with_replay(llm: BaseChatModel, model: str, settings: dict, mode: str = LLM_REPLAY_MODE) -> BaseChatModel:
+    """Wraps `llm` for record/replay unless the mode is "off". Used by agents/llm_registry.get_llm."""
+    if mode == "off":
+        return llm
+    if mode not in REPLAY_MODES:
+        raise ValueError(f"Unknown LLM_REPLAY_MODE '{mode}'; expected one of {REPLAY_MODES}.")
+    # Settings such as temperature change the completion, so they are part of the model identity
+    model_label = model + "".join(f";{name}={value}" for name, value in sorted(settings.items()))
+    return ReplayChatModel(inner=llm, mode=mode, model_label=model_label, callbacks=llm.callbacks)
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    store = get_replay_store()
+    if command == "compact":
+        print(f"Dropped {store.compact()} superseded line(s) from {store.path}.")
+    print(store.stats())
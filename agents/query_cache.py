@@ -0,0 +1,127 @@
+# agents/query_cache.py
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from tools.cache_utils import cache_path, load_json, normalize_question, save_json_atomic, stable_hash
+from tools.db_tools import get_sqlite_schema_version
+from tools.store_versions import add_invalidation_listener, get_store_version
+
+logger = logging.getLogger(__name__)
+
+# --- Query Cache Settings ---
+QUERY_CACHE_MAX_ENTRIES = 2000
+QUERY_CACHE_FILE = cache_path("query_cache.json")
+# Bump when the generator prompts change in a way that should discard old queries.
+QUERY_CACHE_FORMAT_VERSION = 1
+
+
+def schema_fingerprint(data_source: str) -> str:
+    """
+    Fingerprint of everything a generated query depends on besides the question:
+    the backend's store generation (bumped by populate_db.py) and, for SQLite,
+    PRAGMA schema_version so any DDL change also invalidates cached SQL.
+    """
+    parts = [QUERY_CACHE_FORMAT_VERSION, data_source, get_store_version(data_source)]
+    if data_source == "sqlite":
+        try:
+            parts.append(get_sqlite_schema_version())
+        except Exception as e:
+            logger.warning("Could not read SQLite schema_version for the query cache: %s", e)
+            return ""
+    return stable_hash(*parts)
+
+
+class QueryCache:
+    """
+    Persistent cache of the final working query (after any refinement) per
+    (data_source, normalized question, schema fingerprint). A hit lets the graph
+    skip the query-generation LLM call and go straight to execution.
+    """
+
+    def __init__(self, path=QUERY_CACHE_FILE, max_entries=QUERY_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> {"data_source", "question", "query", "stored_at"}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        for key, entry in load_json(self.path, []):
+            self._entries[key] = entry
+
+    def _key(self, data_source, question):
+        fingerprint = schema_fingerprint(data_source)
+        if not fingerprint:
+            return None
+        return stable_hash(data_source, normalize_question(question), fingerprint)
+
+    def lookup(self, data_source: str, question: str):
+        """Returns the cached query for this question on this backend, or None."""
+        key = self._key(data_source, question)
+        with self._lock:
+            entry = self._entries.get(key) if key else None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry["query"]
+
+    def store(self, data_source: str, question: str, generated_query: str) -> None:
+        """Remembers a query that returned results for this question."""
+        if not generated_query:
+            return
+        key = self._key(data_source, question)
+        if not key:
+            return
+        with self._lock:
+            existing = self._entries.get(key)
+            if existing is not None and existing["query"] == generated_query:
+                self._entries.move_to_end(key)
+                return
+            self._entries[key] = {
+                "data_source": data_source,
+                "question": normalize_question(question),
+                "query": generated_query,
+                "stored_at": time.time(),
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        self._save()
+
+    def invalidate(self, data_source: str = None) -> None:
+        """Drops cached queries for one backend (or all backends)."""
+        with self._lock:
+            for key in [k for k, e in self._entries.items() if data_source in (None, e["data_source"])]:
+                del self._entries[key]
+        self._save()
+
+    def entries(self) -> list:
+        """Snapshot of the cached entries, oldest first."""
+        with self._lock:
+            return [dict(entry) for entry in self._entries.values()]
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def _save(self):
+        with self._lock:
+            snapshot = [[key, entry] for key, entry in self._entries.items()]
+        try:
+            save_json_atomic(self.path, snapshot)
+        except OSError as e:
+            logger.warning("Could not persist query cache to '%s': %s", self.path, e)
+
+
+# Process-wide instance used by the query generator and executor.
+query_cache = QueryCache()
+add_invalidation_listener(query_cache.invalidate)
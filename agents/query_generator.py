@@ -1,243 +1,265 @@
+import asyncio
+import logging
+import time
+
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser as StringOutputParser # Using the alias
-from langchain_together import ChatTogether
 
 from graph.state import GraphState
-from config import LLM_MODEL, TOGETHER_API_KEY
-from tools.db_tools import get_schema_sqlite # We need the schema tool
+from agents.llm_registry import get_llm
+from agents.query_cache import query_cache
+from agents.route_stats import route_stats
+from tools.schema_cache import get_cached_schema
+
+logger = logging.getLogger(__name__)
 
 # --- Initialize the LLM ---
-llm = ChatTogether(
-    model=LLM_MODEL,
-    together_api_key=TOGETHER_API_KEY
-)
+llm = get_llm() # Shared client with a persistent HTTP session
+
+# Schema notes and few-shot examples are kept apart from the prompts so the fused
+# router+generator prompt (agents/fused_router.py) reuses the same material.
 
 # --- SQLite Agent ---
+SQLITE_RULES = """
+    IMPORTANT: When comparing string values in WHERE clauses, always use the LOWER() function on both the column and the value to ensure case-insensitive matching. Only use the exact proper noun for matching department names."""
+SQLITE_EXAMPLES = """
+    - User Question: List all active projects.
+    - SQL Query: SELECT project_name FROM projects WHERE LOWER(status) = LOWER('active');
+
+    - User Question: Which employees are in the Engineering department?
+    - SQL Query: SELECT T1.name FROM employees AS T1 INNER JOIN departments AS T2 ON T1.department_id = T2.id WHERE LOWER(T2.name) = LOWER('Engineering');
+    
+    - User Question: Who is the lead engineer?
+    - SQL Query: SELECT name FROM employees WHERE LOWER(role) = LOWER('Lead Engineer');
+    
+    - User Question: What is the status of the project assigned to Saba Attar?
+    - SQL Query: SELECT T1.status FROM projects AS T1 INNER JOIN employees AS T2 ON T1.employee_id = T2.id WHERE LOWER(T2.name) = LOWER('Saba Attar');"""
+SQLITE_QUERY_PROMPT = ChatPromptTemplate.from_template(
+    """
+    You are a SQLite expert. Based on the database schema and the user's question,
+    generate a syntactically correct SQLite query.""" + SQLITE_RULES + """
+
+    **Database Schema:**
+    {schema}
+
+    **User Question:**
+    {question}
+
+    **Few-shot Examples:**""" + SQLITE_EXAMPLES + """
+
+    **Your Task:**
+    Provide only the SQL query and nothing else.
+
+    **SQL Query:**
+    """
+)
+
+def _sqlite_prompt_inputs(state: GraphState) -> dict:
+    schema = get_cached_schema("sqlite") # Re-read only after a schema change
+    return {"schema": schema, "question": state["query"]}
 
 def generate_sqlite_query(state: GraphState) -> GraphState:
     """
     Generates a SQL query for the SQLite database based on the user's question.
     """
-    print("---GENERATING SQLITE QUERY---")
-    query = state["query"]
-    
-    schema = get_schema_sqlite.invoke({}) # We call the tool directly
-    
-    prompt = ChatPromptTemplate.from_template(
-        """
-        You are a SQLite expert. Based on the database schema and the user's question,
-        generate a syntactically correct SQLite query.
-        IMPORTANT: When comparing string values in WHERE clauses, always use the LOWER() function on both the column and the value to ensure case-insensitive matching. Only use the exact proper noun for matching department names.
-
-        **Database Schema:**
-        {schema}
-
-        **User Question:**
-        {question}
-
-        **Few-shot Examples:**
-        - User Question: List all active projects.
-        - SQL Query: SELECT project_name FROM projects WHERE LOWER(status) = LOWER('active');
-
-        - User Question: Which employees are in the Engineering department?
-        - SQL Query: SELECT T1.name FROM employees AS T1 INNER JOIN departments AS T2 ON T1.department_id = T2.id WHERE LOWER(T2.name) = LOWER('Engineering');
-        
-        - User Question: Who is the lead engineer?
-        - SQL Query: SELECT name FROM employees WHERE LOWER(role) = LOWER('Lead Engineer');
-        
-        - User Question: What is the status of the project assigned to Saba Attar?
-        - SQL Query: SELECT T1.status FROM projects AS T1 INNER JOIN employees AS T2 ON T1.employee_id = T2.id WHERE LOWER(T2.name) = LOWER('Saba Attar');
-
-        **Your Task:**
-        Provide only the SQL query and nothing else.
-
-        **SQL Query:**
-        """
-    )
-    
-    query_gen_chain = prompt | llm | StringOutputParser()
-    generated_query = query_gen_chain.invoke({"schema": schema, "question": query})
+    return _run_query_generator(state, "sqlite")
+
+# --- MongoDB Agent ---
+MONGODB_RULES = """
+    IMPORTANT: For all string value comparisons (e.g., in 'title', 'authors', 'topic', 'keywords', 'publication.journal', 'publication.type'),
+    always use the `$regex` operator with the `"$options": "i"` for case-insensitive matching.
+    If the user provides only part of a string to search for, use `$regex` to match that part."""
+MONGODB_COLLECTION = """
+    The 'papers' collection in the 'research_db' database contains documents with these fields:
+    - `title` (string)
+    - `authors` (list of strings)
+    - `year` (integer)
+    - `topic` (string)
+    - `keywords` (list of strings)
+    - `publication` (a nested object with 'journal' and 'type' string fields)"""
+MONGODB_EXAMPLES = """
+    - User Question: Find papers on the topic of generative ai.
+    - MongoDB Query: {{"topic": {{"$regex": "generative ai", "$options": "i"}}}}
+
+    - User Question: Who wrote the paper about 'Cognitive Architectures'?
+    - MongoDB Query: {{"title": {{"$regex": "Cognitive Architectures", "$options": "i"}}}}
     
-    print(f"Generated SQLite Query: {generated_query}")
+    - User Question: Find papers from the neurips conference.
+    - MongoDB Query: {{"publication.type": {{"$regex": "conference paper", "$options": "i"}}, "publication.journal": {{"$regex": "neurips", "$options": "i"}}}}
+
+    - User Question: Find papers about RAG by an author named patrick.
+    - MongoDB Query: {{"authors": {{"$regex": "patrick", "$options": "i"}}, "keywords": {{"$regex": "rag", "$options": "i"}}}}
     
-    state["generated_query"] = generated_query.strip() # Added strip()
-    return state
+    - User Question: List papers published in 2024.
+    - MongoDB Query: {{"year": 2024}}"""
+MONGODB_QUERY_PROMPT = ChatPromptTemplate.from_template(
+    """
+    You are a MongoDB expert. Based on the collection description and the user's question,
+    generate a Python dictionary for a .find() query.""" + MONGODB_RULES + """
 
-# --- MongoDB Agent ---
+    **Collection Description:**""" + MONGODB_COLLECTION + """
+
+    **User Question:**
+    {question}
+
+    **Few-shot Examples:**""" + MONGODB_EXAMPLES + """
+
+    **Your Task:**
+    Provide only the Python dictionary for the query and nothing else.
+
+    **MongoDB Query:**
+    """
+)
 
 def generate_mongodb_query(state: GraphState) -> GraphState:
     """
     Generates a MongoDB query dictionary based on the user's question.
     """
-    print("---GENERATING MONGODB QUERY---")
-    query = state["query"]
-    
-    prompt = ChatPromptTemplate.from_template(
-        """
-        You are a MongoDB expert. Based on the collection description and the user's question,
-        generate a Python dictionary for a .find() query.
-        IMPORTANT: For all string value comparisons (e.g., in 'title', 'authors', 'topic', 'keywords', 'publication.journal', 'publication.type'),
-        always use the `$regex` operator with the `"$options": "i"` for case-insensitive matching.
-        If the user provides only part of a string to search for, use `$regex` to match that part.
-
-        **Collection Description:**
-        The 'papers' collection in the 'research_db' database contains documents with these fields:
-        - `title` (string)
-        - `authors` (list of strings)
-        - `year` (integer)
-        - `topic` (string)
-        - `keywords` (list of strings)
-        - `publication` (a nested object with 'journal' and 'type' string fields)
-
-        **User Question:**
-        {question}
-
-        **Few-shot Examples:**
-        - User Question: Find papers on the topic of generative ai.
-        - MongoDB Query: {{"topic": {{"$regex": "generative ai", "$options": "i"}}}}
-
-        - User Question: Who wrote the paper about 'Cognitive Architectures'?
-        - MongoDB Query: {{"title": {{"$regex": "Cognitive Architectures", "$options": "i"}}}}
-        
-        - User Question: Find papers from the neurips conference.
-        - MongoDB Query: {{"publication.type": {{"$regex": "conference paper", "$options": "i"}}, "publication.journal": {{"$regex": "neurips", "$options": "i"}}}}
-
-        - User Question: Find papers about RAG by an author named patrick.
-        - MongoDB Query: {{"authors": {{"$regex": "patrick", "$options": "i"}}, "keywords": {{"$regex": "rag", "$options": "i"}}}}
-        
-        - User Question: List papers published in 2024.
-        - MongoDB Query: {{"year": 2024}}
-
-        **Your Task:**
-        Provide only the Python dictionary for the query and nothing else.
-
-        **MongoDB Query:**
-        """
-    )
-    
-    # Create the generation chain
-    query_gen_chain = prompt | llm | StringOutputParser()
-    
-    # Generate the query
-    generated_query = query_gen_chain.invoke({"question": query})
-
-    print(f"Generated MongoDB Query: {generated_query}")
-    
-    # Update the state
-    state["generated_query"] = generated_query.strip() # Added strip()
-    return state
+    return _run_query_generator(state, "mongodb")
 
 # --- MeiliSearch Agent ---
+MEILISEARCH_FIELDS = """
+    The support tickets have fields like 'ticket_id', 'description', 'raised_by', and 'status'.
+    Focus on terms from the 'description' or 'raised_by' fields."""
+MEILISEARCH_EXAMPLES = """
+    - User Question: Find support tickets related to MySQL issues raised by Sayali Shivpuje.
+    - MeiliSearch Query String: MySQL Sayali Shivpuje
+
+    - User Question: Retrieve all open tickets related to Neo4j.
+    - MeiliSearch Query String: open Neo4j
+
+    - User Question: What tickets has Aniruddha Salve raised about Neo4j and are open?
+    - MeiliSearch Query String: Aniruddha Salve Neo4j open
+
+    - User Question: Search for login problems.
+    - MeiliSearch Query String: login problem"""
+MEILISEARCH_QUERY_PROMPT = ChatPromptTemplate.from_template(
+    """
+    You are an expert at formulating search queries for a MeiliSearch index containing support tickets.
+    Based on the user's question, extract the most relevant keywords or phrases to search for.""" + MEILISEARCH_FIELDS + """
+
+    User Question: "{question}"
+
+    Few-shot Examples:""" + MEILISEARCH_EXAMPLES + """
+
+    Your Task:
+    Provide only the MeiliSearch search query string and nothing else.
+
+    MeiliSearch Query String:
+    """
+)
 
 def generate_meilisearch_query(state: GraphState) -> GraphState:
     """
     Generates a search string for MeiliSearch based on the user's question.
     """
-    print("---GENERATING MEILISEARCH QUERY---")
-    query = state["query"]
-    
-    prompt = ChatPromptTemplate.from_template(
-        """
-        You are an expert at formulating search queries for a MeiliSearch index containing support tickets.
-        Based on the user's question, extract the most relevant keywords or phrases to search for.
-        The support tickets have fields like 'ticket_id', 'description', 'raised_by', and 'status'.
-        Focus on terms from the 'description' or 'raised_by' fields.
-
-        User Question: "{question}"
-
-        Few-shot Examples:
-        - User Question: Find support tickets related to MySQL issues raised by Sayali Shivpuje.
-        - MeiliSearch Query String: MySQL Sayali Shivpuje
+    return _run_query_generator(state, "meilisearch")
 
-        - User Question: Retrieve all open tickets related to Neo4j.
-        - MeiliSearch Query String: open Neo4j
-
-        - User Question: What tickets has Aniruddha Salve raised about Neo4j and are open?
-        - MeiliSearch Query String: Aniruddha Salve Neo4j open
+# --- Neo4j Agent ---
+# Prompt engineering for Neo4j.
+# We will use the schema description and examples from the paper (page 5-6).
+# Nodes: Researcher {name: string, field: string}, ProjectOrTopic {name: string, domain: string}
+# Relationships: COLLABORATES_WITH, WORKS_ON
+NEO4J_SCHEMA = """
+    Available Node Labels and their properties:
+    - `Researcher`:
+        - `name` (string): The name of the researcher.
+        - `field` (string): The primary research field of the researcher.
+    - `ProjectOrTopic`:
+        - `name` (string): The name of the project or topic.
+        - `domain` (string): The broader domain of the project or topic.
+    
+    Available Relationship Types:
+    - `COLLABORATES_WITH` (between two Researcher nodes)
+    - `WORKS_ON` (from a Researcher node to a ProjectOrTopic node)"""
+NEO4J_EXAMPLES = """
+    - User Question: List all collaborators of Arnab Mitra Utsab.
+    - Cypher Query: MATCH (r:Researcher {{name: 'Arnab Mitra Utsab'}})-[:COLLABORATES_WITH]->(collaborator:Researcher) RETURN collaborator.name;
+
+    - User Question: Find researchers working on AI projects in the domain of healthcare.
+    - Cypher Query: MATCH (r:Researcher)-[:WORKS_ON]->(pt:ProjectOrTopic) WHERE pt.domain = 'AI in Healthcare' RETURN r.name;
+    
+    - User Question: What projects or topics is Aniruddha Salve working on?
+    - Cypher Query: MATCH (r:Researcher {{name: 'Aniruddha Salve'}})-[:WORKS_ON]->(pt:ProjectOrTopic) RETURN pt.name, pt.domain;"""
+NEO4J_QUERY_PROMPT = ChatPromptTemplate.from_template(
+    """
+    You are an expert at formulating Cypher queries for a Neo4j database.
+    The graph database contains information about a ResearchNetwork.
+""" + NEO4J_SCHEMA + """
 
-        - User Question: Search for login problems.
-        - MeiliSearch Query String: login problem
+    Based on the user's question, generate an appropriate Cypher query.
 
-        Your Task:
-        Provide only the MeiliSearch search query string and nothing else.
+    User Question: "{question}"
 
-        MeiliSearch Query String:
-        """
-    )
-    
-    query_gen_chain = prompt | llm | StringOutputParser()
-    generated_query_string = query_gen_chain.invoke({"question": query})
+    Few-shot Examples (inspired by the paper):""" + NEO4J_EXAMPLES + """
 
-    print(f"Generated MeiliSearch Query String: {generated_query_string}")
-    
-    state["generated_query"] = generated_query_string.strip()
-    return state
+    Your Task:
+    Provide only the Cypher query string and nothing else. Ensure the query ends with a semicolon.
 
-# --- Neo4j Agent ---
+    Cypher Query:
+    """
+)
 
 def generate_neo4j_query(state: GraphState) -> GraphState:
     """
     Generates a Cypher query for Neo4j based on the user's question.
     """
-    print("---GENERATING NEO4J CYPHER QUERY---")
-    query = state["query"]
-    
-    # Prompt engineering for Neo4j.
-    # We will use the schema description and examples from the paper (page 5-6).
-    # Nodes: Researcher {name: string, field: string}, ProjectOrTopic {name: string, domain: string}
-    # Relationships: COLLABORATES_WITH, WORKS_ON
-    prompt = ChatPromptTemplate.from_template(
-        """
-        You are an expert at formulating Cypher queries for a Neo4j database.
-        The graph database contains information about a ResearchNetwork.
-
-        Available Node Labels and their properties:
-        - `Researcher`:
-            - `name` (string): The name of the researcher.
-            - `field` (string): The primary research field of the researcher.
-        - `ProjectOrTopic`:
-            - `name` (string): The name of the project or topic.
-            - `domain` (string): The broader domain of the project or topic.
-        
-        Available Relationship Types:
-        - `COLLABORATES_WITH` (between two Researcher nodes)
-        - `WORKS_ON` (from a Researcher node to a ProjectOrTopic node)
-
-        Based on the user's question, generate an appropriate Cypher query.
-
-        User Question: "{question}"
-
-        Few-shot Examples (inspired by the paper):
-        - User Question: List all collaborators of Arnab Mitra Utsab.
-        - Cypher Query: MATCH (r:Researcher {{name: 'Arnab Mitra Utsab'}})-[:COLLABORATES_WITH]->(collaborator:Researcher) RETURN collaborator.name;
-
-        - User Question: Find researchers working on AI projects in the domain of healthcare.
-        - Cypher Query: MATCH (r:Researcher)-[:WORKS_ON]->(pt:ProjectOrTopic) WHERE pt.domain = 'AI in Healthcare' RETURN r.name;
-        
-        - User Question: What projects or topics is Aniruddha Salve working on?
-        - Cypher Query: MATCH (r:Researcher {{name: 'Aniruddha Salve'}})-[:WORKS_ON]->(pt:ProjectOrTopic) RETURN pt.name, pt.domain;
-
-        Your Task:
-        Provide only the Cypher query string and nothing else. Ensure the query ends with a semicolon.
-
-        Cypher Query:
-        """
-    )
-    
-    # We are expecting a string output for the Cypher query.
-    from langchain_core.output_parsers import StrOutputParser as StringOutputParser # Using the alias
+    return _run_query_generator(state, "neo4j")
+
+def _question_prompt_inputs(state: GraphState) -> dict:
+    return {"question": state["query"]}
+
+# data_source -> (banner, label used in logs, prompt, builds the prompt inputs from the state)
+QUERY_GENERATORS = {
+    "sqlite": ("SQLITE QUERY", "SQLite Query", SQLITE_QUERY_PROMPT, _sqlite_prompt_inputs),
+    "mongodb": ("MONGODB QUERY", "MongoDB Query", MONGODB_QUERY_PROMPT, _question_prompt_inputs),
+    "meilisearch": ("MEILISEARCH QUERY", "MeiliSearch Query String", MEILISEARCH_QUERY_PROMPT, _question_prompt_inputs),
+    "neo4j": ("NEO4J CYPHER QUERY", "Neo4j Cypher Query", NEO4J_QUERY_PROMPT, _question_prompt_inputs),
+}
+
+def _record_generation(state: GraphState, started_at: float) -> None:
+    # Second LLM call of an LLM-routed turn (see agents/route_stats.py)
+    if state.get("route_path"):
+        route_stats.record_generation(state["route_path"], (time.perf_counter() - started_at) * 1000)
+
+def _run_query_generator(state: GraphState, data_source: str) -> GraphState:
+    banner, label, prompt, build_inputs = QUERY_GENERATORS[data_source]
+    logger.info("---GENERATING %s---", banner)
+    prompt_inputs = build_inputs(state)
     query_gen_chain = prompt | llm | StringOutputParser()
-    
-    generated_cypher_query = query_gen_chain.invoke({"question": query})
+    started_at = time.perf_counter()
+    generated_query = query_gen_chain.invoke(prompt_inputs)
+    _record_generation(state, started_at)
+    logger.info("Generated %s: %s", label, generated_query)
+    state["generated_query"] = generated_query.strip()
+    return state
 
-    print(f"Generated Neo4j Cypher Query: {generated_cypher_query}")
-    
-    # Update the state
-    state["generated_query"] = generated_cypher_query.strip() 
+async def _arun_query_generator(state: GraphState, data_source: str) -> GraphState:
+    banner, label, prompt, build_inputs = QUERY_GENERATORS[data_source]
+    logger.info("---GENERATING %s (async)---", banner)
+    # Building the inputs may hit SQLite for the schema; keep that off the event loop.
+    prompt_inputs = await asyncio.to_thread(build_inputs, state)
+    query_gen_chain = prompt | llm | StringOutputParser()
+    started_at = time.perf_counter()
+    generated_query = await query_gen_chain.ainvoke(prompt_inputs)
+    _record_generation(state, started_at)
+    logger.info("Generated %s: %s", label, generated_query)
+    state["generated_query"] = generated_query.strip()
     return state
-    
+
 # --- Query Generation Node ---
 
+def _lookup_cached_query(state: GraphState) -> bool:
+    """Repeat questions reuse the last query that worked for them (no LLM call)."""
+    data_source = state.get("data_source")
+    if data_source in QUERY_GENERATORS:
+        cached_query = query_cache.lookup(data_source, state["query"])
+        if cached_query:
+            logger.info("Query cache hit for %s. Skipping LLM generation: %s", data_source, cached_query)
+            state["generated_query"] = cached_query
+            return True
+    return False
+
 def generate_query(state: GraphState) -> GraphState:
     """
     A central node that decides which query generator (specialized agent) to call:
@@ -245,7 +267,10 @@ def generate_query(state: GraphState) -> GraphState:
     """
     data_source = state.get("data_source") 
     
-    print(f"---DECIDING WHICH AGENT TO CALL FOR: {data_source}---")
+    logger.info("---DECIDING WHICH AGENT TO CALL FOR: %s---", data_source)
+
+    if _lookup_cached_query(state):
+        return state
 
     if data_source == "sqlite":
         return generate_sqlite_query(state)
@@ -256,7 +281,24 @@ def generate_query(state: GraphState) -> GraphState:
     elif data_source == "neo4j":
         return generate_neo4j_query(state)
     else:
-        print(f"No specific query generator for data_source: {data_source}")
+        logger.info("No specific query generator for data_source: %s", data_source)
         state["generated_query"] = "" 
         return state
-    
\ No newline at end of file
+
+async def agenerate_query(state: GraphState) -> GraphState:
+    """
+    Async version of generate_query; the generator LLM call is awaited.
+    """
+    data_source = state.get("data_source")
+
+    logger.info("---DECIDING WHICH AGENT TO CALL FOR: %s (async)---", data_source)
+
+    # The query cache lookup does blocking SQLite I/O; keep it off the event loop.
+    if await asyncio.to_thread(_lookup_cached_query, state):
+        return state
+
+    if data_source in QUERY_GENERATORS:
+        return await _arun_query_generator(state, data_source)
+    logger.info("No specific query generator for data_source: %s", data_source)
+    state["generated_query"] = ""
+    return state
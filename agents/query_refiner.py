@@ -1,42 +1,24 @@
+import asyncio
+import logging
 import re
 from typing import Optional 
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser as StringOutputParser
-from langchain_together import ChatTogether
 
 from graph.state import GraphState
-from config import LLM_MODEL, TOGETHER_API_KEY
-from tools.db_tools import get_schema_sqlite
+from agents.llm_registry import get_llm
+from graph.telemetry import span_timer
+from tools.query_result import QueryResult, ERROR_REJECTED, ERROR_TIMEOUT
+from tools.schema_cache import get_cached_schema
 
-llm = ChatTogether(
-    model=LLM_MODEL,
-    together_api_key=TOGETHER_API_KEY
-)
+logger = logging.getLogger(__name__)
+
+llm = get_llm() # Shared client with a persistent HTTP session
 
 
 def get_database_schema_for_refinement(data_source: str) -> str:
-    if data_source == "sqlite":
-        try:
-            return get_schema_sqlite.invoke({})
-        except Exception as e:
-            return f"Could not retrieve SQLite schema: {e}"
-    elif data_source == "mongodb":
-        return (
-            "MongoDB 'papers' collection fields: title (string), authors (list of strings), "
-            "year (integer), topic (string), keywords (list of strings), "
-            "publication (nested object with 'journal' and 'type' string fields)."
-        )
-    elif data_source == "meilisearch":
-        return (
-            "MeiliSearch 'support_tickets' index fields: ticket_id (string, primaryKey), "
-            "description (text, searchable), raised_by (string, searchable), status (string, searchable/filterable)."
-        )
-    elif data_source == "neo4j":
-        return (
-            "Neo4j Graph Database: Nodes: Researcher {name, field}, ProjectOrTopic {name, domain}. "
-            "Relationships: (Researcher)-[:COLLABORATES_WITH]->(Researcher), (Researcher)-[:WORKS_ON]->(ProjectOrTopic)."
-        )
-    return "No schema description available for this data_source."
+    # Introspected from the store and cached until it changes (tools/schema_cache.py)
+    return get_cached_schema(data_source)
 
 
 def extract_json_query_from_text(text: str) -> Optional[str]:
@@ -67,27 +49,7 @@ def extract_json_query_from_text(text: str) -> Optional[str]:
     return None
 
 
-def suggest_refined_query(state: GraphState) -> GraphState:
-    """
-    Attempts to refine a failed query based on the original user query,
-    the last failed query, and the database schema.
-    Updates state['generated_query'] with the new query.
-    """
-    print("---REFINING QUERY---")
-    original_user_q = state.get("original_user_query")
-    last_failed_q = state.get("last_failed_query")
-    data_source = state.get("data_source")
-    
-    if not original_user_q or not last_failed_q or not data_source:
-        print("Not enough information to refine query. Skipping refinement.")
-        state["needs_query_refinement"] = False 
-        state["error"] = state.get("error") or "Query refinement skipped due to missing information."
-        return state
-
-    db_schema_or_description = get_database_schema_for_refinement(data_source)
-
-    # MODIFIED AND MORE DETAILED PROMPT
-    prompt_template_str = """
+REFINEMENT_PROMPT_TEMPLATE = """
         You are an expert query refinement assistant.
         A previous query for {data_source_type} failed to return the desired results or returned an empty set.
         Your task is to analyze the original user question, the failed database query,
@@ -129,21 +91,57 @@ def suggest_refined_query(state: GraphState) -> GraphState:
         REFINED_QUERY_END
 
         Now, provide your refined query for the input above:
+"""
+# Note: The "Refined Query:" line is removed to rely solely on the markers.
+REFINEMENT_PROMPT = ChatPromptTemplate.from_template(REFINEMENT_PROMPT_TEMPLATE)
+
+# For queries that were too expensive (rejected by the query guard in tools/query_guard.py, or
+# stopped at their time limit): the same prompt, plus the reason (and plan) right after the failed query.
+_FAILED_QUERY_LINE = '''"{failed_query}"
+'''
+EXPENSIVE_QUERY_REFINEMENT_PROMPT = ChatPromptTemplate.from_template(REFINEMENT_PROMPT_TEMPLATE.replace(
+    _FAILED_QUERY_LINE, _FAILED_QUERY_LINE + """        It returned nothing because it was too expensive:
+        {cost_feedback}
+        Rewrite it so that it examines far fewer rows (selective conditions, joins on keys, no cross joins or full scans).
+"""))
+_EXPENSIVE_QUERY_ERRORS = (ERROR_REJECTED, ERROR_TIMEOUT)
+
+
+def _refinement_prompt(prompt_inputs: dict) -> ChatPromptTemplate:
+    return EXPENSIVE_QUERY_REFINEMENT_PROMPT if "cost_feedback" in prompt_inputs else REFINEMENT_PROMPT
+
+
+def _prepare_refinement(state: GraphState):
     """
-    # Note: The "Refined Query:" line is removed to rely solely on the markers.
-    
-    prompt = ChatPromptTemplate.from_template(prompt_template_str)
-    refinement_chain = prompt | llm | StringOutputParser()
+    Shared by the sync and async refiners. Returns the prompt inputs, or None if
+    there is not enough information to refine (the state is updated accordingly).
+    """
+    original_user_q = state.get("original_user_query")
+    last_failed_q = state.get("last_failed_query")
+    data_source = state.get("data_source")
     
-    print(f"Attempting to get refined query for {data_source} from LLM...")
-    llm_output_str = refinement_chain.invoke({
+    if not original_user_q or not last_failed_q or not data_source:
+        logger.info("Not enough information to refine query. Skipping refinement.")
+        state["needs_query_refinement"] = False 
+        state["error"] = state.get("error") or "Query refinement skipped due to missing information."
+        return None
+
+    prompt_inputs = {
         "original_user_question": original_user_q,
-        "database_schema": db_schema_or_description,
+        "database_schema": get_database_schema_for_refinement(data_source),
         "failed_query": last_failed_q,
         "data_source_type": data_source
-    })
+    }
+    result = state.get("context")
+    if isinstance(result, QueryResult) and result.error_kind in _EXPENSIVE_QUERY_ERRORS:
+        prompt_inputs["cost_feedback"] = result.error
+    return prompt_inputs
 
-    print(f"Raw LLM output for refinement: {llm_output_str}")
+
+def _apply_refinement_output(state: GraphState, llm_output_str: str) -> GraphState:
+    """Extracts the refined query from between the markers and stores it in the state."""
+    data_source = state.get("data_source")
+    logger.debug("Raw LLM output for refinement: %s", llm_output_str)
 
     refined_query_str = llm_output_str # Default to full output
     try:
@@ -163,20 +161,55 @@ def suggest_refined_query(state: GraphState) -> GraphState:
             if data_source == "mongodb":
   
                 # For simplicity, we assume if markers fail, LLM output might be the query itself or still problematic
-                print("Warning: Markers not found in refinement output. Using raw output, which might fail.")
+                logger.warning("Markers not found in refinement output. Using raw output, which might fail.")
                 pass # refined_query_str remains llm_output_str
     except Exception as extraction_error:
-        print(f"Error during query extraction from LLM output: {extraction_error}")
+        logger.warning("Error during query extraction from LLM output: %s", extraction_error)
         # Keep llm_output_str as is, let the executor try to parse it
 
     refined_query_str = refined_query_str.strip()
-    print(f"Extracted/Refined query: {refined_query_str}")
+    logger.debug("Extracted/Refined query: %s", refined_query_str)
 
     state["generated_query"] = refined_query_str 
     state["needs_query_refinement"] = False
     return state
 
 
+def suggest_refined_query(state: GraphState) -> GraphState:
+    """
+    Attempts to refine a failed query based on the original user query,
+    the last failed query, and the database schema.
+    Updates state['generated_query'] with the new query.
+    """
+    logger.info("---REFINING QUERY---")
+    prompt_inputs = _prepare_refinement(state)
+    if prompt_inputs is None:
+        return state
+
+    refinement_chain = _refinement_prompt(prompt_inputs) | llm | StringOutputParser()
+    logger.debug("Attempting to get refined query for %s from LLM...", prompt_inputs['data_source_type'])
+    llm_output_str = refinement_chain.invoke(prompt_inputs)
+    with span_timer("parse"):
+        return _apply_refinement_output(state, llm_output_str)
+
+
+async def asuggest_refined_query(state: GraphState) -> GraphState:
+    """
+    Async version of suggest_refined_query.
+    """
+    logger.info("---REFINING QUERY (async)---")
+    # The SQLite schema lookup is blocking; keep it off the event loop.
+    prompt_inputs = await asyncio.to_thread(_prepare_refinement, state)
+    if prompt_inputs is None:
+        return state
+
+    refinement_chain = _refinement_prompt(prompt_inputs) | llm | StringOutputParser()
+    logger.debug("Attempting to get refined query for %s from LLM...", prompt_inputs['data_source_type'])
+    llm_output_str = await refinement_chain.ainvoke(prompt_inputs)
+    with span_timer("parse"):
+        return _apply_refinement_output(state, llm_output_str)
+
+
 #------------------------------------------------------------------------------------------#
 # --- Node for Handling Clarification ---
 def handle_clarification_needed(state: GraphState) -> GraphState:
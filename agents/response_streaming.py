@@ -0,0 +1,94 @@
+# agents/response_streaming.py
+import time
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+# Tag carried by the response LLM call, so only answer tokens are forwarded to the user
+# (the router, generators and refiner do not stream).
+RESPONSE_STREAM_TAG = "response_stream"
+
+
+class TokenStreamHandler(BaseCallbackHandler):
+    """
+    Callback handler that forwards the response generator's tokens to `on_token(text)`
+    as they arrive, and calls `on_end()` (if given) once the answer is complete.
+    Pass it in the run config: app.stream(inputs, {"callbacks": [handler]}).
+    Also measures time-to-first-token and total time from its creation (the start of the turn).
+    """
+
+    def __init__(self, on_token, on_end=None):
+        self.on_token = on_token
+        self.on_end = on_end
+        self.started_at = time.perf_counter()
+        self.first_token_at = None
+        self.finished_at = None
+        self.token_count = 0
+        self._response_runs = set()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, tags=None, **kwargs):
+        if tags and RESPONSE_STREAM_TAG in tags:
+            self._response_runs.add(run_id)
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        if run_id not in self._response_runs or not token:
+            return
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        self.token_count += 1
+        self.on_token(token)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        if run_id in self._response_runs:
+            self._response_runs.discard(run_id)
+            self.finished_at = time.perf_counter()
+            if self.on_end is not None and self.streamed:
+                self.on_end()
+
+    @property
+    def streamed(self) -> bool:
+        return self.first_token_at is not None
+
+    @property
+    def time_to_first_token(self):
+        """Seconds from the start of the turn to the first answer token (None if nothing streamed)."""
+        return None if self.first_token_at is None else self.first_token_at - self.started_at
+
+    @property
+    def total_time(self) -> float:
+        """Seconds from the start of the turn to the last answer token (or to now)."""
+        return (self.finished_at or time.perf_counter()) - self.started_at
+
+
+def stream_response(response_chain, inputs: dict) -> tuple:
+    """
+    Runs the response chain in streaming mode and returns (text, metrics); the tokens
+    reach any TokenStreamHandler in the run config through the LLM callbacks.
+    """
+    started_at = time.perf_counter()
+    first_token_at = None
+    chunks = []
+    for chunk in response_chain.stream(inputs):
+        if first_token_at is None and chunk:
+            first_token_at = time.perf_counter()
+        chunks.append(chunk)
+    return "".join(chunks), _response_metrics(started_at, first_token_at)
+
+
+async def astream_response(response_chain, inputs: dict) -> tuple:
+    """Async version of stream_response."""
+    started_at = time.perf_counter()
+    first_token_at = None
+    chunks = []
+    async for chunk in response_chain.astream(inputs):
+        if first_token_at is None and chunk:
+            first_token_at = time.perf_counter()
+        chunks.append(chunk)
+    return "".join(chunks), _response_metrics(started_at, first_token_at)
+
+
+def _response_metrics(started_at, first_token_at) -> dict:
+    finished_at = time.perf_counter()
+    return {
+        "time_to_first_token_ms": None if first_token_at is None else round((first_token_at - started_at) * 1000, 1),
+        "total_ms": round((finished_at - started_at) * 1000, 1),
+    }
@@ -0,0 +1,89 @@
+# agents/route_stats.py
+import threading
+from collections import Counter, defaultdict, deque
+
+from graph.telemetry import percentiles
+
+# --- Route Path Settings ---
+ROUTE_STATS_MAX_SAMPLES = 1000  # Latency samples kept per path and step
+
+# How an LLM-routed turn got its query (state["route_path"]); rule and cache routes are not counted.
+ROUTE_PATHS = ("two_step", "fused", "fused_fallback")
+# Outcome of the first execution of the query, the accuracy signal compared across paths.
+OUTCOMES = ("rows", "empty", "error")
+
+
+class RoutePathStats:
+    """
+    Compares the two-step path (router LLM call, then generator LLM call) with the
+    fused single-call path (agents/fused_router.py): LLM time spent until a query
+    is ready, fallback reasons, and how often the first query returned rows.
+    """
+
+    def __init__(self, max_samples: int = ROUTE_STATS_MAX_SAMPLES):
+        self._routing_ms = defaultdict(lambda: deque(maxlen=max_samples))
+        self._generation_ms = defaultdict(lambda: deque(maxlen=max_samples))
+        self._turns = Counter()
+        self._generation_total_ms = Counter()
+        self._routing_total_ms = Counter()
+        self._outcomes = defaultdict(Counter)
+        self._fallback_reasons = Counter()
+        self._lock = threading.Lock()
+
+    def record_routing(self, path: str, llm_ms: float) -> None:
+        """One routed turn; llm_ms covers every routing LLM call of the turn (fused attempt included)."""
+        with self._lock:
+            self._turns[path] += 1
+            self._routing_total_ms[path] += llm_ms
+            self._routing_ms[path].append(llm_ms)
+
+    def record_generation(self, path: str, llm_ms: float) -> None:
+        with self._lock:
+            self._generation_total_ms[path] += llm_ms
+            self._generation_ms[path].append(llm_ms)
+
+    def record_fallback(self, reason: str) -> None:
+        with self._lock:
+            self._fallback_reasons[reason] += 1
+
+    def record_outcome(self, path: str, outcome: str) -> None:
+        with self._lock:
+            self._outcomes[path][outcome] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            paths = {}
+            for path in ROUTE_PATHS:
+                turns = self._turns[path]
+                if not turns:
+                    continue
+                outcomes = {outcome: self._outcomes[path][outcome] for outcome in OUTCOMES}
+                executed = sum(outcomes.values())
+                paths[path] = {
+                    "turns": turns,
+                    "routing_llm_ms": percentiles(self._routing_ms[path]),
+                    "generation_llm_ms": percentiles(self._generation_ms[path]) if self._generation_ms[path] else {},
+                    # Generator calls skipped on query cache hits count as zero
+                    "mean_llm_ms_to_query": round(
+                        (self._routing_total_ms[path] + self._generation_total_ms[path]) / turns, 2),
+                    "first_attempt": outcomes,
+                    "first_attempt_success_rate": outcomes["rows"] / executed if executed else 0.0,
+                }
+            attempts = self._turns["fused"] + self._turns["fused_fallback"]
+            return {
+                "paths": paths,
+                "fused_fallback_rate": self._turns["fused_fallback"] / attempts if attempts else 0.0,
+                "fallback_reasons": dict(self._fallback_reasons),
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            for counter in (self._turns, self._generation_total_ms,
+                            self._routing_total_ms, self._fallback_reasons):
+                counter.clear()
+            self._routing_ms.clear()
+            self._generation_ms.clear()
+            self._outcomes.clear()
+
+
+route_stats = RoutePathStats()
@@ -1,14 +1,21 @@
 from typing import Optional
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import JsonOutputParser, StrOutputParser as StringOutputParser 
-from langchain_together import ChatTogether
 
 from graph.state import GraphState 
-from config import LLM_MODEL, TOGETHER_API_KEY
+from agents.llm_registry import get_llm
+from agents.route_stats import route_stats
+from agents.routing_cache import routing_cache
+from agents.rule_router import rule_router
+from graph.telemetry import set_span_attribute, span_timer
 
 import re 
 import json 
 import ast  
+import logging
+import time
+
+logger = logging.getLogger(__name__)
 
 def extract_json_from_llm_output(text: str) -> Optional[str]:
     """
@@ -22,10 +29,10 @@ def extract_json_from_llm_output(text: str) -> Optional[str]:
         potential_json_str = match_markdown.group(1)
         try:
             json.loads(potential_json_str)
-            print(f"Extracted JSON from markdown block: {potential_json_str}")
+            logger.debug("Extracted JSON from markdown block: %s", potential_json_str)
             return potential_json_str
         except json.JSONDecodeError:
-            print(f"Markdown JSON block found but invalid: {potential_json_str}")
+            logger.debug("Markdown JSON block found but invalid: %s", potential_json_str)
             # Fall through to other methods if markdown JSON is invalid
 
     # Try to find the last occurrence of a JSON-like structure
@@ -34,16 +41,16 @@ def extract_json_from_llm_output(text: str) -> Optional[str]:
         potential_json_str = matches[-1].group(1) # Get the last match
         try:
             json.loads(potential_json_str)
-            print(f"Extracted JSON (last match via regex): {potential_json_str}")
+            logger.debug("Extracted JSON (last match via regex): %s", potential_json_str)
             return potential_json_str
         except json.JSONDecodeError:
             try:
                 evaluated = ast.literal_eval(potential_json_str)
                 if isinstance(evaluated, dict): # Ensure it's a dictionary
-                    print(f"Extracted dict via ast.literal_eval (last match): {potential_json_str}")
+                    logger.debug("Extracted dict via ast.literal_eval (last match): %s", potential_json_str)
                     return potential_json_str 
             except (SyntaxError, ValueError):
-                print(f"Could not parse as JSON or dict via ast (last match): {potential_json_str}")
+                logger.warning("Could not parse as JSON or dict via ast (last match): %s", potential_json_str)
     
     # Fallback: Simplistic first '{' to last '}' if other methods fail (less reliable)
     try:
@@ -52,156 +59,268 @@ def extract_json_from_llm_output(text: str) -> Optional[str]:
         if first_brace != -1 and last_brace != -1 and last_brace > first_brace:
             potential_json_str = text[first_brace : last_brace+1]
             json.loads(potential_json_str) # Validate
-            print(f"Extracted JSON (fallback first_brace to last_brace): {potential_json_str}")
+            logger.debug("Extracted JSON (fallback first_brace to last_brace): %s", potential_json_str)
             return potential_json_str
     except (json.JSONDecodeError, ValueError, SyntaxError):
-        print(f"Fallback JSON extraction failed for text: {text[:200]}...")
+        logger.warning("Fallback JSON extraction failed for text: %s...", text[:200])
 
-    print(f"Could not extract valid JSON from LLM output: {text[:200]}...")
+    logger.warning("Could not extract valid JSON from LLM output: %s...", text[:200])
     return None
 
 
-def route_query(state: GraphState) -> GraphState:
+CACHEABLE_DECISIONS = ("sqlite", "mongodb", "meilisearch", "neo4j", "general")
+
+
+def build_routing_update(decision: str, current_query_for_routing: str) -> dict:
     """
-    Routes the user's query to an appropriate data source, triggers clarification if needed,
-    and returns a new state object.
+    Maps a routing decision ("sqlite", "mongodb", "meilisearch", "neo4j" or "general")
+    to the state updates the router node returns. Shared by the LLM and cache paths.
+    """
+    updated_values = {"error": None}
+    if decision == "sqlite":
+        updated_values["data_source"] = "sqlite"
+    elif decision == "mongodb":
+        updated_values["data_source"] = "mongodb"
+    elif decision == "meilisearch":
+        updated_values["data_source"] = "meilisearch"
+    elif decision == "neo4j": 
+        updated_values["data_source"] = "neo4j"
+    elif decision == "general": 
+        logger.info("Query classified as 'general', initiating clarification.")
+        updated_values["data_source"] = "clarification_needed" # NEW data_source state
+        updated_values["clarification_question_needed"] = True
+        updated_values["clarification_question_text"] = (
+            "Your question seems a bit general or ambiguous for a direct database query. "
+            "Could you please specify if you're looking for information about: \n"
+            "1. Employees, Departments, or Projects (company data)? \n"
+            "2. Scientific Research Papers? \n"
+            "3. Support Tickets? \n"
+            "4. Collaborations, research fields, or work done by Researchers? \n"
+            "Please provide more details or rephrase your question focusing on one of these areas."
+        )
+        # Store the query that needs clarification
+        updated_values["original_query_before_clarification"] = current_query_for_routing
+    else: # Unexpected value in "data_source" field of JSON
+        updated_values["data_source"] = "end"
+        updated_values["error"] = f"Router JSON contained an unexpected data_source value: {decision}"
+    return updated_values
+
+
+# --- Router Prompt ---
+# Category descriptions, shared with the fused router+generator prompt (agents/fused_router.py)
+ROUTER_CATEGORIES = """
+    - `sqlite`: For any questions about company employees, their roles, departments, projects they work on, or project statuses.
+    - `mongodb`: For any questions about scientific research papers, their authors, publication years, topics, or keywords.
+    - `meilisearch`: For searching and finding information within support tickets, such as ticket descriptions, who raised them, or their current status.
+    - `neo4j`: For questions about relationships between researchers, their collaborations, their research fields, or the projects/topics they work on (e.g., "Who collaborates with X?", "What is the research field of Y?", "What projects does Z work on?").
+    - `general`: If the question does not fit into any of the above categories, is a general conversational question, or if it's too vague to route to a specific database."""
+ROUTER_PROMPT = ChatPromptTemplate.from_template(
     """
-    print("---ROUTING QUERY---")
-    current_query_for_routing = state["query"] # The query to be routed
-    llm = None 
+    You are an expert routing assistant. Your only task is to classify a user's question into one of the following categories.
+
+    Here are the available data source categories:""" + ROUTER_CATEGORIES + """
+
+    Analyze the user's question provided below.
+    User Question: "{query}"
+
+    Respond with a single, raw JSON object containing one key, "data_source", and the value should be one of the five categories: "sqlite", "mongodb", "meilisearch", "neo4j", or "general".
+    Do not provide any explanation, preamble, or any text other than the JSON object itself.
+
+    Example for sqlite:
+    User Question: Who is the project manager?
+    JSON Response: {{"data_source": "sqlite"}}
+    
+    Example for mongodb:
+    User Question: What papers were published in 2024 about AI?
+    JSON Response: {{"data_source": "mongodb"}}
+
+    Example for meilisearch:
+    User Question: Find tickets related to MySQL issues.
+    JSON Response: {{"data_source": "meilisearch"}}
     
+    Example for neo4j (collaboration):
+    User Question: Who are the collaborators of Aniruddha Salve?
+    JSON Response: {{"data_source": "neo4j"}}
+
+    Example for neo4j (research field):
+    User Question: What is the research field of Patrick Lewis?
+    JSON Response: {{"data_source": "neo4j"}}
+    """
+)
+
+
+def with_route_confidence(state: GraphState) -> GraphState:
+    """
+    Marks a cache/LLM routing decision as "low" confidence when the rules point
+    elsewhere (or the question was judged general), "high" otherwise.
+    """
+    candidates = state.get("candidate_data_sources") or []
+    data_source = state.get("data_source")
+    if data_source == "clarification_needed":
+        state["route_confidence"] = "low"
+    elif data_source in ("sqlite", "mongodb", "meilisearch", "neo4j"):
+        state["route_confidence"] = "high" if not candidates or candidates[0] == data_source else "low"
+    else:
+        state["route_confidence"] = None
+    return state
+
+
+def start_routing(state: GraphState):
+    """
+    Shared first half of the sync and async routers: resets the clarification fields
+    and tries the LLM-free fast paths. Returns (state snapshot, finished state or None).
+    """
+    current_query_for_routing = state["query"]
     current_state_snapshot = state.copy() 
     # Reset clarification fields for this routing attempt
     current_state_snapshot["clarification_question_needed"] = False
     current_state_snapshot["clarification_question_text"] = None
     # user_clarification_response is handled by the clarification node
 
-    try:
-        llm = ChatTogether(
-            model=LLM_MODEL,
-            together_api_key=TOGETHER_API_KEY
-        )
+    # Fast path 1: deterministic rules (microseconds) for queries that name a single backend
+    rule_result = rule_router.classify(current_query_for_routing)
+    # Backends the rules found evidence for, best first (used by the speculative fan-out)
+    current_state_snapshot["candidate_data_sources"] = [
+        ds for ds, _ in sorted(rule_result.scores.items(), key=lambda item: -item[1])
+    ]
+    current_state_snapshot["route_confidence"] = None
+    current_state_snapshot["route_path"] = None # Set when the LLM routes (route_with_llm, fused router)
+    if rule_result.data_source:
+        logger.info("Router decision (rules %s, LLM skipped): %s", rule_result.matched_rules, rule_result.data_source)
+        return current_state_snapshot, {**current_state_snapshot, **build_routing_update(rule_result.data_source, current_query_for_routing),
+                                        "route_confidence": "high"}
 
-        prompt = ChatPromptTemplate.from_template(
-            """
-            You are an expert routing assistant. Your only task is to classify a user's question into one of the following categories.
-
-            Here are the available data source categories:
-            - `sqlite`: For any questions about company employees, their roles, departments, projects they work on, or project statuses.
-            - `mongodb`: For any questions about scientific research papers, their authors, publication years, topics, or keywords.
-            - `meilisearch`: For searching and finding information within support tickets, such as ticket descriptions, who raised them, or their current status.
-            - `neo4j`: For questions about relationships between researchers, their collaborations, their research fields, or the projects/topics they work on (e.g., "Who collaborates with X?", "What is the research field of Y?", "What projects does Z work on?").
-            - `general`: If the question does not fit into any of the above categories, is a general conversational question, or if it's too vague to route to a specific database.
-
-            Analyze the user's question provided below.
-            User Question: "{query}"
-
-            Respond with a single, raw JSON object containing one key, "data_source", and the value should be one of the five categories: "sqlite", "mongodb", "meilisearch", "neo4j", or "general".
-            Do not provide any explanation, preamble, or any text other than the JSON object itself.
-
-            Example for sqlite:
-            User Question: Who is the project manager?
-            JSON Response: {{"data_source": "sqlite"}}
-            
-            Example for mongodb:
-            User Question: What papers were published in 2024 about AI?
-            JSON Response: {{"data_source": "mongodb"}}
-
-            Example for meilisearch:
-            User Question: Find tickets related to MySQL issues.
-            JSON Response: {{"data_source": "meilisearch"}}
-            
-            Example for neo4j (collaboration):
-            User Question: Who are the collaborators of Aniruddha Salve?
-            JSON Response: {{"data_source": "neo4j"}}
-
-            Example for neo4j (research field):
-            User Question: What is the research field of Patrick Lewis?
-            JSON Response: {{"data_source": "neo4j"}}
-            """
-        )
+    # Fast path 2: semantic cache of earlier LLM routing decisions
+    cached_decision = routing_cache.lookup(current_query_for_routing)
+    if cached_decision:
+        logger.info("Router decision (semantic cache hit, LLM skipped): %s", cached_decision)
+        return current_state_snapshot, with_route_confidence({**current_state_snapshot, **build_routing_update(cached_decision, current_query_for_routing)})
 
-        # Get raw string output first to handle potential extra text from LLM
-        router_chain_text_output = prompt | llm | StringOutputParser() 
+    return current_state_snapshot, None
 
-        print("Attempting to invoke LLM for routing... (Waiting for API response)")
-        raw_llm_output = router_chain_text_output.invoke({"query": current_query_for_routing})
-        print(f"LLM raw output for routing: '{raw_llm_output}'")
 
-        # Attempt to extract the JSON part from the raw output
-        json_string_from_output = extract_json_from_llm_output(raw_llm_output)
-        
-        updated_values = {"error": None} # Default to no error for this step
+def _parse_routing_output(raw_llm_output: str, current_query_for_routing: str) -> dict:
+    """Turns the router LLM's raw output into state updates (and caches valid decisions)."""
+    # Attempt to extract the JSON part from the raw output
+    json_string_from_output = extract_json_from_llm_output(raw_llm_output)
+    
+    updated_values = {"error": None} # Default to no error for this step
 
-        if json_string_from_output:
-            try:
-                decision_json = json.loads(json_string_from_output) 
-                decision = decision_json.get("data_source", "general")
-                print(f"Router decision (extracted from JSON): {decision}")
-
-                if decision == "sqlite":
-                    updated_values["data_source"] = "sqlite"
-                elif decision == "mongodb":
-                    updated_values["data_source"] = "mongodb"
-                elif decision == "meilisearch":
-                    updated_values["data_source"] = "meilisearch"
-                elif decision == "neo4j": 
-                    updated_values["data_source"] = "neo4j"
-                elif decision == "general": 
-                    print("Query classified as 'general' by LLM, initiating clarification.")
-                    updated_values["data_source"] = "clarification_needed" # NEW data_source state
-                    updated_values["clarification_question_needed"] = True
-                    updated_values["clarification_question_text"] = (
-                        "Your question seems a bit general or ambiguous for a direct database query. "
-                        "Could you please specify if you're looking for information about: \n"
-                        "1. Employees, Departments, or Projects (company data)? \n"
-                        "2. Scientific Research Papers? \n"
-                        "3. Support Tickets? \n"
-                        "4. Collaborations, research fields, or work done by Researchers? \n"
-                        "Please provide more details or rephrase your question focusing on one of these areas."
-                    )
-                    # Store the query that needs clarification
-                    updated_values["original_query_before_clarification"] = current_query_for_routing
-                else: # Unexpected value in "data_source" field of JSON
-                    updated_values["data_source"] = "end"
-                    updated_values["error"] = f"Router JSON contained an unexpected data_source value: {decision}"
-            except json.JSONDecodeError as json_err:
-                custom_error_msg = f"Failed to parse the extracted JSON from LLM output. Extracted string: '{json_string_from_output}'. Error: {json_err}"
-                print(f"JSON PARSING ERROR (after extraction attempt): {custom_error_msg}")
-                updated_values["error"] = custom_error_msg
-                updated_values["data_source"] = "end"
-        else: # JSON could not be extracted from LLM's output
-            custom_error_msg = f"LLM output for routing did not contain a recognizable JSON object. Raw output: '{raw_llm_output}'"
-            print(f"JSON EXTRACTION FAILED during routing: {custom_error_msg}")
+    if json_string_from_output:
+        try:
+            decision_json = json.loads(json_string_from_output) 
+            decision = decision_json.get("data_source", "general")
+            logger.info("Router decision (extracted from JSON): %s", decision)
+
+            updated_values.update(build_routing_update(decision, current_query_for_routing))
+            if decision in CACHEABLE_DECISIONS:
+                routing_cache.store(current_query_for_routing, decision)
+        except json.JSONDecodeError as json_err:
+            custom_error_msg = f"Failed to parse the extracted JSON from LLM output. Extracted string: '{json_string_from_output}'. Error: {json_err}"
+            logger.warning("JSON PARSING ERROR (after extraction attempt): %s", custom_error_msg)
             updated_values["error"] = custom_error_msg
             updated_values["data_source"] = "end"
-        
-        return {**current_state_snapshot, **updated_values}
+    else: # JSON could not be extracted from LLM's output
+        custom_error_msg = f"LLM output for routing did not contain a recognizable JSON object. Raw output: '{raw_llm_output}'"
+        logger.warning("JSON EXTRACTION FAILED during routing: %s", custom_error_msg)
+        updated_values["error"] = custom_error_msg
+        updated_values["data_source"] = "end"
+    
+    return updated_values
+
+
+def routing_error_values(e: Exception) -> dict:
+    """State updates for an exception raised while routing (e.g. the LLM call failed)."""
+    error_message_str = str(e).lower()
+    custom_error_msg = "" 
+
+    if "connection" in error_message_str or \
+       "timeout" in error_message_str or \
+       "network" in error_message_str or \
+       "service unavailable" in error_message_str or \
+       "max retries exceeded with url" in error_message_str:
+        custom_error_msg = (
+            "Failed to connect to the LLM service (Together AI). "
+            "Please check your internet connection and API key validity. "
+            f"Details: {e}"
+        )
+        logger.error("CONNECTION ERROR during routing: %s", custom_error_msg)
+    else: 
+        custom_error_msg = (
+            "An unexpected error occurred during the routing phase (e.g., during LLM call). "
+            f"Details: {e}"
+        )
+        logger.error("UNEXPECTED ERROR during routing: %s", custom_error_msg)
+    
+    return {"error": custom_error_msg, "data_source": "end"}
+
+
+def _routed_by_llm(current_state_snapshot: GraphState, raw_llm_output: str, route_path: str, llm_ms: float) -> GraphState:
+    """Parses the router LLM output and records the turn under `route_path` in route_stats."""
+    logger.debug("LLM raw output for routing: '%s'", raw_llm_output)
+    route_stats.record_routing(route_path, llm_ms)
+    set_span_attribute("route_path", route_path)
+    with span_timer("parse"):
+        routing_update = _parse_routing_output(raw_llm_output, current_state_snapshot["query"])
+    return with_route_confidence({**current_state_snapshot, **routing_update, "route_path": route_path})
+
+
+def route_with_llm(current_state_snapshot: GraphState, route_path: str = "two_step", spent_llm_ms: float = 0.0) -> GraphState:
+    """
+    The LLM half of route_query, also the fallback of the fused router; spent_llm_ms is
+    LLM time already spent on this turn's routing (a rejected fused call).
+    """
+    llm = get_llm() # Shared client; no per-call client setup or TLS handshake
+    # Get raw string output first to handle potential extra text from LLM
+    router_chain_text_output = ROUTER_PROMPT | llm | StringOutputParser() 
+
+    logger.debug("Attempting to invoke LLM for routing... (Waiting for API response)")
+    started_at = time.perf_counter()
+    raw_llm_output = router_chain_text_output.invoke({"query": current_state_snapshot["query"]})
+    llm_ms = spent_llm_ms + (time.perf_counter() - started_at) * 1000
+    return _routed_by_llm(current_state_snapshot, raw_llm_output, route_path, llm_ms)
+
+
+async def aroute_with_llm(current_state_snapshot: GraphState, route_path: str = "two_step", spent_llm_ms: float = 0.0) -> GraphState:
+    """Async version of route_with_llm."""
+    router_chain_text_output = ROUTER_PROMPT | get_llm() | StringOutputParser()
+
+    logger.debug("Attempting to invoke LLM for routing... (Waiting for API response)")
+    started_at = time.perf_counter()
+    raw_llm_output = await router_chain_text_output.ainvoke({"query": current_state_snapshot["query"]})
+    llm_ms = spent_llm_ms + (time.perf_counter() - started_at) * 1000
+    return _routed_by_llm(current_state_snapshot, raw_llm_output, route_path, llm_ms)
+
+
+def route_query(state: GraphState) -> GraphState:
+    """
+    Routes the user's query to an appropriate data source, triggers clarification if needed,
+    and returns a new state object.
+    """
+    logger.info("---ROUTING QUERY---")
+    current_state_snapshot = state.copy()
+    try:
+        current_state_snapshot, finished_state = start_routing(state)
+        if finished_state is not None:
+            return finished_state
+        return route_with_llm(current_state_snapshot)
 
     except Exception as e: # Catch other errors like connection errors
-        error_message_str = str(e).lower()
-        custom_error_msg = "" 
-
-        if "connection" in error_message_str or \
-           "timeout" in error_message_str or \
-           "network" in error_message_str or \
-           "service unavailable" in error_message_str or \
-           "max retries exceeded with url" in error_message_str:
-            custom_error_msg = (
-                "Failed to connect to the LLM service (Together AI). "
-                "Please check your internet connection and API key validity. "
-                f"Details: {e}"
-            )
-            print(f"CONNECTION ERROR during routing: {custom_error_msg}")
-        else: 
-            custom_error_msg = (
-                "An unexpected error occurred during the routing phase (e.g., during LLM call). "
-                f"Details: {e}"
-            )
-            print(f"UNEXPECTED ERROR during routing: {custom_error_msg}")
-        
-        return {
-            **current_state_snapshot, 
-            "error": custom_error_msg, 
-            "data_source": "end"
-        }
\ No newline at end of file
+        return {**current_state_snapshot, **routing_error_values(e)}
+
+
+async def aroute_query(state: GraphState) -> GraphState:
+    """
+    Async version of route_query: identical decisions, but the LLM call is awaited
+    so the event loop can serve other turns meanwhile.
+    """
+    logger.info("---ROUTING QUERY (async)---")
+    current_state_snapshot = state.copy()
+    try:
+        current_state_snapshot, finished_state = start_routing(state)
+        if finished_state is not None:
+            return finished_state
+        return await aroute_with_llm(current_state_snapshot)
+
+    except Exception as e:
+        return {**current_state_snapshot, **routing_error_values(e)}
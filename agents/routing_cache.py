@@ -0,0 +1,209 @@
+# agents/routing_cache.py
+import atexit
+import logging
+import math
+import threading
+from collections import Counter, OrderedDict, defaultdict
+
+from tools.cache_utils import cache_path, load_json, normalize_question, save_json_atomic
+
+logger = logging.getLogger(__name__)
+
+# --- Routing Cache Settings ---
+ROUTING_CACHE_MAX_ENTRIES = 1000       # LRU bound on remembered questions
+ROUTING_CACHE_SIMILARITY_THRESHOLD = 0.82  # Cosine similarity needed to reuse a cached route
+ROUTING_CACHE_FILE = cache_path("routing_cache.json")
+ROUTING_CACHE_IDF_REFRESH_RATIO = 0.1  # Recompute cached entry vectors once the entry count moves this much
+ROUTING_CACHE_PERSIST_INTERVAL = 5.0   # Seconds to batch routing decisions before rewriting the file
+
+
+def extract_features(normalized_query: str) -> Counter:
+    """
+    Bag of features for the TF-IDF vectorizer: word unigrams, word bigrams and
+    character trigrams (the trigrams make it robust to plurals and small typos).
+    """
+    words = normalized_query.split()
+    features = Counter(f"w:{w}" for w in words)
+    features.update(f"b:{a}_{b}" for a, b in zip(words, words[1:]))
+    for word in words:
+        padded = f"#{word}#"
+        features.update(f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2))
+    return features
+
+
+class RoutingCache:
+    """
+    Local, CPU-only semantic cache for routing decisions.
+    Questions are normalized and vectorized with TF-IDF over the cached questions;
+    a lookup returns the cached data_source of the nearest neighbour if its cosine
+    similarity clears the threshold. Bounded with LRU eviction and persisted to disk
+    at most every `persist_interval` seconds (and at exit).
+    """
+
+    def __init__(self, path=ROUTING_CACHE_FILE, max_entries=ROUTING_CACHE_MAX_ENTRIES,
+                 threshold=ROUTING_CACHE_SIMILARITY_THRESHOLD, persist_interval=ROUTING_CACHE_PERSIST_INTERVAL):
+        self.path = path
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.persist_interval = persist_interval
+
+        self._entries = OrderedDict()  # normalized query -> (data_source, features)
+        self._postings = defaultdict(set)  # feature -> normalized queries containing it
+        self._doc_freq = Counter()
+        # normalized query -> (weights, norm); IDF drifts slowly, so vectors are reused until
+        # the entry count moves by ROUTING_CACHE_IDF_REFRESH_RATIO since they were computed.
+        self._vectors = {}
+        self._vectors_total_docs = 0
+        self._lock = threading.Lock()
+        self._persist_timer = None
+        self.hits = 0
+        self.exact_hits = 0
+        self.misses = 0
+        self._load()
+
+    # --- Public API ---
+    def lookup(self, query: str):
+        """Returns the cached data_source for `query` (or a near-duplicate of it), else None."""
+        normalized = normalize_question(query)
+        if not normalized:
+            return None
+        with self._lock:
+            entry = self._entries.get(normalized)
+            if entry is not None:
+                self._entries.move_to_end(normalized)
+                self.hits += 1
+                self.exact_hits += 1
+                return entry[0]
+
+            best_key, best_score = self._nearest_locked(extract_features(normalized))
+            if best_key is not None and best_score >= self.threshold:
+                self._entries.move_to_end(best_key)
+                self.hits += 1
+                logger.debug("Routing cache: '%s' matched '%s' (similarity %.3f).", normalized, best_key, best_score)
+                return self._entries[best_key][0]
+            self.misses += 1
+            return None
+
+    def store(self, query: str, data_source: str) -> None:
+        """Remembers the routing decision for `query`; the file is rewritten on the next flush."""
+        normalized = normalize_question(query)
+        if not normalized:
+            return
+        with self._lock:
+            self._insert_locked(normalized, data_source)
+            if self._persist_timer is None:
+                self._persist_timer = threading.Timer(self.persist_interval, self.flush)
+                self._persist_timer.daemon = True
+                self._persist_timer.start()
+
+    def flush(self) -> None:
+        """Writes pending routing decisions to disk."""
+        with self._lock:
+            if self._persist_timer is None:
+                return
+            self._persist_timer.cancel()
+            self._persist_timer = None
+            snapshot = [[key, ds] for key, (ds, _) in self._entries.items()]
+        try:
+            save_json_atomic(self.path, snapshot)
+        except OSError as e:
+            logger.warning("Could not persist routing cache to '%s': %s", self.path, e)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._postings.clear()
+            self._doc_freq.clear()
+            self._vectors.clear()
+            if self._persist_timer is not None:
+                self._persist_timer.cancel()
+                self._persist_timer = None
+        save_json_atomic(self.path, [])
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "exact_hits": self.exact_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    # --- Internals ---
+    def _load(self):
+        for item in load_json(self.path, []):
+            try:
+                key, data_source = item
+            except (TypeError, ValueError):
+                continue
+            self._insert_locked(key, data_source)
+
+    def _insert_locked(self, key, data_source):
+        if key in self._entries:
+            self._entries[key] = (data_source, self._entries[key][1])
+            self._entries.move_to_end(key)
+            return
+        features = extract_features(key)
+        self._entries[key] = (data_source, features)
+        for feature in features:
+            self._postings[feature].add(key)
+            self._doc_freq[feature] += 1
+        while len(self._entries) > self.max_entries:
+            self._evict_oldest_locked()
+
+    def _evict_oldest_locked(self):
+        key, (_, features) = self._entries.popitem(last=False)
+        self._vectors.pop(key, None)
+        for feature in features:
+            self._postings[feature].discard(key)
+            if not self._postings[feature]:
+                del self._postings[feature]
+            self._doc_freq[feature] -= 1
+            if self._doc_freq[feature] <= 0:
+                del self._doc_freq[feature]
+
+    def _idf(self, feature, total_docs):
+        return math.log((1 + total_docs) / (1 + self._doc_freq.get(feature, 0))) + 1.0
+
+    def _weights(self, features, total_docs):
+        return {f: (1.0 + math.log(tf)) * self._idf(f, total_docs) for f, tf in features.items()}
+
+    def _vector_locked(self, key, total_docs):
+        vector = self._vectors.get(key)
+        if vector is None:
+            weights = self._weights(self._entries[key][1], total_docs)
+            vector = self._vectors[key] = (weights, math.sqrt(sum(w * w for w in weights.values())))
+        return vector
+
+    def _nearest_locked(self, query_features):
+        if not self._entries:
+            return None, 0.0
+        total_docs = len(self._entries)
+        if abs(total_docs - self._vectors_total_docs) > ROUTING_CACHE_IDF_REFRESH_RATIO * self._vectors_total_docs:
+            self._vectors.clear()
+            self._vectors_total_docs = total_docs
+        query_weights = self._weights(query_features, total_docs)
+        query_norm = math.sqrt(sum(w * w for w in query_weights.values()))
+        if query_norm == 0:
+            return None, 0.0
+
+        # Only questions sharing at least one feature can score above zero.
+        candidates = set()
+        for feature in query_weights:
+            candidates.update(self._postings.get(feature, ()))
+
+        best_key, best_score = None, 0.0
+        for key in candidates:
+            doc_weights, doc_norm = self._vector_locked(key, total_docs)
+            dot = sum(w * doc_weights.get(f, 0.0) for f, w in query_weights.items())
+            score = dot / (query_norm * doc_norm) if doc_norm else 0.0
+            if score > best_score:
+                best_key, best_score = key, score
+        return best_key, best_score
+
+
+# Process-wide instance used by the router.
+routing_cache = RoutingCache()
+atexit.register(routing_cache.flush)
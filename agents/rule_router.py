@@ -0,0 +1,133 @@
+# agents/rule_router.py
+import re
+import threading
+from collections import Counter
+from typing import NamedTuple, Optional
+
+from tools.cache_utils import normalize_question
+
+# A decision is taken only if the best backend beats the runner-up by this much;
+# otherwise the query is treated as ambiguous and left to the LLM router.
+RULE_ROUTER_MARGIN = 2.0
+# Minimum summed weight for a decision, so a single weak hint (e.g. "wrote") is not enough.
+RULE_ROUTER_MIN_SCORE = 2.0
+
+
+class RoutingRule(NamedTuple):
+    name: str
+    data_source: str
+    pattern: "re.Pattern"
+    weight: float
+
+
+class RuleRoutingResult(NamedTuple):
+    data_source: Optional[str]  # None when no rule fired or the match was ambiguous
+    scores: dict                # data_source -> summed rule weight
+    matched_rules: list         # names of the rules that fired
+
+
+def _rule(name, data_source, pattern, weight=1.0):
+    # Patterns run against normalize_question() output: lowercase, no punctuation.
+    return RoutingRule(name, data_source, re.compile(pattern), weight)
+
+
+def _entity_rule(name, data_source, entities, weight=3.0):
+    alternatives = "|".join(re.escape(normalize_question(e)) for e in entities)
+    return _rule(name, data_source, rf"\b(?:{alternatives})\b", weight)
+
+
+# Entities that exist in exactly one store (mirrors database/populate_db.py).
+SQLITE_PROJECTS = [
+    "Multi-Agent RAG System", "Customer Churn Prediction", "Inventory Management Dashboard",
+    "API Integration Service", "Real-time Analytics Platform", "Employee Onboarding Automation",
+    "CI/CD Pipeline Optimization",
+]
+SQLITE_ROLES = [
+    "Data Scientist", "Project Manager", "Lead Engineer", "Software Engineer",
+    "Senior Data Scientist", "HR Specialist", "DevOps Engineer",
+]
+NEO4J_TOPICS = ["AI in Healthcare"]
+
+ROUTING_RULES = [
+    # --- MeiliSearch: support tickets ---
+    _rule("ticket_id", "meilisearch", r"\bt\d{3,}\b", 3.0),
+    _rule("ticket_keyword", "meilisearch", r"\b(?:support )?tickets?\b", 3.0),
+    _rule("raised_by", "meilisearch", r"\braised\b", 1.0),
+    # --- MongoDB: research papers ---
+    _rule("paper_keyword", "mongodb", r"\bpapers?\b", 3.0),
+    _rule("publication_terms", "mongodb", r"\b(?:journal|journals|publications?|published|preprints?|conference|arxiv|neurips)\b", 2.0),
+    _rule("authorship", "mongodb", r"\b(?:authors?|authored|wrote|written by)\b", 1.0),
+    _rule("paper_keywords", "mongodb", r"\bkeywords?\b", 1.0),
+    # --- Neo4j: researcher network ---
+    _rule("collaboration", "neo4j", r"\bcollaborat\w*\b", 3.0),
+    _rule("research_field", "neo4j", r"\bresearch fields?\b|\bfield of research\b", 3.0),
+    _rule("researcher_keyword", "neo4j", r"\bresearchers?\b", 2.0),
+    _rule("projects_or_topics", "neo4j", r"\b(?:projects? or topics?|topics? or projects?)\b", 3.0),
+    _entity_rule("neo4j_topic_entity", "neo4j", NEO4J_TOPICS),
+    # --- SQLite: employees, departments, projects ---
+    _rule("employee_keyword", "sqlite", r"\bemployees?\b|\bstaff\b", 3.0),
+    _rule("department_keyword", "sqlite", r"\bdepartments?\b", 3.0),
+    _rule("project_status", "sqlite", r"\bproject status\b|\bstatus of (?:the )?\w+(?: \w+){0,5} project\b|\b(?:active|completed|paused|planning) projects?\b", 3.0),
+    _rule("project_assignment", "sqlite", r"\bprojects? (?:assigned|for)\b|\bassigned to\b", 2.0),
+    _entity_rule("sqlite_project_entity", "sqlite", SQLITE_PROJECTS),
+    _entity_rule("sqlite_role_entity", "sqlite", SQLITE_ROLES),
+]
+
+
+class RuleRouter:
+    """
+    Deterministic fast-path router. Compiled keyword/regex rules and entity
+    dictionaries score each backend; a backend is chosen only when it clearly
+    wins, so ambiguous questions still go to the LLM router.
+    """
+
+    def __init__(self, rules=ROUTING_RULES, margin=RULE_ROUTER_MARGIN, min_score=RULE_ROUTER_MIN_SCORE):
+        self.rules = rules
+        self.margin = margin
+        self.min_score = min_score
+        self._lock = threading.Lock()
+        self._rule_hits = Counter()
+        self._outcomes = Counter()  # decided / ambiguous / no_match
+
+    def classify(self, query: str) -> RuleRoutingResult:
+        normalized = normalize_question(query)
+        scores = Counter()
+        matched = []
+        for rule in self.rules:
+            if rule.pattern.search(normalized):
+                scores[rule.data_source] += rule.weight
+                matched.append(rule.name)
+
+        ranked = scores.most_common()
+        if not ranked:
+            outcome, decision = "no_match", None
+        elif ranked[0][1] >= self.min_score and \
+             (len(ranked) == 1 or ranked[0][1] - ranked[1][1] >= self.margin):
+            outcome, decision = "decided", ranked[0][0]
+        else:
+            outcome, decision = "ambiguous", None
+
+        with self._lock:
+            self._outcomes[outcome] += 1
+            self._rule_hits.update(matched)
+        return RuleRoutingResult(decision, dict(scores), matched)
+
+    def stats(self) -> dict:
+        """Per-rule hit rates plus the share of queries routed without the LLM."""
+        with self._lock:
+            total = sum(self._outcomes.values())
+            return {
+                "queries": total,
+                "decided": self._outcomes["decided"],
+                "ambiguous": self._outcomes["ambiguous"],
+                "no_match": self._outcomes["no_match"],
+                "llm_bypass_rate": self._outcomes["decided"] / total if total else 0.0,
+                "rule_hit_rates": {
+                    rule.name: (self._rule_hits[rule.name] / total if total else 0.0)
+                    for rule in self.rules
+                },
+            }
+
+
+# Process-wide instance used by the router.
+rule_router = RuleRouter()
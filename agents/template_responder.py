@@ -0,0 +1,146 @@
+# agents/template_responder.py
+#
+# Fast path of the response node: small, simple results (one value, one row, or a short
+# list of flat rows with known column names) and empty results are rendered from a template
+# instead of asking the response LLM to restate them. Larger or nested results still go to
+# the LLM.
+#
+#   TEMPLATE_RESPONSES_ENABLED=0   always use the response LLM
+import json
+import os
+import re
+import threading
+from collections import Counter
+from typing import Optional
+
+from graph.telemetry import set_span_attribute
+from tools.query_result import QueryResult, ROW_UNITS
+
+# --- Template Response Settings ---
+TEMPLATE_RESPONSES_ENABLED = os.getenv("TEMPLATE_RESPONSES_ENABLED", "1") == "1"
+TEMPLATE_MAX_ROWS = 5          # Longer lists are summarized by the LLM
+TEMPLATE_MAX_FIELDS = 4        # Wider rows are summarized by the LLM
+TEMPLATE_MAX_VALUE_CHARS = 200 # Long text values (e.g. abstracts) are summarized by the LLM
+# Backends whose rows match the query exactly. MeiliSearch hits are relevance-ranked candidates
+# that may not match every term of the question, so the LLM still picks the relevant ones.
+TEMPLATED_DATA_SOURCES = ("sqlite", "mongodb", "neo4j")
+
+EMPTY_RESPONSE = "I could not find any information matching your question in the database."
+
+_AGGREGATE_COLUMN = re.compile(r"^\s*(\w+)\s*\(.*\)\s*$")
+_TABLE_ALIAS = re.compile(r"^(?:[a-z]{1,2}|t\d+)$", re.IGNORECASE)
+
+
+def column_label(column: str) -> str:
+    """Readable label for a result column: "T2.name" -> "Name", "COUNT(*)" -> "Count", "collaborator.name" -> "Collaborator name"."""
+    aggregate = _AGGREGATE_COLUMN.match(column)
+    if aggregate:
+        column = aggregate.group(1).lower()
+    parts = column.split(".")
+    if len(parts) > 1 and _TABLE_ALIAS.match(parts[0]):
+        parts = parts[1:] # SQL table aliases carry no meaning for the reader
+    label = " ".join(parts).replace("_", " ").strip()
+    return label[:1].upper() + label[1:]
+
+
+def _is_simple_value(value) -> bool:
+    if isinstance(value, str):
+        return len(value) <= TEMPLATE_MAX_VALUE_CHARS
+    return value is None or isinstance(value, (int, float, bool))
+
+
+def _format_value(value) -> str:
+    if value is None:
+        return "(none)"
+    return value if isinstance(value, str) else json.dumps(value)
+
+
+def _labelled_fields(result: QueryResult) -> Optional[list]:
+    """Rows as [(label, value), ...] lists, or None when the result is not flat and labelled."""
+    rows = []
+    for row in result.rows:
+        if isinstance(row, dict):
+            fields = [(column_label(key), value) for key, value in row.items() if key != "_id"]
+        elif isinstance(row, (tuple, list)) and result.columns and len(row) == len(result.columns):
+            fields = [(column_label(column), value) for column, value in zip(result.columns, row)]
+        else:
+            return None
+        if not fields or len(fields) > TEMPLATE_MAX_FIELDS or not all(_is_simple_value(v) for _, v in fields):
+            return None
+        rows.append(fields)
+    return rows
+
+
+def _render_fields(fields: list) -> str:
+    return ", ".join(f"{label}: {_format_value(value)}" for label, value in fields)
+
+
+def render_template(result: QueryResult) -> tuple:
+    """
+    (shape, answer) for results the template covers, (None, None) for the rest.
+    Shapes: "empty", "scalar", "single_row", "short_list".
+    """
+    if not isinstance(result, QueryResult) or result.is_error or result.data_source not in TEMPLATED_DATA_SOURCES:
+        return None, None
+    if result.is_empty:
+        return "empty", EMPTY_RESPONSE
+    if result.truncated or len(result.rows) > TEMPLATE_MAX_ROWS:
+        return None, None
+
+    # A single unlabelled value (e.g. a SQLite row without column names) needs no label
+    if len(result.rows) == 1 and isinstance(result.rows[0], (tuple, list)) and len(result.rows[0]) == 1 \
+            and not result.columns and _is_simple_value(result.rows[0][0]):
+        return "scalar", _format_value(result.rows[0][0])
+
+    rows = _labelled_fields(result)
+    if rows is None:
+        return None, None
+    if len(rows) == 1:
+        fields = rows[0]
+        if len(fields) == 1:
+            return "scalar", _render_fields(fields)
+        return "single_row", "Here is what I found:\n" + "\n".join(f"- {label}: {_format_value(value)}" for label, value in fields)
+
+    unit = ROW_UNITS.get(result.data_source, "rows")
+    if all(len(fields) == 1 for fields in rows) and len({fields[0][0] for fields in rows}) == 1:
+        # One column: list the values under its label
+        lines = [f"- {_format_value(fields[0][1])}" for fields in rows]
+        return "short_list", f"{rows[0][0][0]} ({len(rows)} {unit}):\n" + "\n".join(lines)
+    return "short_list", f"I found {len(rows)} {unit}:\n" + "\n".join(f"- {_render_fields(fields)}" for fields in rows)
+
+
+class TemplateResponseStats:
+    """How many answers were rendered from a template (per shape) versus by the LLM."""
+
+    def __init__(self):
+        self._shapes = Counter()
+        self._llm = 0
+        self._lock = threading.Lock()
+
+    def record(self, shape: Optional[str]) -> None:
+        with self._lock:
+            if shape is None:
+                self._llm += 1
+            else:
+                self._shapes[shape] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            templated = sum(self._shapes.values())
+            total = templated + self._llm
+            return {"template": templated, "llm": self._llm, "by_shape": dict(self._shapes),
+                    "llm_bypass_rate": templated / total if total else 0.0}
+
+
+template_stats = TemplateResponseStats()
+
+
+def template_response(context) -> Optional[str]:
+    """The templated answer for the turn's query result, or None if the response LLM should answer."""
+    if not TEMPLATE_RESPONSES_ENABLED:
+        return None
+    shape, answer = render_template(context)
+    template_stats.record(shape)
+    if shape is not None:
+        set_span_attribute("response_template", shape)
+    return answer
@@ -0,0 +1,164 @@
+# api/scheduler.py
+import asyncio
+import itertools
+import logging
+import os
+import time
+
+from graph.builder import astream_turn
+from agents.response_streaming import TokenStreamHandler
+
+logger = logging.getLogger(__name__)
+
+# --- Serving Settings ---
+# Turns running at once. Each turn mostly waits on the LLM API and the databases,
+# so this is bounded by upstream rate limits rather than CPU.
+API_WORKERS = int(os.getenv("API_WORKERS", "8"))
+# Turns allowed to wait for a worker; beyond this, new requests are rejected (HTTP 503).
+API_QUEUE_SIZE = int(os.getenv("API_QUEUE_SIZE", "64"))
+# Wall-clock budget for one turn, queueing time excluded.
+API_REQUEST_TIMEOUT = float(os.getenv("API_REQUEST_TIMEOUT", "120"))
+
+# Sentinel put on a job's event queue after its last event.
+_END_OF_EVENTS = object()
+
+
+class SchedulerSaturatedError(Exception):
+    """Raised by TurnScheduler.submit when the wait queue is full."""
+
+
+class TurnJob:
+    """One queued question. Node events are delivered on `events` as the graph runs."""
+
+    def __init__(self, job_id: int, query: str):
+        self.id = job_id
+        self.query = query
+        self.events = asyncio.Queue()
+        self.final_state = None
+        self.error = None
+        self.cancelled = False
+        self.submitted_at = time.monotonic()
+        self.started_at = None
+        self.finished_at = None
+
+    async def stream(self):
+        """
+        Yields {"node": name, "state": state} after each graph node and {"token": text}
+        for each answer token, until the turn is over.
+        """
+        while True:
+            event = await self.events.get()
+            if event is _END_OF_EVENTS:
+                return
+            yield event
+
+    async def result(self) -> dict:
+        """Waits for the turn to finish and returns its final state (raises on failure/timeout)."""
+        async for _ in self.stream():
+            pass
+        if self.error is not None:
+            raise self.error
+        return self.final_state
+
+
+class TurnScheduler:
+    """
+    Runs graph turns for many concurrent clients: a bounded wait queue in front of
+    a fixed pool of worker tasks, with a per-turn timeout. When the queue is full
+    submit() fails fast instead of letting latency grow without bound.
+    """
+
+    def __init__(self, workers=API_WORKERS, queue_size=API_QUEUE_SIZE, timeout=API_REQUEST_TIMEOUT):
+        self.workers = workers
+        self.timeout = timeout
+        self._queue = asyncio.Queue(maxsize=queue_size)
+        self._tasks = []
+        self._ids = itertools.count(1)
+        self._busy = 0
+        self.completed = 0
+        self.failed = 0
+        self.timed_out = 0
+        self.rejected = 0
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        logger.info("Turn scheduler started: %s workers, queue size %s.", self.workers, self._queue.maxsize)
+
+    async def stop(self) -> None:
+        """Cancels the workers; queued turns that never started are failed."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        while not self._queue.empty():
+            job = self._queue.get_nowait()
+            self._finish(job, error=RuntimeError("Server is shutting down."))
+
+    def submit(self, query: str) -> TurnJob:
+        job = TurnJob(next(self._ids), query)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise SchedulerSaturatedError(
+                f"All {self.workers} workers are busy and {self._queue.maxsize} requests are already waiting."
+            )
+        return job
+
+    def cancel(self, job: TurnJob) -> None:
+        """Marks a job as abandoned by its client (e.g. disconnected); it is skipped if not started."""
+        job.cancelled = True
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "busy_workers": self._busy,
+            "queued": self._queue.qsize(),
+            "queue_size": self._queue.maxsize,
+            "completed": self.completed,
+            "failed": self.failed,
+            "timed_out": self.timed_out,
+            "rejected": self.rejected,
+        }
+
+    # --- Internals ---
+    async def _worker(self, worker_id: int):
+        while True:
+            job = await self._queue.get()
+            try:
+                if job.cancelled:
+                    self._finish(job, error=RuntimeError("Request was cancelled by the client."))
+                    continue
+                self._busy += 1
+                job.started_at = time.monotonic()
+                try:
+                    await asyncio.wait_for(self._run(job), timeout=self.timeout)
+                    self.completed += 1
+                    self._finish(job)
+                except asyncio.TimeoutError:
+                    self.timed_out += 1
+                    self._finish(job, error=asyncio.TimeoutError(
+                        f"Request exceeded the {self.timeout:g}s time limit."))
+                except Exception as e:
+                    self.failed += 1
+                    logger.error("Turn %s failed on worker %s: %s", job.id, worker_id, e)
+                    self._finish(job, error=e)
+                finally:
+                    self._busy -= 1
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: TurnJob):
+        token_handler = TokenStreamHandler(lambda token: job.events.put_nowait({"token": token}))
+        # Database queries get no more than what is left of the turn's time limit
+        async for output in astream_turn(job.query, callbacks=[token_handler], time_budget=self.timeout):
+            for node_name, state in output.items():
+                job.final_state = state
+                job.events.put_nowait({"node": node_name, "state": state})
+
+    def _finish(self, job: TurnJob, error: Exception = None):
+        job.error = error
+        job.finished_at = time.monotonic()
+        job.events.put_nowait(_END_OF_EVENTS)
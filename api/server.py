@@ -0,0 +1,164 @@
+# api/server.py
+#
+# Headless HTTP serving layer around the compiled graph.
+# Run with:  uvicorn api.server:app --host 0.0.0.0 --port 8000
+#
+#   POST /query          {"query": "..."} -> final answer as JSON
+#   POST /query/stream   {"query": "..."} -> Server-Sent Events: one per graph node, answer tokens, then the answer
+#   GET  /health         liveness probe
+#   GET  /stats          scheduler, pool and cache counters, route path comparison, per-node latency percentiles
+#
+# Set LOG_LEVEL=WARNING (and LOG_ASYNC=1) to keep per-turn logging off the serving path.
+import asyncio
+import json
+from contextlib import asynccontextmanager
+
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+from logging_config import configure_logging, shutdown_logging
+from api.scheduler import TurnScheduler, SchedulerSaturatedError
+from agents.llm_registry import aclose_llm_clients
+from agents.query_cache import query_cache
+from agents.route_stats import route_stats
+from agents.routing_cache import routing_cache
+from agents.template_responder import template_stats
+from agents.rule_router import rule_router
+from graph.telemetry import telemetry_summary
+from tools.async_db_tools import aclose_all_connections
+from tools.connection_pool import async_pool_stats
+from tools.query_guard import guard_stats
+from tools.query_timeouts import timeout_stats
+from tools.result_cache import result_cache
+from tools.schema_cache import schema_cache
+
+configure_logging()
+
+# Seconds a rejected client is asked to wait before retrying (Retry-After header).
+API_RETRY_AFTER = 5
+
+scheduler = TurnScheduler()
+
+
+def _to_json(value) -> str:
+    # Graph state may hold raw database rows (tuples, datetimes, ObjectIds...).
+    return json.dumps(value, default=str)
+
+
+def _answer_payload(state: dict) -> dict:
+    """The client-facing part of a final graph state."""
+    state = state or {}
+    payload = {
+        "response": state.get("response"),
+        "data_source": state.get("data_source"),
+        "generated_query": state.get("generated_query"),
+        "error": state.get("error"),
+    }
+    if state.get("data_source") == "clarification_needed":
+        payload["clarification_question"] = state.get("clarification_question_text")
+    return payload
+
+
+async def _read_query(request):
+    try:
+        body = await request.json()
+    except json.JSONDecodeError:
+        return None
+    query = body.get("query") if isinstance(body, dict) else None
+    return query.strip() if isinstance(query, str) and query.strip() else None
+
+
+def _saturated_response(e: SchedulerSaturatedError) -> JSONResponse:
+    return JSONResponse({"error": str(e)}, status_code=503, headers={"Retry-After": str(API_RETRY_AFTER)})
+
+
+async def query_endpoint(request):
+    query = await _read_query(request)
+    if query is None:
+        return JSONResponse({"error": 'Request body must be JSON like {"query": "..."}.'}, status_code=400)
+    try:
+        job = scheduler.submit(query)
+    except SchedulerSaturatedError as e:
+        return _saturated_response(e)
+
+    try:
+        final_state = await job.result()
+    except asyncio.TimeoutError as e:
+        return JSONResponse({"error": str(e)}, status_code=504)
+    except Exception as e:
+        return JSONResponse({"error": f"Request failed: {e}"}, status_code=500)
+    return JSONResponse(json.loads(_to_json(_answer_payload(final_state))))
+
+
+async def query_stream_endpoint(request):
+    query = await _read_query(request)
+    if query is None:
+        return JSONResponse({"error": 'Request body must be JSON like {"query": "..."}.'}, status_code=400)
+    try:
+        job = scheduler.submit(query)
+    except SchedulerSaturatedError as e:
+        return _saturated_response(e)
+
+    async def event_source():
+        try:
+            async for event in job.stream():
+                if "token" in event:
+                    yield f"event: token\ndata: {_to_json(event['token'])}\n\n"
+                    continue
+                node_event = {"node": event["node"], **_answer_payload(event["state"])}
+                yield f"event: node\ndata: {_to_json(node_event)}\n\n"
+            if job.error is not None:
+                yield f"event: error\ndata: {_to_json({'error': str(job.error)})}\n\n"
+            else:
+                yield f"event: final\ndata: {_to_json(_answer_payload(job.final_state))}\n\n"
+        finally:
+            # Client went away before the turn started: don't spend a worker on it.
+            scheduler.cancel(job)
+
+    return StreamingResponse(event_source(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+async def health_endpoint(request):
+    return JSONResponse({"status": "ok"})
+
+
+async def stats_endpoint(request):
+    return JSONResponse(json.loads(_to_json({
+        "scheduler": scheduler.stats(),
+        "pools": async_pool_stats(),
+        "rule_router": rule_router.stats(),
+        "route_paths": route_stats.stats(),
+        "routing_cache": routing_cache.stats(),
+        "query_cache": query_cache.stats(),
+        "result_cache": result_cache.stats(),
+        "query_guard": guard_stats.stats(),
+        "query_timeouts": timeout_stats.stats(),
+        "schema_cache": schema_cache.stats(),
+        "template_responses": template_stats.stats(),
+        "nodes": telemetry_summary(),
+    })))
+
+
+@asynccontextmanager
+async def lifespan(app):
+    scheduler.start()
+    try:
+        yield
+    finally:
+        await scheduler.stop()
+        await aclose_all_connections() # Release the async database pools of this loop
+        await aclose_llm_clients()
+        shutdown_logging()
+
+
+app = Starlette(
+    routes=[
+        Route("/query", query_endpoint, methods=["POST"]),
+        Route("/query/stream", query_stream_endpoint, methods=["POST"]),
+        Route("/health", health_endpoint, methods=["GET"]),
+        Route("/stats", stats_endpoint, methods=["GET"]),
+    ],
+    lifespan=lifespan,
+)
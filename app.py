@@ -1,5 +1,22 @@
 # app.py
-from graph.builder import app
+from logging_config import configure_logging, shutdown_logging
+from graph.builder import app, GRAPH_RUN_CONFIG
+from graph.state import initial_state
+from tools.db_tools import close_all_connections
+from agents.llm_registry import close_llm_clients
+from agents.response_streaming import TokenStreamHandler
+from graph.telemetry import TELEMETRY_FILE, format_summary, telemetry_summary
+
+def make_token_printer():
+    """Returns a callback that prints answer tokens as they arrive, under the answer heading."""
+    started = False
+    def print_token(token: str):
+        nonlocal started
+        if not started:
+            print("\n✅ Final Answer:")
+            started = True
+        print(token, end="", flush=True)
+    return print_token
 
 def main():
     """Main function to run the multi-agent RAG system."""
@@ -15,28 +32,15 @@ def main():
             break
         
         
-        #------------------------------------------------------    
         # The initial state for the graph
-        # inputs = {"query": user_query, "error": None}
+        inputs = initial_state(user_query)
         
-        inputs = {
-            "query": user_query,
-            "data_source": None, 
-            "generated_query": None,
-            "context": None,
-            "response": None,
-            "error": None,
-            "original_user_query": user_query, 
-            "initial_generated_query": None,
-            "last_failed_query": None,
-            "needs_query_refinement": False, 
-            "refinement_attempt_count": 0  
-                }
-        #------------------------------------------------------    
+        # Answer tokens are printed by the handler as the response node streams them
+        token_handler = TokenStreamHandler(make_token_printer(), on_end=print)
         
         # Invoke the graph
         # The .stream() method lets us see the output of each node as it runs
-        for output in app.stream(inputs, {"recursion_limit": 100}):
+        for output in app.stream(inputs, {**GRAPH_RUN_CONFIG, "callbacks": [token_handler]}):
             # The key is the name of the node that just ran
             for key, value in output.items():
                 print(f"--- Output from node: {key} ---")
@@ -45,8 +49,22 @@ def main():
 
         # The final state is the last item in the stream
         final_state = value
-        print("\n✅ Final Answer:")
-        print(final_state.get("response"))
+        if token_handler.streamed:
+            print(f"⏱️ First token after {token_handler.time_to_first_token:.2f}s, "
+                  f"full answer after {token_handler.total_time:.2f}s")
+        else: # Error messages and clarifications are not streamed
+            print("\n✅ Final Answer:")
+            print(final_state.get("response"))
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    configure_logging() # Agent progress goes to stderr; LOG_LEVEL=DEBUG for raw LLM output and queries
+    try:
+        main()
+    finally:
+        summary = telemetry_summary()
+        if summary: # Per-node latency percentiles (ms) for this session; spans are also in TELEMETRY_FILE
+            print(f"\nNode latency for this session (ms; spans exported to {TELEMETRY_FILE}):")
+            print(format_summary(summary))
+        close_all_connections() # Release pooled database connections on exit
+        close_llm_clients()
+        shutdown_logging()
\ No newline at end of file
@@ -0,0 +1,161 @@
+# benchmarks/fake_llm.py
+#
+# Deterministic stand-in for the ChatTogether client: recognizes which agent's prompt it
+# was given (router, fused router, query generators, refiner, response generator) and
+# returns a canned answer after a configurable delay. Responses are streamed in chunks like
+# the real client, and report token usage so the telemetry spans carry token counts.
+import asyncio
+import json
+import re
+import time
+from typing import Any, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from graph.telemetry import llm_telemetry_handler
+
+# Keywords the fake router uses when the rule router and the routing cache did not decide.
+ROUTING_KEYWORDS = (
+    ("meilisearch", ("ticket",)),
+    ("neo4j", ("collaborat", "research field", "researcher")),
+    ("mongodb", ("paper", "publication", "author", "keyword")),
+    ("sqlite", ("employee", "project", "department", "engineer", "manager")),
+)
+
+# Canned queries, one per backend, chosen to return rows from the benchmark stores.
+CANNED_QUERIES = {
+    "sqlite": "SELECT e.name, e.role, d.name AS department FROM employees e JOIN departments d ON e.department_id = d.id;",
+    "mongodb": '{"year": {"$gte": 2020}}',
+    "meilisearch": "MySQL",
+    "neo4j": "MATCH (r:Researcher)-[:COLLABORATES_WITH]-(c:Researcher) RETURN r.name AS researcher, c.name AS collaborator;",
+}
+
+CANNED_ANSWER = ("Based on the query results, here is the information you asked for: the matching records "
+                 "are listed above, and the result covers every row the database returned.")
+
+_GENERATOR_MARKERS = (
+    ("You are a SQLite expert", "sqlite"),
+    ("You are a MongoDB expert", "mongodb"),
+    ("MeiliSearch index containing support tickets", "meilisearch"),
+    ("Cypher queries for a Neo4j database", "neo4j"),
+)
+_QUESTION_PATTERN = re.compile(r'User Question: "(.*?)"', re.DOTALL)
+_REFINEMENT_SOURCE_PATTERN = re.compile(r"A previous query for (\w+) failed")
+
+
+def _route(prompt: str) -> str:
+    match = _QUESTION_PATTERN.search(prompt)
+    question = (match.group(1) if match else prompt).lower()
+    for data_source, keywords in ROUTING_KEYWORDS:
+        if any(keyword in question for keyword in keywords):
+            return data_source
+    return "general"
+
+
+def canned_reply(prompt: str) -> str:
+    """The fake model's answer to a prompt of this project."""
+    if "write the query for that data source" in prompt:
+        # Fused router: the route and that backend's canned query in one answer
+        data_source = _route(prompt)
+        return json.dumps({"data_source": data_source, "query": CANNED_QUERIES.get(data_source, "")})
+    if "expert routing assistant" in prompt:
+        return f'{{"data_source": "{_route(prompt)}"}}'
+    if "REFINED_QUERY_START" in prompt:
+        match = _REFINEMENT_SOURCE_PATTERN.search(prompt)
+        data_source = match.group(1) if match and match.group(1) in CANNED_QUERIES else "sqlite"
+        return f"REFINED_QUERY_START\n{CANNED_QUERIES[data_source]}\nREFINED_QUERY_END"
+    for marker, data_source in _GENERATOR_MARKERS:
+        if marker in prompt:
+            return CANNED_QUERIES[data_source]
+    return CANNED_ANSWER
+
+
+def _prompt_text(messages: List[BaseMessage]) -> str:
+    return "\n".join(str(message.content) for message in messages)
+
+
+def _usage(prompt: str, completion: str) -> dict:
+    # Same characters/4 estimate the context compactor falls back to
+    prompt_tokens, completion_tokens = (len(prompt) + 3) // 4, (len(completion) + 3) // 4
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens}
+
+
+def _chunks(text: str, count: int) -> list:
+    words = text.split(" ")
+    size = max(1, -(-len(words) // count))
+    return [" ".join(words[i:i + size]) + (" " if i + size < len(words) else "") for i in range(0, len(words), size)]
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    latency_ms is the time until the full answer of a non-streamed call, and the time
+    until the first chunk of a streamed one; the remaining chunks follow every
+    chunk_latency_ms.
+    """
+
+    latency_ms: float = 50.0
+    chunk_latency_ms: float = 5.0
+    stream_chunks: int = 8
+
+    @property
+    def _llm_type(self) -> str:
+        return "benchmark-fake"
+
+    def _result(self, messages):
+        prompt = _prompt_text(messages)
+        reply = canned_reply(prompt)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=reply))],
+                          llm_output={"token_usage": _usage(prompt, reply), "model_name": self._llm_type})
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager=None, **kwargs: Any) -> ChatResult:
+        time.sleep(self.latency_ms / 1000)
+        return self._result(messages)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager=None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self.latency_ms / 1000)
+        return self._result(messages)
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager=None, **kwargs: Any):
+        time.sleep(self.latency_ms / 1000)
+        for i, text in enumerate(_chunks(canned_reply(_prompt_text(messages)), self.stream_chunks)):
+            if i:
+                time.sleep(self.chunk_latency_ms / 1000)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=text))
+            if run_manager:
+                run_manager.on_llm_new_token(text, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager=None, **kwargs: Any):
+        await asyncio.sleep(self.latency_ms / 1000)
+        for i, text in enumerate(_chunks(canned_reply(_prompt_text(messages)), self.stream_chunks)):
+            if i:
+                await asyncio.sleep(self.chunk_latency_ms / 1000)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=text))
+            if run_manager:
+                await run_manager.on_llm_new_token(text, chunk=chunk)
+            yield chunk
+
+
+def install_fake_llm(latency_ms: float = 50.0, chunk_latency_ms: float = 5.0) -> FakeChatModel:
+    """Points every agent at one FakeChatModel instead of the shared ChatTogether clients."""
+    import agents.executor_and_responder as executor_and_responder
+    import agents.fused_router as fused_router
+    import agents.query_generator as query_generator
+    import agents.query_refiner as query_refiner
+    import agents.router as router
+
+    fake = FakeChatModel(latency_ms=latency_ms, chunk_latency_ms=chunk_latency_ms,
+                         callbacks=[llm_telemetry_handler])
+    query_generator.llm = fake
+    executor_and_responder.llm = fake
+    query_refiner.llm = fake
+    router.get_llm = lambda *args, **kwargs: fake
+    fused_router.get_llm = router.get_llm
+    return fake
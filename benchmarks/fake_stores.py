@@ -0,0 +1,164 @@
+# benchmarks/fake_stores.py
+#
+# In-memory stand-ins for MongoDB, MeiliSearch and Neo4j, so the benchmark needs no
+# servers. They are installed into QUERY_EXECUTORS / ASYNC_QUERY_EXECUTORS and return
+# QueryResults like the real executors, after a configurable round-trip delay.
+# SQLite is used as-is (database/employees.db).
+#
+# The fakes cover what the benchmark's canned queries need, not the backends' full
+# query languages: MongoDB filters support equality, $regex, $in, $gt/$gte/$lt/$lte,
+# $and/$or and dotted paths; MeiliSearch matches query words in any text field; Neo4j
+# ignores the Cypher text and returns the collaboration records.
+import asyncio
+import re
+import time
+
+from tools.db_tools import MAX_RESULT_ROWS, parse_mongodb_query
+from tools.query_result import QueryResult, ERROR_PARSE
+
+# Same records as database/populate_db.py (abridged)
+PAPERS = [
+    {"title": "A Collaborative Multi-Agent Approach to RAG", "authors": ["Aniruddha Salve", "Saba Attar", "Mahesh Deshmukh"],
+     "year": 2024, "topic": "Generative AI", "keywords": ["multi-agent", "rag", "database integration"],
+     "publication": {"journal": "arXiv", "type": "preprint"}},
+    {"title": "Retrieval-Augmented Generation for Knowledge-Intensive NLP Tasks", "authors": ["Patrick Lewis", "Ethan Perez", "Sebastian Riedel"],
+     "year": 2020, "topic": "NLP", "keywords": ["knowledge-intensive", "open-domain qa", "nlp", "RAG"],
+     "publication": {"journal": "NeurIPS", "type": "conference paper"}},
+    {"title": "Cognitive Architectures for Language Agents", "authors": ["Theodore R. Sumers", "Shunyu Yao", "Thomas L. Griffiths"],
+     "year": 2024, "topic": "Language Agents", "keywords": ["cognitive science", "language models", "reasoning"],
+     "publication": {"journal": "arXiv", "type": "preprint"}},
+    {"title": "Self-RAG: Learning to Retrieve, Generate, and Critique through Self-Reflection",
+     "authors": ["Akari Asai", "Zeqiu Wu", "Yizhong Wang", "Avirup Sil", "Wen-tau Yih"],
+     "year": 2023, "topic": "Generative AI", "keywords": ["self-reflection", "retrieval", "critique", "RAG"],
+     "publication": {"journal": "arXiv", "type": "preprint"}},
+    {"title": "Chain-of-Thought Prompting Elicits Reasoning in Large Language Models",
+     "authors": ["Jason Wei", "Xuezhi Wang", "Dale Schuurmans", "Maarten Bosma"],
+     "year": 2022, "topic": "Prompt Engineering", "keywords": ["reasoning", "chain-of-thought", "prompting"],
+     "publication": {"journal": "NeurIPS", "type": "conference paper"}},
+    {"title": "Speculative RAG: Enhancing Retrieval-Augmented Generation", "authors": ["Zhao Wang", "Zhihao Wang", "Thomas Pfister"],
+     "year": 2024, "topic": "AI Efficiency", "keywords": ["speculative decoding", "rag", "latency"],
+     "publication": {"journal": "Journal of AI Research", "type": "journal"}},
+]
+
+TICKETS = [
+    {"ticket_id": "T001", "description": "MySQL issue: cannot connect", "raised_by": "Sayali Shivpuje", "status": "open"},
+    {"ticket_id": "T002", "description": "Neo4j graph visualization not loading", "raised_by": "Aniruddha Salve", "status": "open"},
+    {"ticket_id": "T003", "description": "Question about MySQL LEFT JOIN functionality", "raised_by": "Saba Attar", "status": "closed"},
+    {"ticket_id": "T004", "description": "Search query for open tickets related to Neo4j raised by Aniruddha Salve",
+     "raised_by": "Aniruddha Salve", "status": "open"},
+    {"ticket_id": "T005", "description": "Login problem with new MySQL credentials", "raised_by": "Mahesh Deshmukh", "status": "in_progress"},
+]
+
+COLLABORATIONS = [
+    {"researcher": "Aniruddha Salve", "collaborator": "Saba Attar"},
+    {"researcher": "Aniruddha Salve", "collaborator": "Mahesh Deshmukh"},
+    {"researcher": "Saba Attar", "collaborator": "Arnab Mitra Utsab"},
+    {"researcher": "Patrick Lewis", "collaborator": "Theodore R. Sumers"},
+]
+
+
+# --- MongoDB filter matching ---
+def _field_values(document, path: str) -> list:
+    values = [document]
+    for part in path.split("."):
+        values = [value.get(part) for value in values if isinstance(value, dict)]
+    # Arrays match if any element matches, as in MongoDB
+    return [item for value in values for item in (value if isinstance(value, list) else [value])]
+
+
+def _matches_condition(values: list, condition) -> bool:
+    if not isinstance(condition, dict):
+        return condition in values
+    flags = re.IGNORECASE if "i" in condition.get("$options", "") else 0
+    for operator, operand in condition.items():
+        if operator == "$options":
+            continue
+        if operator == "$regex":
+            ok = any(isinstance(v, str) and re.search(operand, v, flags) for v in values)
+        elif operator == "$in":
+            ok = any(v in operand for v in values)
+        elif operator in ("$gt", "$gte", "$lt", "$lte"):
+            compare = {"$gt": lambda v: v > operand, "$gte": lambda v: v >= operand,
+                       "$lt": lambda v: v < operand, "$lte": lambda v: v <= operand}[operator]
+            ok = any(v is not None and type(v) is type(operand) and compare(v) for v in values)
+        else:
+            ok = False
+        if not ok:
+            return False
+    return True
+
+
+def matches_filter(document: dict, query_dict: dict) -> bool:
+    for key, condition in query_dict.items():
+        if key == "$and":
+            ok = all(matches_filter(document, sub) for sub in condition)
+        elif key == "$or":
+            ok = any(matches_filter(document, sub) for sub in condition)
+        else:
+            ok = _matches_condition(_field_values(document, key), condition)
+        if not ok:
+            return False
+    return True
+
+
+# --- Executors ---
+def _elapsed_ms(started_at: float) -> float:
+    return round((time.perf_counter() - started_at) * 1000, 2)
+
+
+def _mongodb_result(query_str: str, started_at: float) -> QueryResult:
+    try:
+        query_dict = parse_mongodb_query(query_str)
+    except (ValueError, SyntaxError) as e:
+        return QueryResult.failure("mongodb", ERROR_PARSE, f"Invalid MongoDB query format: {e}", _elapsed_ms(started_at))
+    rows = [document for document in PAPERS if matches_filter(document, query_dict)]
+    return QueryResult.from_rows("mongodb", rows[:MAX_RESULT_ROWS], len(rows), elapsed_ms=_elapsed_ms(started_at))
+
+
+def _meilisearch_result(search_query: str, started_at: float, limit: int = 5) -> QueryResult:
+    words = [word.lower() for word in search_query.split()]
+    hits = [ticket for ticket in TICKETS
+            if any(word in " ".join(str(v) for v in ticket.values()).lower() for word in words)]
+    return QueryResult.from_rows("meilisearch", hits[:limit], len(hits), elapsed_ms=_elapsed_ms(started_at))
+
+
+def _neo4j_result(cypher_query: str, started_at: float) -> QueryResult:
+    return QueryResult.from_rows("neo4j", list(COLLABORATIONS), elapsed_ms=_elapsed_ms(started_at))
+
+
+_RESULT_BUILDERS = {"mongodb": _mongodb_result, "meilisearch": _meilisearch_result, "neo4j": _neo4j_result}
+
+
+def _sync_executor(data_source: str, latency_ms: float):
+    def execute(query: str, timeout: float = None) -> QueryResult:
+        started_at = time.perf_counter()
+        time.sleep(latency_ms / 1000)
+        return _RESULT_BUILDERS[data_source](query, started_at)
+    return execute
+
+
+def _async_executor(data_source: str, latency_ms: float):
+    async def aexecute(query: str, timeout: float = None) -> QueryResult:
+        started_at = time.perf_counter()
+        await asyncio.sleep(latency_ms / 1000)
+        return _RESULT_BUILDERS[data_source](query, started_at)
+    return aexecute
+
+
+def install_fake_stores(latency_ms: float = 2.0) -> None:
+    """
+    Replaces the MongoDB, MeiliSearch and Neo4j executors (sync and async) with the in-memory
+    fakes, and their schema introspection (used by the refiner) with the built-in descriptions.
+    Their query plans are not checked by the query guard.
+    """
+    from tools.async_db_tools import ASYNC_QUERY_EXECUTORS
+    from tools.db_tools import QUERY_EXECUTORS
+    from tools.query_guard import QUERY_GUARDS
+    from tools.schema_cache import FALLBACK_SCHEMAS, schema_cache
+
+    for data_source in _RESULT_BUILDERS:
+        QUERY_EXECUTORS[data_source] = _sync_executor(data_source, latency_ms)
+        ASYNC_QUERY_EXECUTORS[data_source] = _async_executor(data_source, latency_ms)
+        schema_cache.providers[data_source] = (lambda: 0, lambda ds=data_source: FALLBACK_SCHEMAS[ds])
+        QUERY_GUARDS.pop(data_source, None)
+    schema_cache.invalidate()
@@ -0,0 +1,246 @@
+# benchmarks/run_benchmark.py
+#
+# Offline throughput/latency benchmark: replays the questions in Qusetions.txt through
+# graph.builder.app with a deterministic fake LLM (benchmarks/fake_llm.py) and in-memory
+# MongoDB/MeiliSearch/Neo4j stand-ins (benchmarks/fake_stores.py); SQLite is used as-is.
+#
+# For each concurrency level it reports end-to-end and per-node latency percentiles,
+# turns per second and the peak traced memory of a turn batch.
+#
+#   python -m benchmarks.run_benchmark                                   # print the report
+#   python -m benchmarks.run_benchmark --save-baseline benchmarks/baseline.json
+#   python -m benchmarks.run_benchmark --compare benchmarks/baseline.json  # exit code 1 on regression
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+# The graph modules read these at import time: no real API key is needed, caches and
+# telemetry go to a scratch directory, and only warnings are logged.
+os.environ.setdefault("TOGETHER_API_KEY", "benchmark-fake-key")
+os.environ.setdefault("RAG_CACHE_DIR", tempfile.mkdtemp(prefix="rag-benchmark-"))
+os.environ.setdefault("TELEMETRY_EXPORT", "off")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("FANOUT_ENABLED", "0")
+
+from logging_config import configure_logging
+from benchmarks.fake_llm import install_fake_llm
+from benchmarks.fake_stores import install_fake_stores
+from graph.builder import app, arun_turn, GRAPH_RUN_CONFIG
+from graph.state import initial_state
+from graph.telemetry import percentiles, reset_spans, telemetry_summary
+from agents.fused_router import FUSED_ROUTING_ENABLED
+from agents.query_cache import query_cache
+from agents.route_stats import route_stats
+from agents.routing_cache import routing_cache
+from tools.async_db_tools import aclose_all_connections
+from tools.db_tools import close_all_connections
+from tools.result_cache import result_cache
+
+QUESTIONS_FILE = "Qusetions.txt"
+DEFAULT_CONCURRENCY = (1, 4, 8)
+# Relative change beyond which --compare reports a regression.
+DEFAULT_TOLERANCE = 0.15
+
+
+def load_questions(path: str = QUESTIONS_FILE) -> list:
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def clear_caches() -> None:
+    """Cold caches, so every level does the same work."""
+    routing_cache.clear()
+    query_cache.invalidate()
+    result_cache.invalidate()
+
+
+def _latency_summary(values: list) -> dict:
+    if not values:
+        return {}
+    return {**percentiles(values), "mean": round(sum(values) / len(values), 2), "max": round(max(values), 2)}
+
+
+# --- Turn runners ---
+def _run_turn(question: str) -> tuple:
+    started_at = time.perf_counter()
+    try:
+        state = app.invoke(initial_state(question), GRAPH_RUN_CONFIG)
+        failed = bool(state.get("error")) and not state.get("clarification_question_needed")
+    except Exception:
+        failed = True
+    return (time.perf_counter() - started_at) * 1000, failed
+
+
+def run_batch_sync(questions: list, concurrency: int) -> list:
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(_run_turn, questions))
+
+
+async def _arun_batch(questions: list, concurrency: int) -> list:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_one(question):
+        async with semaphore:
+            started_at = time.perf_counter()
+            try:
+                state = await arun_turn(question)
+                failed = bool(state.get("error")) and not state.get("clarification_question_needed")
+            except Exception:
+                failed = True
+            return (time.perf_counter() - started_at) * 1000, failed
+
+    try:
+        return await asyncio.gather(*(run_one(question) for question in questions))
+    finally:
+        await aclose_all_connections()
+
+
+def run_batch_async(questions: list, concurrency: int) -> list:
+    return asyncio.run(_arun_batch(questions, concurrency))
+
+
+# --- Benchmark ---
+def run_level(questions: list, concurrency: int, rounds: int, mode: str, warm_caches: bool) -> dict:
+    run_batch = run_batch_async if mode == "async" else run_batch_sync
+    workload = questions * rounds
+
+    if not warm_caches:
+        clear_caches()
+    reset_spans()
+    route_stats.clear()
+    started_at = time.perf_counter()
+    outcomes = run_batch(workload, concurrency)
+    wall_seconds = time.perf_counter() - started_at
+    node_summary = telemetry_summary()
+    route_summary = route_stats.stats()
+
+    # Separate pass for memory: tracemalloc slows every allocation, so it is kept out of the timings.
+    if not warm_caches:
+        clear_caches()
+    tracemalloc.start()
+    run_batch(questions, concurrency)
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies = [latency for latency, _ in outcomes]
+    return {
+        "turns": len(outcomes),
+        "failed_turns": sum(1 for _, failed in outcomes if failed),
+        "wall_seconds": round(wall_seconds, 3),
+        "turns_per_second": round(len(outcomes) / wall_seconds, 2),
+        "end_to_end_ms": _latency_summary(latencies),
+        "nodes": node_summary,
+        "route_paths": route_summary,
+        "peak_traced_memory_mb": round(peak_bytes / 2**20, 2),
+    }
+
+
+def run_benchmark(args) -> dict:
+    questions = load_questions(args.questions)
+    install_fake_llm(latency_ms=args.llm_latency_ms, chunk_latency_ms=args.chunk_latency_ms)
+    install_fake_stores(latency_ms=args.store_latency_ms)
+
+    # Warm-up (imports, connection pools, tokenizer); not measured
+    (run_batch_async if args.mode == "async" else run_batch_sync)(questions, 1)
+
+    levels = {}
+    for concurrency in args.concurrency:
+        print(f"Running {len(questions) * args.rounds} turns at concurrency {concurrency} ({args.mode})...", file=sys.stderr)
+        levels[str(concurrency)] = run_level(questions, concurrency, args.rounds, args.mode, args.warm_caches)
+
+    return {
+        "config": {
+            "mode": args.mode, "rounds": args.rounds, "questions": len(questions),
+            "llm_latency_ms": args.llm_latency_ms, "chunk_latency_ms": args.chunk_latency_ms,
+            "store_latency_ms": args.store_latency_ms, "warm_caches": args.warm_caches,
+            "fused_routing": FUSED_ROUTING_ENABLED,
+        },
+        "environment": {"python": platform.python_version(), "platform": platform.platform()},
+        "levels": levels,
+    }
+
+
+# --- Reporting ---
+def format_report(report: dict) -> str:
+    lines = [f"{'concurrency':>11} {'turns/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'failed':>7} {'peak MB':>8}"]
+    for concurrency, level in report["levels"].items():
+        e2e = level["end_to_end_ms"]
+        lines.append(f"{concurrency:>11} {level['turns_per_second']:>9} {e2e['p50']:>9} {e2e['p95']:>9} "
+                     f"{e2e['p99']:>9} {level['failed_turns']:>7} {level['peak_traced_memory_mb']:>8}")
+    for concurrency, level in report["levels"].items():
+        lines.append(f"\nPer-node duration at concurrency {concurrency} (ms):")
+        for node, summary in level["nodes"].items():
+            duration = summary["duration_ms"]
+            lines.append(f"  {node:<20} n={summary['count']:<5} p50={duration['p50']:<9} "
+                         f"p95={duration['p95']:<9} p99={duration['p99']}")
+    return "\n".join(lines)
+
+
+def compare_reports(baseline: dict, current: dict, tolerance: float = DEFAULT_TOLERANCE) -> list:
+    """Regressions of the current report against the baseline, as human-readable lines."""
+    regressions = []
+    for concurrency, level in current["levels"].items():
+        base = baseline["levels"].get(concurrency)
+        if base is None:
+            continue
+        if level["turns_per_second"] < base["turns_per_second"] * (1 - tolerance):
+            regressions.append(f"concurrency {concurrency}: throughput {base['turns_per_second']} -> "
+                               f"{level['turns_per_second']} turns/s")
+        for pct in ("p50", "p95"):
+            before, after = base["end_to_end_ms"][pct], level["end_to_end_ms"][pct]
+            if after > before * (1 + tolerance):
+                regressions.append(f"concurrency {concurrency}: end-to-end {pct} {before} -> {after} ms")
+        if level["peak_traced_memory_mb"] > base["peak_traced_memory_mb"] * (1 + tolerance):
+            regressions.append(f"concurrency {concurrency}: peak memory {base['peak_traced_memory_mb']} -> "
+                               f"{level['peak_traced_memory_mb']} MB")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Offline benchmark of the multi-agent RAG graph.")
+    parser.add_argument("--questions", default=QUESTIONS_FILE, help="File with one question per line")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=list(DEFAULT_CONCURRENCY))
+    parser.add_argument("--rounds", type=int, default=3, help="Passes over the questions per concurrency level")
+    parser.add_argument("--mode", choices=("sync", "async"), default="sync",
+                        help="sync: app.invoke on worker threads (CLI/UI path); async: arun_turn (HTTP API path)")
+    parser.add_argument("--llm-latency-ms", type=float, default=50.0)
+    parser.add_argument("--chunk-latency-ms", type=float, default=5.0)
+    parser.add_argument("--store-latency-ms", type=float, default=2.0)
+    parser.add_argument("--warm-caches", action="store_true",
+                        help="Keep routing/query/result caches between levels instead of starting cold")
+    parser.add_argument("--save-baseline", metavar="PATH", help="Write the report as JSON")
+    parser.add_argument("--compare", metavar="PATH", help="Compare against a saved baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    configure_logging()
+    try:
+        report = run_benchmark(args)
+    finally:
+        close_all_connections()
+    print(format_report(report))
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nBaseline written to {args.save_baseline}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare_reports(json.load(f), report, args.tolerance)
+        if regressions:
+            print(f"\nRegressions beyond {args.tolerance:.0%}:")
+            print("\n".join(f"  {line}" for line in regressions))
+            return 1
+        print(f"\nNo regressions beyond {args.tolerance:.0%} against {args.compare}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,326 @@
+# database/bulk_loader.py
+#
+# Batched ingest of CSV, JSONL or Parquet files into the four stores. Rows are streamed from
+# the file and written BULK_BATCH_SIZE at a time:
+#
+#   SQLite       chunked executemany, all chunks in one transaction
+#   MongoDB      unordered insert_many (a bad document does not stop the rest of its batch)
+#   MeiliSearch  add_documents per batch; up to MEILISEARCH_MAX_PENDING_TASKS indexing tasks
+#                are in flight while the next batches are sent, and every task is checked
+#   Neo4j        one UNWIND $rows write transaction per batch, for nodes or relationships
+#
+# Progress (rows and rows per second) is printed every PROGRESS_INTERVAL seconds. After a load
+# the store's caches are invalidated, as populate_db.py does. CSV values that look like
+# numbers are loaded as numbers; use JSONL for lists and nested objects.
+#
+#   python -m database.bulk_loader sqlite employees.csv --table employees
+#   python -m database.bulk_loader mongodb papers.jsonl --collection papers --batch-size 5000
+#   python -m database.bulk_loader meilisearch tickets.parquet --index support_tickets --primary-key ticket_id
+#   python -m database.bulk_loader neo4j researchers.csv --label Researcher --merge-on name
+#   python -m database.bulk_loader neo4j works_on.csv --relationship WORKS_ON \
+#       --start-label Researcher --end-label ProjectOrTopic --match-on name   # columns: start, end, ...
+import argparse
+import csv
+import itertools
+import json
+import re
+import sqlite3
+import sys
+import time
+from collections import deque
+from pathlib import Path
+
+import meilisearch
+from neo4j import GraphDatabase
+from pymongo import MongoClient
+from pymongo.errors import BulkWriteError
+
+from tools.db_tools import MEILISEARCH_URL, MONGODB_URI, NEO4J_PASSWORD, NEO4J_URI, NEO4J_USER, SQLITE_DB_PATH
+from tools.store_versions import invalidate_store
+
+# --- Bulk Load Settings ---
+BULK_BATCH_SIZE = 1000
+PROGRESS_INTERVAL = 2.0                 # Seconds between progress lines
+MEILISEARCH_MAX_PENDING_TASKS = 4       # Batches queued for indexing before the oldest is waited for
+MEILISEARCH_TASK_TIMEOUT_MS = 600_000   # How long one indexing task may take
+MONGODB_DATABASE = "research_db"
+NEO4J_DATABASE = "myraggraphdb"
+
+_IDENTIFIER = re.compile(r"[A-Za-z_]\w*")
+_INTEGER = re.compile(r"-?(?:0|[1-9]\d*)")
+_FLOAT = re.compile(r"-?(?:0|[1-9]\d*)?\.\d+(?:[eE][+-]?\d+)?|-?(?:0|[1-9]\d*)(?:\.\d*)?[eE][+-]?\d+")
+
+
+# --- Readers ---
+def _csv_value(text: str):
+    if text == "":
+        return None
+    if _INTEGER.fullmatch(text):
+        return int(text)
+    if _FLOAT.fullmatch(text):
+        return float(text)
+    return text
+
+
+def iter_csv_rows(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            yield {column: _csv_value(value) for column, value in row.items()}
+
+
+def iter_jsonl_rows(path):
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            if not isinstance(row, dict):
+                raise ValueError(f"{path}:{line_number}: expected a JSON object per line")
+            yield row
+
+
+def iter_parquet_rows(path, batch_size: int = BULK_BATCH_SIZE):
+    try:
+        import pyarrow.parquet as parquet
+    except ImportError as e:
+        raise RuntimeError("Reading Parquet files requires pyarrow (pip install pyarrow).") from e
+    for record_batch in parquet.ParquetFile(path).iter_batches(batch_size=batch_size):
+        yield from record_batch.to_pylist()
+
+
+ROW_READERS = {
+    ".csv": iter_csv_rows,
+    ".jsonl": iter_jsonl_rows,
+    ".ndjson": iter_jsonl_rows,
+    ".parquet": iter_parquet_rows,
+}
+
+
+def read_rows(path):
+    """Rows of a CSV, JSONL or Parquet file as dicts, streamed; the format comes from the suffix."""
+    reader = ROW_READERS.get(Path(path).suffix.lower())
+    if reader is None:
+        raise ValueError(f"Unsupported file type '{Path(path).suffix}'; expected one of {', '.join(ROW_READERS)}")
+    return reader(path)
+
+
+def batched(rows, size: int):
+    rows = iter(rows)
+    while batch := list(itertools.islice(rows, size)):
+        yield batch
+
+
+class LoadProgress:
+    """Rows written so far and the rate, printed at most every PROGRESS_INTERVAL seconds."""
+
+    def __init__(self, label: str, interval: float = PROGRESS_INTERVAL):
+        self.label = label
+        self.interval = interval
+        self.rows = 0
+        self.failed = 0
+        self.started_at = time.perf_counter()
+        self._reported_at = self.started_at
+
+    def add(self, rows: int, failed: int = 0) -> None:
+        self.rows += rows
+        self.failed += failed
+        now = time.perf_counter()
+        if now - self._reported_at >= self.interval:
+            self._reported_at = now
+            print(f"{self.label}: {self.rows:,} rows ({self.rate():,.0f} rows/s)")
+
+    def rate(self) -> float:
+        elapsed = time.perf_counter() - self.started_at
+        return self.rows / elapsed if elapsed > 0 else 0.0
+
+    def finish(self) -> dict:
+        summary = {"rows": self.rows, "failed": self.failed,
+                   "seconds": round(time.perf_counter() - self.started_at, 3),
+                   "rows_per_second": round(self.rate(), 1)}
+        failed = f", {self.failed:,} failed" if self.failed else ""
+        print(f"{self.label}: loaded {self.rows:,} rows in {summary['seconds']}s "
+              f"({summary['rows_per_second']:,} rows/s{failed})")
+        return summary
+
+
+def _identifier(name: str) -> str:
+    if not _IDENTIFIER.fullmatch(name):
+        raise ValueError(f"Invalid identifier: {name!r}")
+    return name
+
+
+# --- SQLite ---
+def load_sqlite(conn, table: str, rows, batch_size: int = BULK_BATCH_SIZE) -> dict:
+    """
+    Inserts rows into an existing table with chunked executemany inside one transaction, so
+    the load is all-or-nothing and pays for one commit. The columns are those of the first row.
+    """
+    progress = LoadProgress(f"sqlite {table}")
+    batches = batched(rows, batch_size)
+    first = next(batches, None)
+    if first is None:
+        return progress.finish()
+    columns = [_identifier(column) for column in first[0]]
+    statement = (f'INSERT INTO "{_identifier(table)}" ({", ".join(columns)}) '
+                 f'VALUES ({", ".join("?" * len(columns))})')
+    with conn: # Commits once at the end, rolls everything back on an error
+        for batch in itertools.chain([first], batches):
+            conn.executemany(statement, ([row.get(column) for column in columns] for row in batch))
+            progress.add(len(batch))
+    return progress.finish()
+
+
+# --- MongoDB ---
+def load_mongodb(collection, rows, batch_size: int = BULK_BATCH_SIZE) -> dict:
+    """Unordered insert_many per batch; documents that fail (e.g. duplicate _id) are counted and skipped."""
+    progress = LoadProgress(f"mongodb {collection.name}")
+    for batch in batched(rows, batch_size):
+        try:
+            inserted = len(collection.insert_many(batch, ordered=False).inserted_ids)
+            failed = 0
+        except BulkWriteError as e:
+            inserted = e.details.get("nInserted", 0)
+            failed = len(e.details.get("writeErrors", []))
+        progress.add(inserted, failed)
+    return progress.finish()
+
+
+# --- MeiliSearch ---
+def _finish_meilisearch_task(client, task_uid: int) -> bool:
+    task = client.wait_for_task(task_uid, timeout_in_ms=MEILISEARCH_TASK_TIMEOUT_MS)
+    if task.status != "succeeded":
+        print(f"MeiliSearch task {task_uid} {task.status}: {task.error}")
+        return False
+    return True
+
+
+def load_meilisearch(client, index_uid: str, rows, batch_size: int = BULK_BATCH_SIZE,
+                     primary_key: str = None) -> dict:
+    """
+    Sends batches with add_documents without waiting for each to be indexed. At most
+    MEILISEARCH_MAX_PENDING_TASKS tasks are pending; rows count as loaded once their task succeeded.
+    """
+    index = client.index(index_uid)
+    progress = LoadProgress(f"meilisearch {index_uid}")
+    pending = deque()  # (task_uid, rows in the batch)
+
+    def finish_oldest():
+        task_uid, size = pending.popleft()
+        if _finish_meilisearch_task(client, task_uid):
+            progress.add(size)
+        else:
+            progress.add(0, size)
+
+    for batch in batched(rows, batch_size):
+        pending.append((index.add_documents(batch, primary_key).task_uid, len(batch)))
+        if len(pending) >= MEILISEARCH_MAX_PENDING_TASKS:
+            finish_oldest()
+    while pending:
+        finish_oldest()
+    return progress.finish()
+
+
+# --- Neo4j ---
+def _run_neo4j_batches(session, query: str, rows, batch_size: int, label: str, written=None) -> dict:
+    """`written(counters)` is how many rows of a batch took effect; the rest are counted as failed."""
+    progress = LoadProgress(label)
+    for batch in batched(rows, batch_size):
+        counters = session.execute_write(lambda tx, batch=batch: tx.run(query, rows=batch).consume().counters)
+        loaded = len(batch) if written is None else min(written(counters), len(batch))
+        progress.add(loaded, len(batch) - loaded)
+    return progress.finish()
+
+
+def load_neo4j_nodes(session, label: str, rows, batch_size: int = BULK_BATCH_SIZE, merge_on: str = None) -> dict:
+    """
+    Creates one node per row with the row as its properties. With `merge_on`, existing nodes
+    with the same value are updated instead; that lookup needs an index on (label, merge_on).
+    """
+    label = _identifier(label)
+    if merge_on:
+        query = (f"UNWIND $rows AS row MERGE (n:`{label}` {{`{_identifier(merge_on)}`: row.`{merge_on}`}}) "
+                 "SET n += row")
+    else:
+        query = f"UNWIND $rows AS row CREATE (n:`{label}`) SET n = row"
+    return _run_neo4j_batches(session, query, rows, batch_size, f"neo4j :{label}")
+
+
+def load_neo4j_relationships(session, rel_type: str, start_label: str, end_label: str, rows,
+                             batch_size: int = BULK_BATCH_SIZE, match_on: str = "name") -> dict:
+    """
+    Creates one relationship per row between the nodes whose `match_on` property equals the
+    row's `start` and `end` values; the other columns become relationship properties.
+    Rows whose start or end node does not exist create nothing and are counted as failed.
+    """
+    match_on = _identifier(match_on)
+    query = (f"UNWIND $rows AS row "
+             f"MATCH (a:`{_identifier(start_label)}` {{`{match_on}`: row.start}}) "
+             f"MATCH (b:`{_identifier(end_label)}` {{`{match_on}`: row.end}}) "
+             f"CREATE (a)-[r:`{_identifier(rel_type)}`]->(b) SET r = row.properties")
+    rows = ({"start": row["start"], "end": row["end"],
+             "properties": {key: value for key, value in row.items() if key not in ("start", "end")}}
+            for row in rows)
+    return _run_neo4j_batches(session, query, rows, batch_size, f"neo4j :{rel_type}",
+                              written=lambda counters: counters.relationships_created)
+
+
+def load_file(args) -> dict:
+    """Loads args.path into args.store as described by the command-line options."""
+    rows = read_rows(args.path)
+    if args.store == "sqlite":
+        conn = sqlite3.connect(args.sqlite_path)
+        try:
+            return load_sqlite(conn, args.table, rows, args.batch_size)
+        finally:
+            conn.close()
+    if args.store == "mongodb":
+        client = MongoClient(MONGODB_URI)
+        try:
+            return load_mongodb(client[MONGODB_DATABASE][args.collection], rows, args.batch_size)
+        finally:
+            client.close()
+    if args.store == "meilisearch":
+        client = meilisearch.Client(MEILISEARCH_URL)
+        return load_meilisearch(client, args.index, rows, args.batch_size, args.primary_key)
+    driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+    try:
+        with driver.session(database=NEO4J_DATABASE) as session:
+            if args.relationship:
+                return load_neo4j_relationships(session, args.relationship, args.start_label, args.end_label,
+                                                rows, args.batch_size, args.match_on)
+            return load_neo4j_nodes(session, args.label, rows, args.batch_size, args.merge_on)
+    finally:
+        driver.close()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Batched loading of CSV, JSONL or Parquet files into a store.")
+    parser.add_argument("store", choices=("sqlite", "mongodb", "meilisearch", "neo4j"))
+    parser.add_argument("path", help="A .csv, .jsonl/.ndjson or .parquet file")
+    parser.add_argument("--batch-size", type=int, default=BULK_BATCH_SIZE)
+    parser.add_argument("--sqlite-path", default=SQLITE_DB_PATH)
+    parser.add_argument("--table", help="sqlite: existing table to insert into")
+    parser.add_argument("--collection", default="papers", help="mongodb: collection in research_db")
+    parser.add_argument("--index", default="support_tickets", help="meilisearch: index uid")
+    parser.add_argument("--primary-key", help="meilisearch: primary key, if the index has none yet")
+    parser.add_argument("--label", help="neo4j: label of the nodes to create")
+    parser.add_argument("--merge-on", help="neo4j: property that identifies existing nodes to update")
+    parser.add_argument("--relationship", help="neo4j: relationship type to create from start/end columns")
+    parser.add_argument("--start-label", help="neo4j: label of the relationship start nodes")
+    parser.add_argument("--end-label", help="neo4j: label of the relationship end nodes")
+    parser.add_argument("--match-on", default="name", help="neo4j: property matched by the start/end columns")
+    args = parser.parse_args(argv)
+
+    if args.store == "sqlite" and not args.table:
+        parser.error("sqlite needs --table")
+    if args.store == "neo4j" and not (args.label or (args.relationship and args.start_label and args.end_label)):
+        parser.error("neo4j needs --label, or --relationship with --start-label and --end-label")
+
+    summary = load_file(args)
+    if summary["rows"]:
+        invalidate_store(args.store) # Cached queries/results for the old data are now stale
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,307 @@
+# database/index_advisor.py
+#
+# Suggests secondary indexes from the generated-query history. The final working queries kept
+# by the query cache (agents/query_cache.py) are mined for the SQLite columns, MongoDB fields
+# and Neo4j node properties they filter and join on. Each one without an index is reported
+# with the statement that creates it, using the same helpers as database/populate_db.py.
+# SQLite suggestions are checked against the planner first: the index is created inside a
+# transaction that is rolled back, and it is only suggested if EXPLAIN QUERY PLAN then uses it
+# for one of the queries. MeiliSearch searches are full-text without filters, so there is
+# nothing to mine for them.
+#
+#   python -m database.index_advisor                    # print the suggestions
+#   python -m database.index_advisor --apply            # and create them
+#   python -m database.index_advisor --min-queries 3    # only keys used by 3+ cached queries
+import argparse
+import logging
+import re
+import sqlite3
+import sys
+from collections import defaultdict
+from dataclasses import dataclass
+
+from agents.query_cache import query_cache
+from database.populate_db import (
+    create_mongodb_indexes, create_neo4j_indexes, create_sqlite_indexes, neo4j_index_name, sqlite_index_name,
+)
+from tools.db_tools import (
+    SQLITE_DB_PATH, close_all_connections, get_mongodb_client, get_neo4j_driver, parse_mongodb_query,
+)
+
+logger = logging.getLogger(__name__)
+
+# --- Index Advisor Settings ---
+INDEX_ADVISOR_MIN_QUERIES = 1   # Cached queries that must filter on a key before it is suggested
+MONGODB_DATABASE, MONGODB_COLLECTION = "research_db", "papers"
+NEO4J_DATABASE = "myraggraphdb"
+
+_SQL_STRING = re.compile(r"'(?:[^']|'')*'")
+_CYPHER_STRING = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+_SQL_KEYWORDS = {"where", "on", "join", "inner", "left", "right", "cross", "natural", "group", "order",
+                 "limit", "union", "using", "having"}
+_SQL_TABLE_REF = re.compile(r"\b(?:FROM|JOIN)\s+[\"`]?(\w+)[\"`]?(?:\s+(?:AS\s+)?(\w+))?", re.IGNORECASE)
+_SQL_OPERATOR = r"(?:==|=|<>|!=|<=|>=|<|>|\bIN\b|\bLIKE\b|\bGLOB\b|\bBETWEEN\b)"
+# [LOWER(][alias.]column[)] <operator>, and the right-hand column of a join condition
+_SQL_FILTER = re.compile(rf"(LOWER\s*\(\s*)?(?:(\w+)\.)?(\w+)\s*\)?\s*{_SQL_OPERATOR}", re.IGNORECASE)
+_SQL_JOIN_RHS = re.compile(r"(?:==|=)\s*(\w+)\.(\w+)")
+_CYPHER_NODE = re.compile(r"\(\s*(\w*)\s*:\s*`?(\w+)`?\s*(\{[^}]*\})?")
+_CYPHER_MAP_KEY = re.compile(r"`?(\w+)`?\s*:")
+_CYPHER_PREDICATE = re.compile(
+    r"\b(\w+)\.`?(\w+)`?\s*\)?\s*(?:=~|=|<>|<=|>=|<|>|\bIN\b|\bSTARTS\s+WITH\b|\bENDS\s+WITH\b|\bCONTAINS\b)",
+    re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class IndexSuggestion:
+    data_source: str
+    target: str      # Table, collection or node label
+    key: str         # Column or LOWER(column), field path, or property
+    queries: int     # Cached queries filtering on the key
+    statement: str   # What --apply runs, for display
+
+    def __str__(self) -> str:
+        return f"[{self.data_source}] {self.target}.{self.key} ({self.queries} queries): {self.statement}"
+
+
+def _normalize_key(key: str) -> str:
+    return re.sub(r"[\s\"`\[\]]", "", key).lower()
+
+
+# --- SQLite ---
+def _sqlite_filter_keys(query: str, columns_of: dict) -> set:
+    """(table, key) pairs a query filters or joins on; key is "column" or "LOWER(column)"."""
+    text = _SQL_STRING.sub("''", query)
+    aliases = {}
+    for table, alias in _SQL_TABLE_REF.findall(text):
+        if table in columns_of:
+            aliases[table] = table
+            if alias and alias.lower() not in _SQL_KEYWORDS:
+                aliases[alias] = table
+    tables = set(aliases.values())
+
+    def resolve(qualifier, column):
+        if qualifier:
+            table = aliases.get(qualifier)
+            return table if table and column in columns_of[table] else None
+        owners = [table for table in tables if column in columns_of[table]]
+        return owners[0] if len(owners) == 1 else None
+
+    keys = set()
+    for lower, qualifier, column in _SQL_FILTER.findall(text):
+        table = resolve(qualifier, column)
+        if table:
+            keys.add((table, f"LOWER({column})" if lower else column))
+    for qualifier, column in _SQL_JOIN_RHS.findall(text):
+        table = resolve(qualifier, column)
+        if table:
+            keys.add((table, column))
+    return keys
+
+
+def _sqlite_indexed_keys(conn, table: str) -> set:
+    """Normalized first key of every index on the table, including the rowid primary key."""
+    keys = set()
+    for _, name, type_, _, _, pk in conn.execute(f'PRAGMA table_info("{table}")'):
+        if pk == 1 and type_.upper() == "INTEGER":
+            keys.add(name.lower())
+    for _, index_name, *_ in conn.execute(f'PRAGMA index_list("{table}")'):
+        sql = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'index' AND name = ?",
+                           (index_name,)).fetchone()
+        match = re.search(r"\bON\s+\S+\s*\((.*)\)", sql[0], re.IGNORECASE | re.DOTALL) if sql and sql[0] else None
+        if match:
+            depth, first = 0, ""
+            for char in match.group(1):
+                if char == "," and depth == 0:
+                    break
+                depth += {"(": 1, ")": -1}.get(char, 0)
+                first += char
+            keys.add(_normalize_key(re.sub(r"\s+(ASC|DESC|COLLATE\s+\w+)\s*$", "", first.strip(), flags=re.I)))
+        else: # Automatic index of a UNIQUE/PRIMARY KEY constraint
+            info = conn.execute(f'PRAGMA index_info("{index_name}")').fetchone()
+            if info and info[2]:
+                keys.add(info[2].lower())
+    return keys
+
+
+def _sqlite_index_used(conn, table: str, key: str, queries: list) -> bool:
+    """Creates the index in a rolled-back transaction and asks the planner whether it uses it."""
+    name = sqlite_index_name(table, key)
+    conn.execute("BEGIN")
+    try:
+        create_sqlite_indexes(conn, [(table, key)], analyze=False)
+        for query in queries:
+            try:
+                steps = conn.execute(f"EXPLAIN QUERY PLAN {query}").fetchall()
+            except sqlite3.Error:
+                continue # Written for an older schema
+            if any(re.search(rf"\bINDEX {re.escape(name)}\b", step[3]) for step in steps):
+                return True
+        return False
+    finally:
+        conn.execute("ROLLBACK")
+
+
+def suggest_sqlite_indexes(queries: list, min_queries: int) -> list:
+    conn = sqlite3.connect(SQLITE_DB_PATH, isolation_level=None) # Explicit BEGIN/ROLLBACK
+    try:
+        tables = [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'")]
+        columns_of = {table: {row[1] for row in conn.execute(f'PRAGMA table_info("{table}")')}
+                      for table in tables}
+        queries_by_key = defaultdict(list)
+        for query in queries:
+            for key in _sqlite_filter_keys(query, columns_of):
+                queries_by_key[key].append(query)
+
+        suggestions = []
+        for (table, key), key_queries in sorted(queries_by_key.items()):
+            if len(key_queries) < min_queries or _normalize_key(key) in _sqlite_indexed_keys(conn, table):
+                continue
+            if not _sqlite_index_used(conn, table, key, key_queries):
+                logger.info("The planner would not use an index on %s(%s); not suggested.", table, key)
+                continue
+            statement = f'CREATE INDEX IF NOT EXISTS "{sqlite_index_name(table, key)}" ON "{table}" ({key})'
+            suggestions.append(IndexSuggestion("sqlite", table, key, len(key_queries), statement))
+        return suggestions
+    finally:
+        conn.close()
+
+
+def apply_sqlite_indexes(suggestions: list) -> None:
+    conn = sqlite3.connect(SQLITE_DB_PATH)
+    try:
+        create_sqlite_indexes(conn.cursor(), [(s.target, s.key) for s in suggestions])
+        conn.commit()
+    finally:
+        conn.close()
+
+
+# --- MongoDB ---
+def _mongodb_filter_fields(filter_doc: dict) -> set:
+    fields = set()
+    for key, value in filter_doc.items():
+        if key in ("$and", "$or", "$nor") and isinstance(value, list):
+            for clause in value:
+                if isinstance(clause, dict):
+                    fields |= _mongodb_filter_fields(clause)
+        elif not key.startswith("$") and key != "_id":
+            fields.add(key)
+    return fields
+
+
+def suggest_mongodb_indexes(queries: list, min_queries: int) -> list:
+    counts = defaultdict(int)
+    for query in queries:
+        try:
+            filter_doc = parse_mongodb_query(query)
+        except (ValueError, SyntaxError):
+            continue
+        for field in _mongodb_filter_fields(filter_doc):
+            counts[field] += 1
+    collection = get_mongodb_client()[MONGODB_DATABASE][MONGODB_COLLECTION]
+    indexed = {info["key"][0][0] for info in collection.index_information().values()}
+    return [IndexSuggestion("mongodb", MONGODB_COLLECTION, field, count,
+                            f'db.{MONGODB_COLLECTION}.createIndex({{"{field}": 1}})')
+            for field, count in sorted(counts.items()) if count >= min_queries and field not in indexed]
+
+
+def apply_mongodb_indexes(suggestions: list) -> None:
+    collection = get_mongodb_client()[MONGODB_DATABASE][MONGODB_COLLECTION]
+    create_mongodb_indexes(collection, [s.key for s in suggestions])
+
+
+# --- Neo4j ---
+def _neo4j_filter_properties(query: str) -> set:
+    """(label, property) pairs matched by a node pattern's property map or compared in WHERE."""
+    text = _CYPHER_STRING.sub("''", query)
+    labels, properties = {}, set()
+    for variable, label, property_map in _CYPHER_NODE.findall(text):
+        if variable:
+            labels[variable] = label
+        for prop in _CYPHER_MAP_KEY.findall(property_map or ""):
+            properties.add((label, prop))
+    for variable, prop in _CYPHER_PREDICATE.findall(text):
+        if variable in labels:
+            properties.add((labels[variable], prop))
+    return properties
+
+
+def suggest_neo4j_indexes(queries: list, min_queries: int) -> list:
+    counts = defaultdict(int)
+    for query in queries:
+        for key in _neo4j_filter_properties(query):
+            counts[key] += 1
+    with get_neo4j_driver().session(database=NEO4J_DATABASE) as session:
+        # Also lists the indexes backing uniqueness constraints
+        indexed = {(record["labelsOrTypes"][0], record["properties"][0])
+                   for record in session.run("SHOW INDEXES YIELD entityType, labelsOrTypes, properties")
+                   if record["entityType"] == "NODE" and record["labelsOrTypes"] and record["properties"]}
+    return [IndexSuggestion("neo4j", label, prop, count,
+                            f"CREATE INDEX `{neo4j_index_name(label, prop)}` IF NOT EXISTS "
+                            f"FOR (n:`{label}`) ON (n.`{prop}`)")
+            for (label, prop), count in sorted(counts.items())
+            if count >= min_queries and (label, prop) not in indexed]
+
+
+def apply_neo4j_indexes(suggestions: list) -> None:
+    with get_neo4j_driver().session(database=NEO4J_DATABASE) as session:
+        create_neo4j_indexes(session, [(s.target, s.key) for s in suggestions])
+
+
+# data_source -> (suggest(queries, min_queries), apply(suggestions))
+INDEX_ADVISORS = {
+    "sqlite": (suggest_sqlite_indexes, apply_sqlite_indexes),
+    "mongodb": (suggest_mongodb_indexes, apply_mongodb_indexes),
+    "neo4j": (suggest_neo4j_indexes, apply_neo4j_indexes),
+}
+
+
+def suggest_indexes(entries: list = None, min_queries: int = INDEX_ADVISOR_MIN_QUERIES) -> list:
+    """Index suggestions for every backend, from `entries` (default: the query cache)."""
+    queries_by_source = defaultdict(list)
+    for entry in query_cache.entries() if entries is None else entries:
+        queries_by_source[entry["data_source"]].append(entry["query"])
+    suggestions = []
+    for data_source, (suggest, _) in INDEX_ADVISORS.items():
+        if not queries_by_source[data_source]:
+            continue
+        try:
+            suggestions.extend(suggest(queries_by_source[data_source], min_queries))
+        except Exception as e:
+            logger.warning("Could not inspect the %s indexes (%s); skipping it.", data_source, e)
+    return suggestions
+
+
+def apply_suggestions(suggestions: list) -> None:
+    by_source = defaultdict(list)
+    for suggestion in suggestions:
+        by_source[suggestion.data_source].append(suggestion)
+    for data_source, source_suggestions in by_source.items():
+        INDEX_ADVISORS[data_source][1](source_suggestions)
+        logger.info("Created %d %s index(es).", len(source_suggestions), data_source)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Suggest indexes from the generated-query history.")
+    parser.add_argument("--apply", action="store_true", help="Create the suggested indexes")
+    parser.add_argument("--min-queries", type=int, default=INDEX_ADVISOR_MIN_QUERIES,
+                        help="Cached queries that must filter on a key before it is suggested")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+    try:
+        suggestions = suggest_indexes(min_queries=args.min_queries)
+        if not suggestions:
+            print("No missing indexes found in the query history.")
+            return 0
+        print("\n".join(str(suggestion) for suggestion in suggestions))
+        if args.apply:
+            apply_suggestions(suggestions)
+            print(f"Created {len(suggestions)} index(es).")
+    finally:
+        close_all_connections()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
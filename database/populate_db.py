@@ -4,6 +4,73 @@ from neo4j import GraphDatabase
 import meilisearch 
 from meilisearch.errors import MeilisearchApiError 
 import os
+import re
+
+from database.bulk_loader import (
+    load_meilisearch, load_mongodb, load_neo4j_nodes, load_neo4j_relationships, load_sqlite,
+)
+from tools.store_versions import invalidate_store
+
+# --- Secondary Index Settings ---
+# Columns the generated queries filter and join on. SQLite string filters are generated as
+# LOWER(column) = LOWER('...') (see SQLITE_RULES in agents/query_generator.py), so those
+# columns are indexed on the LOWER() expression; a plain index on them would never be used.
+SQLITE_INDEXES = [
+    ("employees", "LOWER(role)"),
+    ("employees", "department_id"),
+    ("projects", "employee_id"),
+    ("projects", "LOWER(status)"),
+]
+MONGODB_INDEXES = ["authors", "topic", "year", "keywords"]  # authors/keywords are multikey (arrays)
+NEO4J_INDEXES = [("Researcher", "name"), ("ProjectOrTopic", "name")]
+# MeiliSearch has no secondary indexes; its equivalent is the attribute settings.
+MEILISEARCH_SEARCHABLE_ATTRIBUTES = ["description", "raised_by", "status"]
+MEILISEARCH_FILTERABLE_ATTRIBUTES = ["status", "raised_by"]
+
+
+def sqlite_index_name(table: str, key: str) -> str:
+    """idx_employees_lower_role for ("employees", "LOWER(role)")."""
+    return f"idx_{table}_" + re.sub(r"\W+", "_", key.lower()).strip("_")
+
+
+def create_sqlite_indexes(cursor, indexes=SQLITE_INDEXES, analyze=True) -> list:
+    """Creates the missing indexes and refreshes the planner statistics; returns the index names."""
+    names = []
+    for table, key in indexes:
+        name = sqlite_index_name(table, key)
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS "{name}" ON "{table}" ({key})')
+        names.append(name)
+    if analyze:
+        cursor.execute("ANALYZE")
+    return names
+
+
+def create_mongodb_indexes(collection, fields=MONGODB_INDEXES) -> list:
+    """Single-field ascending indexes; create_index is a no-op for an index that exists."""
+    return [collection.create_index(field) for field in fields]
+
+
+def neo4j_index_name(label: str, prop: str) -> str:
+    return f"{label.lower()}_{prop.lower()}"
+
+
+def create_neo4j_indexes(session, indexes=NEO4J_INDEXES) -> list:
+    """Range indexes on node properties, used by MATCH (n:Label {prop: ...}) and WHERE n.prop = ..."""
+    names = []
+    for label, prop in indexes:
+        name = neo4j_index_name(label, prop)
+        session.run(f"CREATE INDEX `{name}` IF NOT EXISTS FOR (n:`{label}`) ON (n.`{prop}`)").consume()
+        names.append(name)
+    return names
+
+
+def configure_meilisearch_index(client, index):
+    """Restricts search to the fields questions are about and makes status/raised_by filterable."""
+    task = index.update_settings({
+        "searchableAttributes": MEILISEARCH_SEARCHABLE_ATTRIBUTES,
+        "filterableAttributes": MEILISEARCH_FILTERABLE_ATTRIBUTES,
+    })
+    client.wait_for_task(task.task_uid)
 
 
 def populate_sqlite():
@@ -52,7 +119,7 @@ def populate_sqlite():
         (3, 'Data Science'),
         (4, 'Human Resources') # New Department
     ]
-    cursor.executemany("INSERT INTO departments (id, name) VALUES (?, ?)", departments_data)
+    load_sqlite(conn, "departments", (dict(zip(("id", "name"), row)) for row in departments_data))
 
     employees_data = [
         # (id, name, role, department_id)
@@ -64,7 +131,8 @@ def populate_sqlite():
         (6, 'Priya Sharma', 'HR Specialist', 4),      # New Employee
         (7, 'Rohan Verma', 'DevOps Engineer', 1)       # New Employee
     ]
-    cursor.executemany("INSERT INTO employees (id, name, role, department_id) VALUES (?, ?, ?, ?)", employees_data)
+    load_sqlite(conn, "employees",
+                (dict(zip(("id", "name", "role", "department_id"), row)) for row in employees_data))
 
     projects_data = [
         (1, 'Multi-Agent RAG System', 3, 'active'),
@@ -75,11 +143,17 @@ def populate_sqlite():
         (6, 'Employee Onboarding Automation', 6, 'planning'), # New Project
         (7, 'CI/CD Pipeline Optimization', 7, 'completed')     # New Project
     ]
-    cursor.executemany("INSERT INTO projects (id, project_name, employee_id, status) VALUES (?, ?, ?, ?)", projects_data)
+    load_sqlite(conn, "projects",
+                (dict(zip(("id", "project_name", "employee_id", "status"), row)) for row in projects_data))
+
+    # --- Secondary indexes, built after the inserts ---
+    index_names = create_sqlite_indexes(cursor)
+    print(f"Created SQLite indexes: {', '.join(index_names)}.")
 
     print("SQLite database 'employees.db' re-populated successfully with expanded dataset.")
     conn.commit()
     conn.close()
+    invalidate_store("sqlite") # Cached queries/results for the old data are now stale
 
 def populate_mongodb():
     """Creates and populates the MongoDB database with an expanded and more realistic dataset."""
@@ -156,9 +230,12 @@ def populate_mongodb():
             "publication": {"journal": "NeurIPS", "type": "conference paper"} # Paper [user_provided_document_id_3]
         },
     ]
-    collection.insert_many(papers_data)
+    load_mongodb(collection, papers_data)
+    index_names = create_mongodb_indexes(collection)
+    print(f"Created MongoDB indexes: {', '.join(index_names)}.")
     print("MongoDB database 'research_db' re-populated successfully with expanded dataset.")
     client.close()
+    invalidate_store("mongodb")
 
 
 def populate_meilisearch():
@@ -221,12 +298,13 @@ def populate_meilisearch():
         ]
 
         if index: 
-            task_add_docs = index.add_documents(tickets)
-            print(f"Documents submission task created for MeiliSearch index '{index_uid}'. Task UID: {task_add_docs.task_uid}")
-            client.wait_for_task(task_add_docs.task_uid) 
+            configure_meilisearch_index(client, index)
+            print(f"Configured searchable/filterable attributes of MeiliSearch index '{index_uid}'.")
+            load_meilisearch(client, index_uid, tickets)
             
             stats = index.get_stats()
             print(f"Verification: MeiliSearch Index '{index_uid}' now contains {stats.number_of_documents} documents.")
+            invalidate_store("meilisearch")
         else:
             print(f"Failed to get a valid index object for '{index_uid}' after creation. Documents not added.")
 
@@ -258,6 +336,10 @@ def populate_neo4j():
             session.run("MATCH (n) DETACH DELETE n")
             print("Cleared existing data from Neo4j database 'myraggraphdb'.")
 
+            # --- Indexes first: the relationship MATCHes below look nodes up by name ---
+            index_names = create_neo4j_indexes(session)
+            print(f"Created Neo4j indexes: {', '.join(index_names)}.")
+
             # --- Create Nodes (Researchers) ---
             # Based on names from the paper and our project
             researchers_data = [
@@ -270,10 +352,7 @@ def populate_neo4j():
                 {"name": "Theodore R. Sumers", "field": "Language Agents"} # From paper's references
             ]
 
-            for researcher in researchers_data:
-                session.run("CREATE (r:Researcher {name: $name, field: $field})",
-                            name=researcher["name"], field=researcher["field"])
-            print(f"Created {len(researchers_data)} Researcher nodes.")
+            load_neo4j_nodes(session, "Researcher", researchers_data)
 
             # --- Create Relationships (COLLABORATES_WITH, WORKS_ON) ---
             # This is just sample data, you can make it more complex
@@ -285,13 +364,8 @@ def populate_neo4j():
                 ("Saba Attar", "Arnab Mitra Utsab"),
                 ("Patrick Lewis", "Theodore R. Sumers") # Fictional collaboration for example
             ]
-            for r1_name, r2_name in collaborations:
-                session.run("""
-                    MATCH (r1:Researcher {name: $r1_name})
-                    MATCH (r2:Researcher {name: $r2_name})
-                    CREATE (r1)-[:COLLABORATES_WITH]->(r2)
-                """, r1_name=r1_name, r2_name=r2_name)
-            print(f"Created {len(collaborations)} COLLABORATES_WITH relationships.")
+            load_neo4j_relationships(session, "COLLABORATES_WITH", "Researcher", "Researcher",
+                                     [{"start": r1_name, "end": r2_name} for r1_name, r2_name in collaborations])
 
             # WORKS_ON (linking researchers to projects/topics - simplified as nodes for now)
             # First, create some project/topic nodes
@@ -300,11 +374,8 @@ def populate_neo4j():
                 {"name": "AI in Healthcare", "domain": "Healthcare AI"}, # From paper example [cite: 88, 89]
                 {"name": "Knowledge-Intensive NLP", "domain": "NLP"}
             ]
-            for pt in projects_topics_data:
-                # Using a generic 'ProjectOrTopic' label for simplicity
-                session.run("CREATE (pt:ProjectOrTopic {name: $name, domain: $domain})",
-                            name=pt["name"], domain=pt["domain"])
-            print(f"Created {len(projects_topics_data)} ProjectOrTopic nodes.")
+            # Using a generic 'ProjectOrTopic' label for simplicity
+            load_neo4j_nodes(session, "ProjectOrTopic", projects_topics_data)
             
             # Now, link researchers to these
             works_on_relations = [
@@ -314,15 +385,12 @@ def populate_neo4j():
                 ("Patrick Lewis", "Knowledge-Intensive NLP"),
                 ("Theodore R. Sumers", "AI in Healthcare") # Example for a second researcher on the same project
             ]
-            for researcher_name, project_name in works_on_relations:
-                session.run("""
-                    MATCH (r:Researcher {name: $researcher_name})
-                    MATCH (pt:ProjectOrTopic {name: $project_name})
-                    CREATE (r)-[:WORKS_ON]->(pt)
-                """, researcher_name=researcher_name, project_name=project_name)
-            print(f"Created {len(works_on_relations)} WORKS_ON relationships.")
+            load_neo4j_relationships(session, "WORKS_ON", "Researcher", "ProjectOrTopic",
+                                     [{"start": researcher_name, "end": project_name}
+                                      for researcher_name, project_name in works_on_relations])
 
         print("Neo4j database 'mygraphdb' populated successfully.")
+        invalidate_store("neo4j")
 
     except Exception as e:
         print(f"An error occurred during Neo4j population: {e}")
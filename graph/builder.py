@@ -1,9 +1,21 @@
+import logging
+
 from langgraph.graph import StateGraph, END
-from .state import GraphState 
-from agents.router import route_query
-from agents.query_generator import generate_query
-from agents.executor_and_responder import execute_query, generate_response
-from agents.query_refiner import suggest_refined_query 
+from .state import GraphState, initial_state
+from tools.query_result import QueryResult
+from agents.router import route_query, aroute_query
+from agents.fused_router import FUSED_ROUTING_ENABLED, fused_route_query, afused_route_query
+from agents.query_generator import generate_query, agenerate_query
+from agents.executor_and_responder import execute_query, aexecute_query, generate_response, agenerate_response
+from agents.query_refiner import suggest_refined_query, asuggest_refined_query
+from agents.fanout import should_fan_out, fanout_query, afanout_query, merge_fanout
+from agents.context_compactor import compact_context
+from .telemetry import traced_node
+
+logger = logging.getLogger(__name__)
+
+# Default config for a graph run (refinement loops add several steps per attempt).
+GRAPH_RUN_CONFIG = {"recursion_limit": 100}
 
 def should_route_or_end(state: GraphState) -> str: # Renamed for clarity
     """
@@ -11,7 +23,7 @@ def should_route_or_end(state: GraphState) -> str: # Renamed for clarity
     Determines if we should proceed to query generation (if a specific DB is chosen),
     end the graph (if clarification is needed, so UI can take over), or end directly.
     """
-    print("---CONDITION: After Router---")
+    logger.info("---CONDITION: After Router---")
     
     # Handle hard errors from the router itself first
     # The router's error handling already sets data_source to "end" and populates "error"
@@ -19,23 +31,35 @@ def should_route_or_end(state: GraphState) -> str: # Renamed for clarity
         if "Failed to connect" in state.get("error", "") or \
            "JSON PARSING ERROR" in state.get("error", "") or \
            "UNEXPECTED ERROR" in state.get("error", ""):
-            print(f"Router encountered a critical error: {state.get('error')}. Ending graph.")
+            logger.warning("Router encountered a critical error: %s. Ending graph.", state.get('error'))
             return "terminate_graph" # A distinct end path for router critical errors
 
     data_source = state.get("data_source")
 
+    # Optional speculative mode (FANOUT_ENABLED=1): on a low-confidence route, try the
+    # top candidate backends in parallel instead of asking the user or risking a misroute.
+    if should_fan_out(state):
+        logger.info("Low-confidence route (%s). Fanning out across candidate backends.", data_source)
+        return "to_fanout"
+
+    # The fused router (FUSED_ROUTING_ENABLED=1) already wrote the query in the routing call
+    if data_source in ["sqlite", "mongodb", "meilisearch", "neo4j"] and \
+       state.get("route_path") == "fused" and state.get("generated_query"):
+        logger.info("Data source '%s' and query chosen by the fused router. Proceeding to query execution.", data_source)
+        return "to_query_executor"
+
     if data_source in ["sqlite", "mongodb", "meilisearch", "neo4j"]: 
-        print(f"Data source '{data_source}' selected by router. Proceeding to query generation.")
+        logger.info("Data source '%s' selected by router. Proceeding to query generation.", data_source)
         return "to_query_generator" 
     elif data_source == "clarification_needed":
         # If router signals clarification is needed, the graph run should end here.
         # The UI will pick up 'clarification_question_text' from the state.
-        print("Router determined clarification is needed. Graph run will end; UI to handle user clarification.")
+        logger.info("Router determined clarification is needed. Graph run will end; UI to handle user clarification.")
         return "terminate_for_ui_clarification" # New distinct end path
     else: 
         # This handles cases where router explicitly set data_source to "end" (e.g., for truly unroutable queries not needing clarification)
         # or any other unexpected data_source value.
-        print(f"Router output data_source is '{data_source}'. Not routing to a specific agent or clarification. Ending graph.")
+        logger.info("Router output data_source is '%s'. Not routing to a specific agent or clarification. Ending graph.", data_source)
         return "terminate_graph" # General end path
 
 def decide_after_execution(state: GraphState) -> str:
@@ -44,36 +68,59 @@ def decide_after_execution(state: GraphState) -> str:
     Decides whether to refine the query or proceed to response generation.
     Hard errors from executor should lead to response generation to display the error.
     """
-    print("---CONDITION: After Query Execution---")
+    logger.info("---CONDITION: After Query Execution---")
     
-    # If a hard error occurred during execution (not just "no results")
-    # The execute_query node should set state["error"] appropriately.
-    # Let's check for errors that don't indicate "no results" or "refinement already tried"
-    current_error = state.get("error")
-    is_hard_error = current_error and \
-                    "Query and its refinement(s) returned no results." not in current_error and \
-                    "Query execution for" not in current_error # This was a generic "no context" error we set
-
-    if is_hard_error:
-        print(f"Hard error detected after execution: {current_error}. Proceeding to response generator.")
+    # The executor stores a QueryResult in context, so "hard error" vs. "no results"
+    # is read from its error_kind rather than from the wording of an error message.
+    result = state.get("context")
+    # Queries rejected by the query guard are errors too, but go to the refiner below
+    if isinstance(result, QueryResult) and result.is_error and not state.get("needs_query_refinement"):
+        logger.warning("Hard error (%s) detected after execution: %s. Proceeding to response generator.",
+                       result.error_kind, result.error)
+        return "to_response_generator"
+    if not isinstance(result, QueryResult) and state.get("error"):
+        # No query was run at all (e.g. nothing was generated)
+        logger.warning("Error before execution: %s. Proceeding to response generator.", state.get('error'))
         return "to_response_generator"
 
     if state.get("needs_query_refinement", False): 
-        print("Query needs refinement. Proceeding to query refiner.")
+        logger.info("Query needs refinement. Proceeding to query refiner.")
         return "to_query_refiner"
     else:
-        print("Query successful or no further refinement needed/possible. Proceeding to response generation.")
+        logger.info("Query successful or no further refinement needed/possible. Proceeding to response generation.")
         return "to_response_generator"
 
+def decide_after_fanout(state: GraphState) -> str:
+    """
+    Conditional edge after fanout_merger.
+    The merged state looks like a query_executor output, unless no branch found
+    anything for a general question, in which case the clarification stands.
+    """
+    logger.info("---CONDITION: After Fan-out---")
+    if state.get("data_source") == "clarification_needed":
+        logger.info("No candidate backend returned data. Graph run will end; UI to handle user clarification.")
+        return "terminate_for_ui_clarification"
+    return decide_after_execution(state)
+
 # --- Define the graph ---
 workflow = StateGraph(GraphState)
 
 # --- Add the nodes ---
-workflow.add_node("router", route_query)
-workflow.add_node("query_generator", generate_query) 
-workflow.add_node("query_executor", execute_query)
-workflow.add_node("query_refiner", suggest_refined_query)
-workflow.add_node("response_generator", generate_response)
+# Each node has a sync and an async implementation: app.invoke/stream use the former,
+# app.ainvoke/astream the latter, so an async caller never blocks its event loop.
+# traced_node records a telemetry span (LLM / database / parse time, tokens) per execution.
+if FUSED_ROUTING_ENABLED:
+    # One LLM call for the route and the query; falls back to the two-step path on a bad answer
+    workflow.add_node("router", traced_node("router", fused_route_query, afused_route_query))
+else:
+    workflow.add_node("router", traced_node("router", route_query, aroute_query))
+workflow.add_node("query_generator", traced_node("query_generator", generate_query, agenerate_query))
+workflow.add_node("query_executor", traced_node("query_executor", execute_query, aexecute_query))
+workflow.add_node("query_refiner", traced_node("query_refiner", suggest_refined_query, asuggest_refined_query))
+workflow.add_node("response_generator", traced_node("response_generator", generate_response, agenerate_response))
+workflow.add_node("fanout", traced_node("fanout", fanout_query, afanout_query))
+workflow.add_node("fanout_merger", traced_node("fanout_merger", merge_fanout))
+workflow.add_node("context_compactor", traced_node("context_compactor", compact_context))
 # We do NOT add the 'handle_clarification_needed' node here, as UI will manage that interaction.
 
 # --- Add the edges ---
@@ -85,6 +132,8 @@ workflow.add_conditional_edges(
     should_route_or_end, 
     {
         "to_query_generator": "query_generator", 
+        "to_query_executor": "query_executor", # Query already written by the fused router
+        "to_fanout": "fanout", # Speculative parallel branches for low-confidence routes
         "terminate_for_ui_clarification": END, # End the graph; UI handles clarification prompt
         "terminate_graph": END, # General end path for router errors or unroutable queries
     },
@@ -99,15 +148,53 @@ workflow.add_conditional_edges(
     decide_after_execution, 
     {
         "to_query_refiner": "query_refiner",        
-        "to_response_generator": "response_generator" 
+        "to_response_generator": "context_compactor" 
+    }
+)
+
+# Fan-out branches are merged, then continue like a normal execution
+workflow.add_edge("fanout", "fanout_merger")
+workflow.add_conditional_edges(
+    "fanout_merger",
+    decide_after_fanout,
+    {
+        "to_query_refiner": "query_refiner",
+        "to_response_generator": "context_compactor",
+        "terminate_for_ui_clarification": END,
     }
 )
 
 # Edge from query refiner back to query executor
 workflow.add_edge("query_refiner", "query_executor")
 
+# Results are compacted to the token budget before the response prompt
+workflow.add_edge("context_compactor", "response_generator")
+
 # Edge from response generator to the end
 workflow.add_edge("response_generator", END)
 
 # --- Compile the graph into a runnable app ---
-app = workflow.compile()
\ No newline at end of file
+app = workflow.compile()
+
+
+def _run_config(callbacks=None) -> dict:
+    return {**GRAPH_RUN_CONFIG, "callbacks": callbacks} if callbacks else GRAPH_RUN_CONFIG
+
+
+async def arun_turn(user_query: str, callbacks=None, time_budget=None) -> GraphState:
+    """
+    Async entry point: runs one question through the graph and returns the final state.
+    Database pools are per event loop and outlive the turn; await
+    tools.async_db_tools.aclose_all_connections() before the loop shuts down.
+    """
+    return await app.ainvoke(initial_state(user_query, time_budget), _run_config(callbacks))
+
+
+async def astream_turn(user_query: str, callbacks=None, time_budget=None):
+    """
+    Async entry point that yields {node_name: state} after each node, like app.stream.
+    `callbacks` (e.g. a TokenStreamHandler) receive the answer tokens as they are generated.
+    `time_budget` (seconds) bounds the database queries by the time the turn has left.
+    """
+    async for output in app.astream(initial_state(user_query, time_budget), _run_config(callbacks)):
+        yield output
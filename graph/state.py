@@ -1,4 +1,5 @@
-from typing import TypedDict, Literal, Optional, Any
+import time
+from typing import TypedDict, Literal, Optional, Any, List
 
 class GraphState(TypedDict):
     """
@@ -32,4 +33,66 @@ class GraphState(TypedDict):
     clarification_question_needed: bool
     clarification_question_text: Optional[str]
     user_clarification_response: Optional[str]
-    original_query_before_clarification: Optional[str]
\ No newline at end of file
+    original_query_before_clarification: Optional[str]
+    
+    
+    
+    # --- Fields for speculative fan-out (agents/fanout.py) ---
+    route_confidence: Optional[Literal["high", "low"]] # How sure the router is about data_source
+    candidate_data_sources: Optional[List[str]] # Backends the routing rules found evidence for, best first
+    fanout_branches: Optional[List[dict]] # Outcome of each speculative branch, in completion order
+    
+    
+    
+    # --- Fields for context compaction (agents/context_compactor.py) ---
+    compacted_context: Optional[str] # Token-budgeted form of context used in the response prompt
+    context_stats: Optional[dict] # original/compacted token counts and compression ratio for this turn
+    
+    
+    
+    # --- Fields for response streaming (agents/response_streaming.py) ---
+    response_metrics: Optional[dict] # time_to_first_token_ms and total_ms of the response LLM call
+    
+    
+    
+    # --- Fields for telemetry (graph/telemetry.py) ---
+    trace_id: Optional[str] # Shared by the spans of every node in this turn
+    
+    
+    
+    # --- Fields for the fused router (agents/fused_router.py) ---
+    route_path: Optional[Literal["two_step", "fused", "fused_fallback"]] # How an LLM-routed turn got its query
+    
+    
+    
+    # --- Fields for query time limits (tools/query_timeouts.py) ---
+    turn_deadline: Optional[float] # time.monotonic() by which the turn must finish; None without a time budget
+
+
+def initial_state(user_query: str, time_budget: Optional[float] = None) -> GraphState:
+    """
+    The state a new turn starts from, shared by the CLI, the UI and the async entry point.
+    With a `time_budget` (seconds), database queries are limited to the time the turn has left.
+    """
+    return {
+        "query": user_query,
+        "data_source": None, 
+        "generated_query": None,
+        "context": None,
+        "response": None,
+        "error": None,
+        "original_user_query": user_query, 
+        "initial_generated_query": None,
+        "last_failed_query": None,
+        "needs_query_refinement": False, 
+        "refinement_attempt_count": 0,
+        "route_confidence": None,
+        "candidate_data_sources": None,
+        "fanout_branches": None,
+        "compacted_context": None,
+        "context_stats": None,
+        "response_metrics": None,
+        "trace_id": None,
+        "route_path": None,
+        "turn_deadline": time.monotonic() + time_budget if time_budget else None
+    }
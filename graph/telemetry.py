@@ -0,0 +1,345 @@
+# graph/telemetry.py
+#
+# Per-node spans for the LangGraph workflow: wall time split into LLM, database and
+# parsing time, plus prompt/completion token counts. Spans are kept in memory for
+# p50/p95/p99 summaries and appended to a JSON-lines file, either as flat records
+# ("jsonl") or as OTLP/JSON ResourceSpans ("otel", readable by an OpenTelemetry
+# Collector file receiver).
+#
+# Summarize an exported file with:  python -m graph.telemetry [path]
+import contextvars
+import json
+import logging
+import os
+import secrets
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.runnables import RunnableLambda
+
+from tools.cache_utils import cache_path
+
+logger = logging.getLogger(__name__)
+
+# --- Telemetry Settings ---
+TELEMETRY_EXPORT = os.getenv("TELEMETRY_EXPORT", "jsonl")  # "jsonl", "otel" or "off"
+TELEMETRY_FILE = os.getenv("TELEMETRY_FILE") or cache_path("telemetry.jsonl")
+TELEMETRY_MAX_SPANS = 5000  # Spans kept in memory for summaries
+TELEMETRY_SERVICE_NAME = "multi-agent-rag"
+
+PERCENTILES = (50, 95, 99)
+SPAN_TIMINGS = ("duration_ms", "llm_ms", "db_ms", "parse_ms")
+
+_current_span = contextvars.ContextVar("rag_current_span", default=None)
+_spans = deque(maxlen=TELEMETRY_MAX_SPANS)
+_lock = threading.Lock()
+
+
+class Span:
+    """Timing and token counters for one execution of one graph node."""
+
+    def __init__(self, name: str, trace_id: str):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self._started_at = time.perf_counter()
+        self.duration_ms = 0.0
+        self.llm_ms = 0.0
+        self.db_ms = 0.0
+        self.parse_ms = 0.0
+        self.llm_calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.tokens_estimated = False
+        self.attributes = {}
+        self.error = None
+        self._lock = threading.Lock()  # Fan-out branches report into the same span from several threads
+
+    def add(self, field: str, amount) -> None:
+        with self._lock:
+            setattr(self, field, getattr(self, field) + amount)
+
+    def finish(self) -> None:
+        self.end_ns = time.time_ns()
+        self.duration_ms = round((time.perf_counter() - self._started_at) * 1000, 2)
+
+    def to_record(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "name": self.name,
+            "start_time_unix_nano": self.start_ns,
+            "end_time_unix_nano": self.end_ns,
+            "duration_ms": self.duration_ms,
+            "llm_ms": round(self.llm_ms, 2),
+            "db_ms": round(self.db_ms, 2),
+            "parse_ms": round(self.parse_ms, 2),
+            "llm_calls": self.llm_calls,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "tokens_estimated": self.tokens_estimated,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+# --- Recording helpers used by the nodes ---
+def current_span():
+    return _current_span.get()
+
+
+@contextmanager
+def span_timer(kind: str):
+    """Adds the time spent in the block to the current span's `<kind>_ms` ("llm", "db" or "parse")."""
+    span = _current_span.get()
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        if span is not None:
+            span.add(f"{kind}_ms", (time.perf_counter() - started_at) * 1000)
+
+
+def set_span_attribute(key: str, value) -> None:
+    span = _current_span.get()
+    if span is not None:
+        span.attributes[key] = value
+
+
+class LLMTelemetryHandler(BaseCallbackHandler):
+    """
+    Attached to every shared LLM client (agents/llm_registry.py): times each call and
+    records its token usage on the span of the node that made it. Streamed calls report
+    no usage, so their tokens are estimated locally.
+    """
+
+    def __init__(self):
+        self._calls = {}  # run_id -> (span, started_at, prompt_text)
+        self._lock = threading.Lock()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        span = _current_span.get()
+        if span is None:
+            return
+        prompt_text = "\n".join(str(m.content) for batch in messages for m in batch)
+        with self._lock:
+            self._calls[run_id] = (span, time.perf_counter(), prompt_text)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        with self._lock:
+            call = self._calls.pop(run_id, None)
+        if call is None:
+            return
+        span, started_at, prompt_text = call
+        span.add("llm_ms", (time.perf_counter() - started_at) * 1000)
+        span.add("llm_calls", 1)
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        if usage.get("prompt_tokens") is not None:
+            span.add("prompt_tokens", usage.get("prompt_tokens") or 0)
+            span.add("completion_tokens", usage.get("completion_tokens") or 0)
+        else:
+            from agents.context_compactor import count_tokens
+            completion_text = "".join(g.text for batch in response.generations for g in batch)
+            span.add("prompt_tokens", count_tokens(prompt_text))
+            span.add("completion_tokens", count_tokens(completion_text))
+            span.tokens_estimated = True
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        with self._lock:
+            call = self._calls.pop(run_id, None)
+        if call is not None:
+            span, started_at, _ = call
+            span.add("llm_ms", (time.perf_counter() - started_at) * 1000)
+            span.add("llm_calls", 1)
+
+
+llm_telemetry_handler = LLMTelemetryHandler()
+
+
+# --- Node instrumentation ---
+def _start_span(name: str, state: dict):
+    trace_id = state.get("trace_id") or secrets.token_hex(16)
+    span = Span(name, trace_id)
+    if state.get("data_source"):
+        span.attributes["data_source"] = state["data_source"]
+    return span, _current_span.set(span)
+
+
+def _end_span(span: Span, token, result) -> None:
+    _current_span.reset(token)
+    span.finish()
+    if isinstance(result, dict):
+        result["trace_id"] = span.trace_id  # Later nodes of this turn join the same trace
+        if result.get("data_source"):
+            span.attributes["data_source"] = result["data_source"]
+    record_span(span)
+
+
+def traced_node(name: str, func, afunc=None):
+    """
+    Wraps a node (and its async version, if any) so every execution produces a span.
+    Used by graph/builder.py when registering nodes.
+    """
+    def run(state):
+        span, token = _start_span(name, state)
+        result = None
+        try:
+            result = func(state)
+            return result
+        except Exception as e:
+            span.error = str(e)
+            raise
+        finally:
+            _end_span(span, token, result)
+
+    async def arun(state):
+        span, token = _start_span(name, state)
+        result = None
+        try:
+            result = await (afunc(state) if afunc is not None else _to_thread(func, state))
+            return result
+        except Exception as e:
+            span.error = str(e)
+            raise
+        finally:
+            _end_span(span, token, result)
+
+    return RunnableLambda(run, afunc=arun, name=name)
+
+
+async def _to_thread(func, state):
+    import asyncio
+    return await asyncio.to_thread(func, state)
+
+
+# --- Storage, export and summaries ---
+def record_span(span: Span) -> None:
+    record = span.to_record()
+    with _lock:
+        _spans.append(record)
+        if TELEMETRY_EXPORT == "off":
+            return
+        line = json.dumps(_to_otlp(record) if TELEMETRY_EXPORT == "otel" else record, default=str)
+        try:
+            os.makedirs(os.path.dirname(TELEMETRY_FILE) or ".", exist_ok=True)
+            with open(TELEMETRY_FILE, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        except OSError as e:
+            logger.warning("Could not export telemetry span to '%s': %s", TELEMETRY_FILE, e)
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _to_otlp(record: dict) -> dict:
+    """One span as an OTLP/JSON ResourceSpans document."""
+    attributes = {f"rag.{key}": record[key] for key in
+                  ("llm_ms", "db_ms", "parse_ms", "llm_calls", "prompt_tokens", "completion_tokens", "tokens_estimated")}
+    attributes.update({f"rag.{key}": value for key, value in record["attributes"].items()})
+    span = {
+        "traceId": record["trace_id"],
+        "spanId": record["span_id"],
+        "name": record["name"],
+        "kind": 1,  # SPAN_KIND_INTERNAL
+        "startTimeUnixNano": str(record["start_time_unix_nano"]),
+        "endTimeUnixNano": str(record["end_time_unix_nano"]),
+        "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items()],
+        "status": {"code": 2, "message": record["error"]} if record["error"] else {"code": 1},
+    }
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": TELEMETRY_SERVICE_NAME}}]},
+        "scopeSpans": [{"scope": {"name": "graph.telemetry"}, "spans": [span]}],
+    }]}
+
+
+def _from_otlp(document: dict):
+    for resource_spans in document.get("resourceSpans", []):
+        for scope_spans in resource_spans.get("scopeSpans", []):
+            for span in scope_spans.get("spans", []):
+                attributes = {a["key"]: next(iter(a["value"].values())) for a in span.get("attributes", [])}
+                start, end = int(span["startTimeUnixNano"]), int(span["endTimeUnixNano"])
+                yield {
+                    "name": span["name"],
+                    "duration_ms": (end - start) / 1e6,
+                    **{key: float(attributes.get(f"rag.{key}", 0)) for key in ("llm_ms", "db_ms", "parse_ms")},
+                    **{key: int(attributes.get(f"rag.{key}", 0)) for key in ("prompt_tokens", "completion_tokens")},
+                }
+
+
+def _percentile(sorted_values: list, pct: int) -> float:
+    # Nearest-rank percentile
+    index = max(0, min(len(sorted_values) - 1, -(-pct * len(sorted_values) // 100) - 1))
+    return round(sorted_values[index], 2)
+
+
+def percentiles(values) -> dict:
+    """{"p50": ..., "p95": ..., "p99": ...} of a non-empty list of numbers."""
+    sorted_values = sorted(values)
+    return {f"p{pct}": _percentile(sorted_values, pct) for pct in PERCENTILES}
+
+
+def summarize(records) -> dict:
+    """Per-node count, p50/p95/p99 of each timing and mean token counts."""
+    by_node = {}
+    for record in records:
+        by_node.setdefault(record["name"], []).append(record)
+    summary = {}
+    for name, node_records in sorted(by_node.items()):
+        node_summary = {"count": len(node_records)}
+        for timing in SPAN_TIMINGS:
+            node_summary[timing] = percentiles(r.get(timing, 0.0) for r in node_records)
+        for tokens in ("prompt_tokens", "completion_tokens"):
+            node_summary[f"mean_{tokens}"] = round(sum(r.get(tokens, 0) for r in node_records) / len(node_records), 1)
+        summary[name] = node_summary
+    return summary
+
+
+def telemetry_summary() -> dict:
+    """Summary of the spans recorded by this process (up to TELEMETRY_MAX_SPANS)."""
+    with _lock:
+        records = list(_spans)
+    return summarize(records)
+
+
+def reset_spans() -> None:
+    """Forgets the spans recorded so far (the exported file is left alone)."""
+    with _lock:
+        _spans.clear()
+
+
+def load_spans(path: str = TELEMETRY_FILE) -> list:
+    """Reads an exported file in either format."""
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                document = json.loads(line)
+                records.extend(_from_otlp(document) if "resourceSpans" in document else [document])
+    return records
+
+
+def format_summary(summary: dict) -> str:
+    header = f"{'node':<20}{'count':>7}" + "".join(
+        f"{timing + ' p' + str(pct):>18}" for timing in SPAN_TIMINGS for pct in PERCENTILES)
+    lines = [header]
+    for name, node_summary in summary.items():
+        lines.append(f"{name:<20}{node_summary['count']:>7}" + "".join(
+            f"{node_summary[timing][f'p{pct}']:>18}" for timing in SPAN_TIMINGS for pct in PERCENTILES))
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    print(format_summary(summarize(load_spans(sys.argv[1] if len(sys.argv) > 1 else TELEMETRY_FILE))))
@@ -0,0 +1,106 @@
+# logging_config.py
+#
+# Logging for the agents, graph, tools and api packages. Every module logs through
+# logging.getLogger(__name__) with %-style arguments, so a message below the configured
+# level is dropped before it is formatted.
+#
+#   LOG_LEVEL=DEBUG    also log raw LLM output, extracted queries and result previews
+#   LOG_LEVEL=WARNING  only problems (recommended for the HTTP API)
+#   LOG_ASYNC=1        hand records to a background thread that formats and writes them
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_ASYNC = os.getenv("LOG_ASYNC", "0") == "1"
+LOG_FORMAT = "%(asctime)s %(levelname)-7s %(name)s: %(message)s"
+
+# Top-level loggers of this project; third-party loggers (httpx, neo4j, ...) are left alone.
+APP_LOGGERS = ("agents", "graph", "tools", "api")
+
+_listener = None
+_configured = False
+_lock = threading.Lock()
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves the %-formatting to the listener thread instead of the caller."""
+
+    def prepare(self, record):
+        return record
+
+
+def configure_logging(level: str = None, async_handler: bool = None, stream=None) -> None:
+    """
+    Attaches one handler to the project loggers. Safe to call more than once;
+    only the first call has an effect.
+    """
+    global _listener, _configured
+    with _lock:
+        if _configured:
+            return
+        _configured = True
+        handler = logging.StreamHandler(stream or sys.stderr)
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        if LOG_ASYNC if async_handler is None else async_handler:
+            log_queue = queue.SimpleQueue()
+            _listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+            _listener.start()
+            atexit.register(shutdown_logging)
+            handler = _DeferredQueueHandler(log_queue)
+        for name in APP_LOGGERS:
+            logger = logging.getLogger(name)
+            logger.setLevel(level or LOG_LEVEL)
+            logger.addHandler(handler)
+            logger.propagate = False
+
+
+def shutdown_logging() -> None:
+    """Writes out the records still queued for the background thread (LOG_ASYNC=1)."""
+    global _listener
+    with _lock:
+        listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
+
+
+class LogCapture(logging.Handler):
+    """
+    Collects formatted records from the project loggers while attached, e.g. to show a
+    turn's log in the Streamlit UI:
+
+        with LogCapture() as capture:
+            ...
+            new_lines = capture.drain()
+    """
+
+    def __init__(self, level=logging.NOTSET):
+        super().__init__(level)
+        self.setFormatter(logging.Formatter("%(levelname)s %(name)s: %(message)s"))
+        self._lines = []
+        self._lines_lock = threading.Lock()
+
+    def emit(self, record):
+        line = self.format(record)
+        with self._lines_lock:
+            self._lines.append(line)
+
+    def drain(self) -> str:
+        """Returns the lines collected since the last call and forgets them."""
+        with self._lines_lock:
+            lines, self._lines = self._lines, []
+        return "".join(line + "\n" for line in lines)
+
+    def __enter__(self):
+        for name in APP_LOGGERS:
+            logging.getLogger(name).addHandler(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        for name in APP_LOGGERS:
+            logging.getLogger(name).removeHandler(self)
+        return False
@@ -0,0 +1,278 @@
+import logging
+import time
+
+import aiosqlite
+import httpx
+from neo4j import AsyncGraphDatabase, Query
+from pymongo import AsyncMongoClient
+from pymongo.errors import ExecutionTimeout
+
+from tools.connection_pool import AsyncConnectionPool, AsyncSharedClient, get_async_pool, aclose_all_pools
+from tools.db_tools import (
+    SQLITE_DB_PATH, MONGODB_URI, MEILISEARCH_URL, NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD,
+    SQLITE_POOL_SIZE, SQLITE_CACHED_STATEMENTS, POOL_IDLE_TIMEOUT, POOL_VALIDATE_AFTER, MONGODB_MAX_POOL_SIZE, NEO4J_MAX_POOL_SIZE,
+    MAX_RESULT_ROWS, FETCH_BATCH_SIZE, SQLITE_PROGRESS_STEPS, parse_mongodb_query, timeout_failure,
+    sqlite_deadline_handler, is_sqlite_interrupt, mongodb_max_time_ms, is_neo4j_timeout, sqlite_count_query,
+)
+from tools.parameterize import parameterize_cypher, parameterize_sql
+from tools.query_result import QueryResult, ERROR_PARSE, ERROR_CONNECTION, ERROR_EXECUTION
+from tools.query_timeouts import QUERY_TIMEOUTS
+
+logger = logging.getLogger(__name__)
+
+# Async counterparts of the tools in tools/db_tools.py, used by the async graph nodes.
+# aexecute_* return the same QueryResult objects as the sync execute_* functions;
+# arun_* return the same strings as the sync @tool functions.
+
+
+async def aclose_all_connections():
+    """Shutdown hook for the async pools of the running event loop."""
+    await aclose_all_pools()
+
+
+# --- SQLite (aiosqlite) ---
+async def _ping_sqlite(conn):
+    async with conn.execute("SELECT 1") as cursor:
+        await cursor.fetchone()
+
+def _build_async_sqlite_pool():
+    return AsyncConnectionPool(
+        "sqlite",
+        lambda: aiosqlite.connect(SQLITE_DB_PATH, cached_statements=SQLITE_CACHED_STATEMENTS),
+        max_size=SQLITE_POOL_SIZE,
+        idle_timeout=POOL_IDLE_TIMEOUT,
+        validate_after=POOL_VALIDATE_AFTER,
+        health_check=_ping_sqlite,
+    )
+
+def _elapsed_ms(started_at: float) -> float:
+    return round((time.perf_counter() - started_at) * 1000, 2)
+
+async def _acount_sqlite_rows(conn, template: str, params) -> int:
+    """Async version of count_sqlite_rows."""
+    try:
+        async with conn.execute(sqlite_count_query(template), params) as cursor:
+            return (await cursor.fetchone())[0]
+    except aiosqlite.Error as e:
+        logger.info("Could not count the full SQLite result (%s); reporting it as more than %d rows.",
+                    e, MAX_RESULT_ROWS)
+        return MAX_RESULT_ROWS + 1
+
+async def aexecute_sqlite_query(query: str, timeout: float = None) -> QueryResult:
+    """Async version of execute_sqlite_query."""
+    started_at = time.perf_counter()
+    try:
+        pool = get_async_pool("sqlite", _build_async_sqlite_pool)
+        rows = []
+        template, params = parameterize_sql(query)
+        async with pool.connection() as conn:
+            if timeout is not None:
+                await conn.set_progress_handler(sqlite_deadline_handler(timeout), SQLITE_PROGRESS_STEPS)
+            try:
+                # Read one row past the cap, then stop; the cursor is not stepped any further.
+                async with conn.execute(template, params) as cursor:
+                    columns = [column[0] for column in cursor.description or ()]
+                    while len(rows) <= MAX_RESULT_ROWS:
+                        batch = await cursor.fetchmany(FETCH_BATCH_SIZE)
+                        if not batch:
+                            break
+                        rows.extend(batch)
+                total = len(rows)
+                if total > MAX_RESULT_ROWS:
+                    rows = rows[:MAX_RESULT_ROWS]
+                    total = await _acount_sqlite_rows(conn, template, params)
+            finally:
+                if timeout is not None:
+                    await conn.set_progress_handler(None, 0)
+                if conn.in_transaction:
+                    await conn.rollback()
+        return QueryResult.from_rows("sqlite", rows, total, columns or None, _elapsed_ms(started_at))
+    except Exception as e:
+        if is_sqlite_interrupt(e):
+            return timeout_failure("sqlite", timeout, _elapsed_ms(started_at))
+        return QueryResult.failure("sqlite", ERROR_EXECUTION, f"An error occurred: {e}", _elapsed_ms(started_at))
+
+async def arun_sqlite_query(query: str) -> str:
+    """Async version of run_sqlite_query."""
+    return (await aexecute_sqlite_query(query)).to_text()
+
+
+# --- MongoDB (pymongo AsyncMongoClient) ---
+async def _create_async_mongodb_client():
+    return AsyncMongoClient(
+        MONGODB_URI,
+        maxPoolSize=MONGODB_MAX_POOL_SIZE,
+        maxIdleTimeMS=int(POOL_IDLE_TIMEOUT * 1000),
+    )
+
+async def _ping_mongodb(client):
+    await client.admin.command("ping")
+
+def _build_async_mongodb_client():
+    return AsyncSharedClient(
+        "mongodb",
+        _create_async_mongodb_client,
+        health_check=_ping_mongodb,
+        idle_timeout=POOL_IDLE_TIMEOUT,
+        validate_after=POOL_VALIDATE_AFTER,
+    )
+
+async def aexecute_mongodb_query(query_str: str, timeout: float = None) -> QueryResult:
+    """Async version of execute_mongodb_query."""
+    started_at = time.perf_counter()
+    try:
+        client = await get_async_pool("mongodb", _build_async_mongodb_client).get()
+        collection = client['research_db']['papers']
+
+        try:
+            query_dict = parse_mongodb_query(query_str)
+        except (ValueError, SyntaxError) as e:
+            return QueryResult.failure(
+                "mongodb", ERROR_PARSE,
+                f"Failed to parse query string. It must be a valid dictionary string. Error: {e}",
+                _elapsed_ms(started_at))
+
+        cursor = collection.find(query_dict, {'_id': 0}, limit=MAX_RESULT_ROWS + 1, batch_size=FETCH_BATCH_SIZE,
+                                 max_time_ms=mongodb_max_time_ms(timeout))
+        result = await cursor.to_list(None)
+
+        total = len(result)
+        if total > MAX_RESULT_ROWS:
+            result = result[:MAX_RESULT_ROWS]
+            count_options = {} if timeout is None else {"maxTimeMS": mongodb_max_time_ms(timeout)}
+            total = await collection.count_documents(query_dict, **count_options)
+        return QueryResult.from_rows("mongodb", result, total, elapsed_ms=_elapsed_ms(started_at))
+    except ExecutionTimeout:
+        return timeout_failure("mongodb", timeout, _elapsed_ms(started_at))
+    except Exception as e:
+        return QueryResult.failure("mongodb", ERROR_EXECUTION,
+                                   f"An error occurred during MongoDB query execution: {e}", _elapsed_ms(started_at))
+
+async def arun_mongodb_query(query_str: str) -> str:
+    """Async version of run_mongodb_query."""
+    return (await aexecute_mongodb_query(query_str)).to_text()
+
+
+# --- MeiliSearch (REST API over a pooled httpx.AsyncClient) ---
+async def _create_async_meilisearch_client():
+    return httpx.AsyncClient(base_url=MEILISEARCH_URL, timeout=QUERY_TIMEOUTS["meilisearch"])
+
+async def _ping_meilisearch(client):
+    response = await client.get("/health")
+    response.raise_for_status()
+
+async def _close_httpx_client(client):
+    await client.aclose()
+
+def _build_async_meilisearch_client():
+    return AsyncSharedClient(
+        "meilisearch",
+        _create_async_meilisearch_client,
+        health_check=_ping_meilisearch,
+        dispose=_close_httpx_client,
+        idle_timeout=POOL_IDLE_TIMEOUT,
+        validate_after=POOL_VALIDATE_AFTER,
+    )
+
+async def aexecute_meilisearch_query(search_query: str, index_name: str = "support_tickets", limit: int = 5,
+                                     timeout: float = None) -> QueryResult:
+    """Async version of execute_meilisearch_query."""
+    started_at = time.perf_counter()
+    try:
+        client = await get_async_pool("meilisearch", _build_async_meilisearch_client).get()
+        request_options = {} if timeout is None else {"timeout": timeout}
+        response = await client.post(f"/indexes/{index_name}/search", json={"q": search_query, "limit": limit},
+                                     **request_options)
+        response.raise_for_status()
+        search_results = response.json()
+        logger.debug("MeiliSearch raw search_results: %s", search_results)
+
+        hits = search_results.get('hits', [])
+        total = search_results.get('estimatedTotalHits', len(hits))
+        return QueryResult.from_rows("meilisearch", hits, max(total, len(hits)), elapsed_ms=_elapsed_ms(started_at))
+    except httpx.TimeoutException:
+        return timeout_failure("meilisearch", timeout, _elapsed_ms(started_at))
+    except Exception as e:
+        return QueryResult.failure("meilisearch", ERROR_EXECUTION,
+                                   f"An error occurred during MeiliSearch query execution: {e}", _elapsed_ms(started_at))
+
+async def arun_meilisearch_query(search_query: str, index_name: str = "support_tickets", limit: int = 5) -> str:
+    """Async version of run_meilisearch_query."""
+    return (await aexecute_meilisearch_query(search_query, index_name, limit)).to_text()
+
+
+# --- Neo4j (AsyncGraphDatabase) ---
+async def _create_async_neo4j_driver():
+    driver = AsyncGraphDatabase.driver(
+        NEO4J_URI,
+        auth=(NEO4J_USER, NEO4J_PASSWORD),
+        max_connection_pool_size=NEO4J_MAX_POOL_SIZE,
+        max_connection_lifetime=3600,
+    )
+    try:
+        await driver.verify_connectivity()
+    except Exception:
+        await driver.close()
+        raise
+    return driver
+
+async def _ping_neo4j(driver):
+    await driver.verify_connectivity()
+
+def _build_async_neo4j_driver():
+    return AsyncSharedClient(
+        "neo4j",
+        _create_async_neo4j_driver,
+        health_check=_ping_neo4j,
+        idle_timeout=POOL_IDLE_TIMEOUT,
+        validate_after=POOL_VALIDATE_AFTER,
+    )
+
+async def aexecute_neo4j_query(cypher_query: str, database: str = "myraggraphdb", timeout: float = None) -> QueryResult:
+    """Async version of execute_neo4j_query."""
+    started_at = time.perf_counter()
+    try:
+        try:
+            driver = await get_async_pool("neo4j", _build_async_neo4j_driver).get()
+        except Exception as e:
+            return QueryResult.failure("neo4j", ERROR_CONNECTION,
+                                       f"Neo4j Connection Error: Could not connect to Neo4j: {e}", _elapsed_ms(started_at))
+
+        records_list = []
+        total = 0
+        template, params = parameterize_cypher(cypher_query)
+        async with driver.session(database=database) as session:
+            logger.debug("Executing Neo4j Cypher query: %s params=%s", template, params)
+            results = await session.run(Query(template, timeout=timeout), params)
+            columns = list(results.keys())
+            async for record in results:
+                if total < MAX_RESULT_ROWS:
+                    records_list.append(record.data())
+                total += 1
+
+        return QueryResult.from_rows("neo4j", records_list, total, columns or None, _elapsed_ms(started_at))
+    except Exception as e:
+        if is_neo4j_timeout(e):
+            return timeout_failure("neo4j", timeout, _elapsed_ms(started_at))
+        return QueryResult.failure("neo4j", ERROR_EXECUTION,
+                                   f"An error occurred during Neo4j Cypher query execution: {e}", _elapsed_ms(started_at))
+
+async def arun_neo4j_query(cypher_query: str, database: str = "myraggraphdb") -> str:
+    """Async version of run_neo4j_query."""
+    return (await aexecute_neo4j_query(cypher_query, database)).to_text()
+
+
+ASYNC_TOOLS_BY_DATA_SOURCE = {
+    "sqlite": arun_sqlite_query,
+    "mongodb": arun_mongodb_query,
+    "meilisearch": arun_meilisearch_query,
+    "neo4j": arun_neo4j_query,
+}
+
+# Structured (QueryResult) entry points used by the async query executor.
+ASYNC_QUERY_EXECUTORS = {
+    "sqlite": aexecute_sqlite_query,
+    "mongodb": aexecute_mongodb_query,
+    "meilisearch": aexecute_meilisearch_query,
+    "neo4j": aexecute_neo4j_query,
+}
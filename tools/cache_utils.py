@@ -0,0 +1,62 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import unicodedata
+
+logger = logging.getLogger(__name__)
+
+# Directory for on-disk caches (routing cache, query cache, ...). Override with RAG_CACHE_DIR.
+CACHE_DIR = os.getenv("RAG_CACHE_DIR", ".cache")
+
+
+def cache_path(filename: str) -> str:
+    """Returns the path of a cache file inside CACHE_DIR."""
+    return os.path.join(CACHE_DIR, filename)
+
+
+def normalize_question(text: str) -> str:
+    """
+    Normalizes a user question for cache lookups: Unicode-folds it, lowercases it,
+    drops punctuation and quotes and collapses whitespace.
+    "What is the status of the 'API Integration Service' project?" ->
+    "what is the status of the api integration service project"
+    """
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    text = re.sub(r"[^\w\s]", " ", text)
+    return " ".join(text.split())
+
+
+def stable_hash(*parts) -> str:
+    """Short, process-independent hash of the given parts (unlike the built-in hash())."""
+    digest = hashlib.sha256("\x1f".join(str(p) for p in parts).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def load_json(path: str, default):
+    """Loads a JSON cache file, returning `default` if it is missing or unreadable."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+    except (OSError, ValueError) as e:
+        logger.warning("Ignoring unreadable cache file '%s': %s", path, e)
+        return default
+
+
+def save_json_atomic(path: str, data) -> None:
+    """Writes JSON to `path` via a temp file + rename so readers never see a half-written file."""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".json")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
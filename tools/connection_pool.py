@@ -0,0 +1,435 @@
+import asyncio
+import logging
+import threading
+import time
+import weakref
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class PoolExhaustedError(RuntimeError):
+    """Raised when no connection could be checked out before the checkout timeout."""
+
+
+class ConnectionPool:
+    """
+    A small thread-safe pool of exclusive connections (e.g. SQLite connections).
+    Connections are created lazily up to `max_size`, handed out one caller at a time,
+    health-checked on checkout and closed once they sit idle longer than `idle_timeout`.
+    """
+
+    def __init__(self, name, factory, max_size=5, idle_timeout=300.0, health_check=None,
+                 dispose=None, validate_after=30.0, checkout_timeout=10.0):
+        self.name = name
+        self._factory = factory
+        self._health_check = health_check
+        self._dispose = dispose or (lambda conn: conn.close())
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.validate_after = validate_after
+        self.checkout_timeout = checkout_timeout
+
+        self._idle = deque()  # (connection, last_released_at), most recently used on the right
+        self._size = 0  # idle + checked out
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        """Checks out a healthy connection, creating one if the pool has room."""
+        deadline = time.monotonic() + self.checkout_timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError(f"Connection pool '{self.name}' is closed.")
+                self._evict_idle_locked()
+                if self._idle:
+                    conn, released_at = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    conn, released_at = None, None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolExhaustedError(
+                        f"Timed out waiting for a connection from pool '{self.name}' (max_size={self.max_size})."
+                    )
+                self._cond.wait(remaining)
+
+        # Create or validate outside the lock so slow I/O does not block other callers.
+        if conn is None:
+            return self._create()
+        if self._health_check and time.monotonic() - released_at >= self.validate_after:
+            try:
+                self._health_check(conn)
+            except Exception as e:
+                logger.warning("Pool '%s': discarding unhealthy connection (%s).", self.name, e)
+                self._discard(conn, reserve_slot=True)
+                return self._create()
+        return conn
+
+    def release(self, conn):
+        """Returns a connection to the pool (or closes it if the pool has been shut down)."""
+        with self._cond:
+            if not self._closed:
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+                return
+        self._discard(conn)
+
+    def discard(self, conn):
+        """Closes a checked-out connection instead of returning it, e.g. after a fatal error."""
+        self._discard(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def evict_idle(self):
+        """Closes connections that have been idle longer than `idle_timeout`."""
+        with self._cond:
+            self._evict_idle_locked()
+
+    def close(self):
+        """Closes all idle connections; connections still checked out are closed on release."""
+        with self._cond:
+            self._closed = True
+            idle = [conn for conn, _ in self._idle]
+            self._idle.clear()
+            self._cond.notify_all()
+        for conn in idle:
+            self._discard(conn)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "name": self.name,
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "max_size": self.max_size,
+                "closed": self._closed,
+            }
+
+    def _create(self):
+        try:
+            return self._factory()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+    def _evict_idle_locked(self):
+        if self.idle_timeout is None:
+            return
+        cutoff = time.monotonic() - self.idle_timeout
+        # Oldest connections sit on the left.
+        while self._idle and self._idle[0][1] < cutoff:
+            conn, _ = self._idle.popleft()
+            self._size -= 1
+            self._safe_dispose(conn)
+
+    def _discard(self, conn, reserve_slot=False):
+        self._safe_dispose(conn)
+        if not reserve_slot:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+
+    def _safe_dispose(self, conn):
+        try:
+            self._dispose(conn)
+        except Exception as e:
+            logger.warning("Pool '%s': error while closing connection: %s", self.name, e)
+
+
+class SharedClient:
+    """
+    Holds one long-lived, thread-safe client (MongoClient, Neo4j driver, MeiliSearch client).
+    These clients already multiplex their own connection pools, so every caller shares
+    the same instance. It is health-checked on checkout when it has been unused for a while
+    and closed once it has been idle longer than `idle_timeout`.
+    """
+
+    def __init__(self, name, factory, health_check=None, dispose=None,
+                 idle_timeout=900.0, validate_after=30.0):
+        self.name = name
+        self._factory = factory
+        self._health_check = health_check
+        self._dispose = dispose or (lambda client: client.close())
+        self.idle_timeout = idle_timeout
+        self.validate_after = validate_after
+
+        self._client = None
+        self._last_used = 0.0
+        self._last_validated = 0.0
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def get(self):
+        """Returns the shared client, creating or replacing it when needed."""
+        with self._lock:
+            if self._closed:
+                raise RuntimeError(f"Shared client '{self.name}' is closed.")
+            now = time.monotonic()
+            if self._client is not None and self.idle_timeout is not None and \
+               now - self._last_used > self.idle_timeout:
+                self._reset_locked()
+            if self._client is not None and self._health_check and \
+               now - self._last_validated >= self.validate_after:
+                try:
+                    self._health_check(self._client)
+                    self._last_validated = now
+                except Exception as e:
+                    logger.warning("Shared client '%s' failed its health check (%s). Reconnecting.", self.name, e)
+                    self._reset_locked()
+            if self._client is None:
+                self._client = self._factory()
+                self._last_validated = now
+            self._last_used = now
+            return self._client
+
+    def evict_idle(self):
+        with self._lock:
+            if self._client is not None and self.idle_timeout is not None and \
+               time.monotonic() - self._last_used > self.idle_timeout:
+                self._reset_locked()
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self._reset_locked()
+
+    def stats(self):
+        with self._lock:
+            return {"name": self.name, "connected": self._client is not None, "closed": self._closed}
+
+    def _reset_locked(self):
+        client, self._client = self._client, None
+        if client is not None:
+            try:
+                self._dispose(client)
+            except Exception as e:
+                logger.warning("Shared client '%s': error while closing: %s", self.name, e)
+
+
+# --- Process-wide registry ---
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def get_pool(name, builder):
+    """
+    Returns the registered pool called `name`, building and registering it on first use.
+    After `close_all_pools` the next call builds a fresh pool.
+    """
+    with _registry_lock:
+        pool = _registry.get(name)
+        if pool is None:
+            pool = builder()
+            _registry[name] = pool
+        return pool
+
+
+def close_all_pools():
+    """Shuts down every registered pool. Safe to call more than once."""
+    with _registry_lock:
+        pools = list(_registry.values())
+        _registry.clear()
+    for pool in pools:
+        pool.close()
+
+
+def pool_stats():
+    with _registry_lock:
+        return {name: pool.stats() for name, pool in _registry.items()}
+
+
+# --- Async Pools ---
+# Async drivers bind their sockets to the event loop that created them, so async pools
+# are kept per running loop.
+
+class AsyncConnectionPool:
+    """
+    Async counterpart of ConnectionPool (e.g. for aiosqlite connections).
+    `factory`, `health_check` and `dispose` are coroutine functions.
+    """
+
+    def __init__(self, name, factory, max_size=5, idle_timeout=300.0, health_check=None,
+                 dispose=None, validate_after=30.0, checkout_timeout=10.0):
+        self.name = name
+        self._factory = factory
+        self._health_check = health_check
+        self._dispose = dispose
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.validate_after = validate_after
+        self.checkout_timeout = checkout_timeout
+
+        self._idle = deque()  # (connection, last_released_at)
+        self._slots = asyncio.Semaphore(max_size)
+        self._closed = False
+
+    async def acquire(self):
+        if self._closed:
+            raise RuntimeError(f"Connection pool '{self.name}' is closed.")
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.checkout_timeout)
+        except asyncio.TimeoutError:
+            raise PoolExhaustedError(
+                f"Timed out waiting for a connection from pool '{self.name}' (max_size={self.max_size})."
+            )
+        try:
+            await self.evict_idle()
+            if self._idle:
+                conn, released_at = self._idle.pop()
+                if self._health_check and time.monotonic() - released_at >= self.validate_after:
+                    try:
+                        await self._health_check(conn)
+                    except Exception as e:
+                        logger.warning("Pool '%s': discarding unhealthy connection (%s).", self.name, e)
+                        await self._safe_dispose(conn)
+                        conn = await self._factory()
+                return conn
+            return await self._factory()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    async def release(self, conn):
+        if self._closed:
+            await self._safe_dispose(conn)
+        else:
+            self._idle.append((conn, time.monotonic()))
+        self._slots.release()
+
+    async def discard(self, conn):
+        await self._safe_dispose(conn)
+        self._slots.release()
+
+    @asynccontextmanager
+    async def connection(self):
+        conn = await self.acquire()
+        try:
+            yield conn
+        finally:
+            await self.release(conn)
+
+    async def evict_idle(self):
+        if self.idle_timeout is None:
+            return
+        cutoff = time.monotonic() - self.idle_timeout
+        while self._idle and self._idle[0][1] < cutoff:
+            conn, _ = self._idle.popleft()
+            await self._safe_dispose(conn)
+
+    async def close(self):
+        self._closed = True
+        while self._idle:
+            conn, _ = self._idle.popleft()
+            await self._safe_dispose(conn)
+
+    def stats(self):
+        return {"name": self.name, "idle": len(self._idle), "max_size": self.max_size, "closed": self._closed}
+
+    async def _safe_dispose(self, conn):
+        try:
+            if self._dispose:
+                await self._dispose(conn)
+            else:
+                await conn.close()
+        except Exception as e:
+            logger.warning("Pool '%s': error while closing connection: %s", self.name, e)
+
+
+class AsyncSharedClient:
+    """Async counterpart of SharedClient for AsyncMongoClient, AsyncDriver, httpx.AsyncClient."""
+
+    def __init__(self, name, factory, health_check=None, dispose=None,
+                 idle_timeout=900.0, validate_after=30.0):
+        self.name = name
+        self._factory = factory
+        self._health_check = health_check
+        self._dispose = dispose
+        self.idle_timeout = idle_timeout
+        self.validate_after = validate_after
+
+        self._client = None
+        self._last_used = 0.0
+        self._last_validated = 0.0
+        self._closed = False
+        self._lock = asyncio.Lock()
+
+    async def get(self):
+        async with self._lock:
+            if self._closed:
+                raise RuntimeError(f"Shared client '{self.name}' is closed.")
+            now = time.monotonic()
+            if self._client is not None and self.idle_timeout is not None and \
+               now - self._last_used > self.idle_timeout:
+                await self._reset_locked()
+            if self._client is not None and self._health_check and \
+               now - self._last_validated >= self.validate_after:
+                try:
+                    await self._health_check(self._client)
+                    self._last_validated = now
+                except Exception as e:
+                    logger.warning("Shared client '%s' failed its health check (%s). Reconnecting.", self.name, e)
+                    await self._reset_locked()
+            if self._client is None:
+                self._client = await self._factory()
+                self._last_validated = now
+            self._last_used = now
+            return self._client
+
+    async def close(self):
+        async with self._lock:
+            self._closed = True
+            await self._reset_locked()
+
+    def stats(self):
+        return {"name": self.name, "connected": self._client is not None, "closed": self._closed}
+
+    async def _reset_locked(self):
+        client, self._client = self._client, None
+        if client is not None:
+            try:
+                if self._dispose:
+                    await self._dispose(client)
+                else:
+                    await client.close()
+            except Exception as e:
+                logger.warning("Shared client '%s': error while closing: %s", self.name, e)
+
+
+_async_registry = weakref.WeakKeyDictionary()  # event loop -> {name: pool}
+
+
+def get_async_pool(name, builder):
+    """Per-event-loop version of get_pool. Must be called from a coroutine."""
+    pools = _async_registry.setdefault(asyncio.get_running_loop(), {})
+    pool = pools.get(name)
+    if pool is None:
+        pool = builder()
+        pools[name] = pool
+    return pool
+
+
+async def aclose_all_pools():
+    """Shuts down every async pool that belongs to the running event loop."""
+    pools = _async_registry.pop(asyncio.get_running_loop(), {})
+    for pool in pools.values():
+        await pool.close()
+
+
+def async_pool_stats():
+    """pool_stats() for the async pools of the running event loop."""
+    pools = _async_registry.get(asyncio.get_running_loop(), {})
+    return {name: pool.stats() for name, pool in pools.items()}
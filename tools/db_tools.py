@@ -1,14 +1,137 @@
 import ast
+import contextlib
+import copy
+import logging
 import sqlite3
+import time
 from pymongo import MongoClient
+from pymongo.errors import ExecutionTimeout
 import meilisearch
+from meilisearch.errors import MeilisearchTimeoutError
+from meilisearch.index import Index
 from langchain_core.tools import tool
-from neo4j import GraphDatabase
+from neo4j import GraphDatabase, Query
+from neo4j.exceptions import ClientError
+
+from tools.connection_pool import ConnectionPool, SharedClient, get_pool, close_all_pools
+from tools.parameterize import parameterize_cypher, parameterize_sql
+from tools.query_result import QueryResult, ERROR_PARSE, ERROR_CONNECTION, ERROR_EXECUTION, ERROR_TIMEOUT
+from tools.query_timeouts import QUERY_TIMEOUTS
+
+logger = logging.getLogger(__name__)
+
+# --- Connection Settings ---
+SQLITE_DB_PATH = 'database/employees.db'
+MONGODB_URI = 'mongodb://localhost:27017/'
+MEILISEARCH_URL = "http://localhost:7700"
+NEO4J_URI = "bolt://localhost:7687"
+NEO4J_USER = "neo4j"
+NEO4J_PASSWORD = "12345678Az"
+
+# --- Pool Settings ---
+SQLITE_POOL_SIZE = 8           # Max simultaneously open SQLite connections
+SQLITE_CACHED_STATEMENTS = 256 # Prepared statements kept per SQLite connection (parameterized query templates)
+POOL_IDLE_TIMEOUT = 300.0      # Seconds before an unused connection/client is closed
+POOL_VALIDATE_AFTER = 30.0     # Health-check a connection on checkout if it was idle this long
+MONGODB_MAX_POOL_SIZE = 20     # Socket pool inside the shared MongoClient
+NEO4J_MAX_POOL_SIZE = 20       # Connection pool inside the shared Neo4j driver
+
+# --- Result Size Settings ---
+MAX_RESULT_ROWS = 100          # Rows/documents materialized for the LLM context; the rest are only counted
+FETCH_BATCH_SIZE = 50          # Rows per cursor.fetchmany() / documents per MongoDB batch
+
+# --- Timeout Settings ---
+# Time limits come from tools/query_timeouts.py; timeout=None means no limit.
+SQLITE_PROGRESS_STEPS = 10000  # SQLite VM instructions between two deadline checks
+
+
+def close_all_connections():
+    """
+    Shutdown hook: closes every pooled SQLite connection and the shared
+    MongoDB, MeiliSearch and Neo4j clients. Call it once when the process exits.
+    Async pools are closed with tools.async_db_tools.aclose_all_connections().
+    """
+    close_all_pools()
+
 # --- SQLite Tools ---
 
+class PooledSQLiteConnection(sqlite3.Connection):
+    """
+    A sqlite3 connection whose close() hands it back to the pool instead of closing it,
+    so existing `conn.close()` call sites keep working unchanged.
+    """
+    _pool = None
+    _checked_out = False
+
+    def close(self):
+        if self._pool is None or not self._checked_out:
+            return super().close()
+        self._checked_out = False
+        if self.in_transaction:
+            self.rollback()  # Never hand an open transaction to the next caller
+        self._pool.release(self)
+
+def _create_sqlite_connection():
+    # Connections are checked out by whichever worker thread runs the graph node,
+    # so they must not be pinned to the thread that created them.
+    return sqlite3.connect(SQLITE_DB_PATH, check_same_thread=False, factory=PooledSQLiteConnection,
+                           cached_statements=SQLITE_CACHED_STATEMENTS)
+
+def _build_sqlite_pool():
+    return ConnectionPool(
+        "sqlite",
+        _create_sqlite_connection,
+        max_size=SQLITE_POOL_SIZE,
+        idle_timeout=POOL_IDLE_TIMEOUT,
+        validate_after=POOL_VALIDATE_AFTER,
+        health_check=lambda conn: conn.execute("SELECT 1").fetchone(),
+        dispose=sqlite3.Connection.close,  # Really close, bypassing PooledSQLiteConnection.close
+    )
+
 def get_sqlite_connection():
-    """Returns a connection to the SQLite database."""
-    return sqlite3.connect('database/employees.db')
+    """
+    Returns a pooled connection to the SQLite database.
+    Calling close() on it returns it to the pool.
+    """
+    pool = get_pool("sqlite", _build_sqlite_pool)
+    conn = pool.acquire()
+    conn._pool = pool
+    conn._checked_out = True
+    return conn
+
+def get_sqlite_schema_version() -> int:
+    """
+    Returns SQLite's PRAGMA schema_version, which changes whenever any table,
+    index or view is created, dropped or altered. Cheap enough to call per query.
+    """
+    conn = get_sqlite_connection()
+    try:
+        return conn.execute("PRAGMA schema_version;").fetchone()[0]
+    finally:
+        conn.close()
+
+def describe_sqlite_schema() -> str:
+    """
+    Reads the SQLite schema: one PRAGMA table_info per table. The agents use the
+    cached copy in tools/schema_cache.py, which is re-read only after a schema change.
+    """
+    conn = get_sqlite_connection()
+    try:
+        cursor = conn.cursor()
+        # sqlite_% tables (e.g. sqlite_stat1 written by ANALYZE) are SQLite internals, not data
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%';")
+        tables = cursor.fetchall()
+        schema_description = "SQLite Database Schema:\n"
+        for table_name in tables:
+            table_name = table_name[0]
+            schema_description += f"\nTable: {table_name}\n"
+            cursor.execute(f"PRAGMA table_info({table_name});")
+            columns = cursor.fetchall()
+            for column in columns:
+                schema_description += f"  - {column[1]} ({column[2]})\n"
+    finally:
+        conn.close()
+    return schema_description
 
 @tool
 def get_schema_sqlite(db_name: str = 'employees.db') -> str:
@@ -16,20 +139,104 @@ def get_schema_sqlite(db_name: str = 'employees.db') -> str:
     Returns the schema of the SQLite database.
     Use this to understand the tables and columns available for querying.
     """
+    return describe_sqlite_schema()
+
+def _elapsed_ms(started_at: float) -> float:
+    return round((time.perf_counter() - started_at) * 1000, 2)
+
+def timeout_failure(data_source: str, timeout: float, elapsed_ms: float) -> QueryResult:
+    limit = f" {timeout:g}s" if timeout is not None else "" # None: a limit set outside the query (e.g. on the server)
+    return QueryResult.failure(data_source, ERROR_TIMEOUT,
+                               f"The {data_source} query was stopped at its{limit} time limit.", elapsed_ms)
+
+def sqlite_deadline_handler(timeout: float):
+    """Progress handler that makes SQLite interrupt the running statement once `timeout` seconds have passed."""
+    deadline = time.monotonic() + timeout
+    return lambda: time.monotonic() > deadline
+
+def is_sqlite_interrupt(error: Exception) -> bool:
+    return isinstance(error, sqlite3.OperationalError) and str(error) == "interrupted"
+
+@contextlib.contextmanager
+def sqlite_connection(timeout: float = None):
+    """
+    A pooled connection on which every statement shares one deadline, `timeout` seconds from
+    now; a statement still running then is interrupted. The connection is returned to the pool on exit.
+    """
     conn = get_sqlite_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-    tables = cursor.fetchall()
-    schema_description = "SQLite Database Schema:\n"
-    for table_name in tables:
-        table_name = table_name[0]
-        schema_description += f"\nTable: {table_name}\n"
-        cursor.execute(f"PRAGMA table_info({table_name});")
-        columns = cursor.fetchall()
-        for column in columns:
-            schema_description += f"  - {column[1]} ({column[2]})\n"
-    conn.close()
-    return schema_description
+    if timeout is not None:
+        conn.set_progress_handler(sqlite_deadline_handler(timeout), SQLITE_PROGRESS_STEPS)
+    try:
+        yield conn
+    finally:
+        if timeout is not None:
+            conn.set_progress_handler(None, 0)
+        conn.close() # Returns the connection to the pool
+
+def iter_sqlite_rows(query: str, batch_size: int = FETCH_BATCH_SIZE, columns: list = None, params=(),
+                     timeout: float = None):
+    """
+    Runs a query with the bound `params` and yields its rows one at a time, fetching
+    `batch_size` rows per round trip. The pooled connection is returned when the generator
+    is exhausted or closed. If a `columns` list is given, it is filled with the result's column names.
+    With a `timeout`, the statement is interrupted (sqlite3.OperationalError "interrupted") when it runs longer.
+    """
+    with sqlite_connection(timeout) as conn:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        if columns is not None and cursor.description:
+            columns.extend(column[0] for column in cursor.description)
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                break
+            yield from batch
+
+def sqlite_count_query(query: str) -> str:
+    """COUNT(*) over a SELECT; the newlines keep a trailing comment from swallowing the parenthesis."""
+    return f"SELECT COUNT(*) FROM (\n{query.strip().rstrip(';').rstrip()}\n)"
+
+def count_sqlite_rows(conn, query: str, params=()) -> int:
+    """
+    Total rows of a result that went over MAX_RESULT_ROWS, counted by SQLite instead of stepping
+    through them in Python. Runs on the query's own connection, so it shares the query's deadline.
+    Falls back to MAX_RESULT_ROWS + 1 (the rows seen) if the count fails or runs out of time;
+    the result is still reported as truncated.
+    """
+    try:
+        return conn.execute(sqlite_count_query(query), params).fetchone()[0]
+    except sqlite3.Error as e:
+        logger.info("Could not count the full SQLite result (%s); reporting it as more than %d rows.",
+                    e, MAX_RESULT_ROWS)
+        return MAX_RESULT_ROWS + 1
+
+def execute_sqlite_query(query: str, timeout: float = None) -> QueryResult:
+    """Runs a SQL query and returns a QueryResult capped at MAX_RESULT_ROWS rows."""
+    started_at = time.perf_counter()
+    try:
+        rows = []
+        # Literals are bound, so queries differing only in values reuse one prepared statement.
+        template, params = parameterize_sql(query)
+        logger.debug("SQLite statement: %s params=%s", template, params)
+        with sqlite_connection(timeout) as conn:
+            # Read one row past the cap, then stop; the cursor is not stepped any further.
+            cursor = conn.execute(template, params)
+            columns = [column[0] for column in cursor.description or ()]
+            while len(rows) <= MAX_RESULT_ROWS:
+                batch = cursor.fetchmany(FETCH_BATCH_SIZE)
+                if not batch:
+                    break
+                rows.extend(batch)
+            cursor.close()
+            total = len(rows)
+            if total > MAX_RESULT_ROWS:
+                rows = rows[:MAX_RESULT_ROWS]
+                total = count_sqlite_rows(conn, template, params)
+        return QueryResult.from_rows("sqlite", rows, total, columns or None, _elapsed_ms(started_at))
+    except Exception as e:
+        if is_sqlite_interrupt(e):
+            return timeout_failure("sqlite", timeout, _elapsed_ms(started_at))
+        return QueryResult.failure("sqlite", ERROR_EXECUTION, f"An error occurred: {e}", _elapsed_ms(started_at))
 
 @tool
 def run_sqlite_query(query: str) -> str:
@@ -37,30 +244,57 @@ def run_sqlite_query(query: str) -> str:
     Executes a given SQL query on the 'employees.db' SQLite database.
     Use this to retrieve information about employees and their projects.
     """
-    try:
-        conn = get_sqlite_connection()
-        cursor = conn.cursor()
-        cursor.execute(query)
-        result = cursor.fetchall()
-        conn.close()
-        return str(result)
-    except Exception as e:
-        return f"An error occurred: {e}"
+    return execute_sqlite_query(query).to_text()
 
 
 # --- MongoDB Tools ---
+def _build_mongodb_client():
+    return SharedClient(
+        "mongodb",
+        lambda: MongoClient(
+            MONGODB_URI,
+            maxPoolSize=MONGODB_MAX_POOL_SIZE,
+            maxIdleTimeMS=int(POOL_IDLE_TIMEOUT * 1000),
+        ),
+        health_check=lambda client: client.admin.command("ping"),
+        idle_timeout=POOL_IDLE_TIMEOUT,
+        validate_after=POOL_VALIDATE_AFTER,
+    )
+
 def get_mongodb_client():
-    """Returns a client connection to the MongoDB."""
-    return MongoClient('mongodb://localhost:27017/')
+    """
+    Returns the shared, process-wide MongoDB client.
+    Do not close it; it is closed by close_all_connections().
+    """
+    return get_pool("mongodb", _build_mongodb_client).get()
 
-@tool
-def run_mongodb_query(query_str: str) -> str: # ورودی را به str تغییر می‌دهیم
+def parse_mongodb_query(query_str: str) -> dict:
+    """Parses the string form of a MongoDB filter; raises ValueError/SyntaxError if it is not a dict."""
+    query_dict = ast.literal_eval(query_str)
+    if not isinstance(query_dict, dict):
+        raise ValueError("Input is not a valid dictionary structure.")
+    return query_dict
+
+def mongodb_max_time_ms(timeout: float = None):
+    return None if timeout is None else max(int(timeout * 1000), 1)
+
+def iter_mongodb_documents(collection, query_dict: dict, limit: int = 0, batch_size: int = FETCH_BATCH_SIZE,
+                           timeout: float = None):
     """
-    Executes a query on the 'papers' collection in the 'research_db' MongoDB database.
-    The query must be provided as a string representation of a Python dictionary.
-    Use this to find research papers, authors, or topics.
-    Example query_str: "{'year': 2024, 'topic': 'Generative AI'}"
+    Yields the documents matching `query_dict` (without _id) as the server sends them,
+    `batch_size` at a time. `limit` caps the result on the server (0 means no cap).
+    With a `timeout`, the server stops the query (ExecutionTimeout) when it runs longer.
     """
+    cursor = collection.find(query_dict, {'_id': 0}, limit=limit, batch_size=batch_size,
+                             max_time_ms=mongodb_max_time_ms(timeout))
+    try:
+        yield from cursor
+    finally:
+        cursor.close()
+
+def execute_mongodb_query(query_str: str, timeout: float = None) -> QueryResult:
+    """Runs a MongoDB filter (given as a dict string) on the papers collection."""
+    started_at = time.perf_counter()
     try:
         client = get_mongodb_client()
         db = client['research_db']
@@ -68,115 +302,185 @@ def run_mongodb_query(query_str: str) -> str: # ورودی را به str تغی
         
         # Convert the string representation of a dict to an actual dict
         try:
-            query_dict = ast.literal_eval(query_str)
-            if not isinstance(query_dict, dict):
-                raise ValueError("Input is not a valid dictionary structure.")
+            query_dict = parse_mongodb_query(query_str)
         except (ValueError, SyntaxError) as e:
-            return f"Failed to parse query string. It must be a valid dictionary string. Error: {e}"
+            return QueryResult.failure(
+                "mongodb", ERROR_PARSE,
+                f"Failed to parse query string. It must be a valid dictionary string. Error: {e}",
+                _elapsed_ms(started_at))
 
-        result = list(collection.find(query_dict, {'_id': 0}))
-        client.close()
+        # One extra document tells us whether the result was capped without counting every time.
+        result = list(iter_mongodb_documents(collection, query_dict, limit=MAX_RESULT_ROWS + 1, timeout=timeout))
 
-        if not result:
-            return "No documents found matching the query."
-            
-        return str(result)
+        total = len(result)
+        if total > MAX_RESULT_ROWS:
+            result = result[:MAX_RESULT_ROWS]
+            count_options = {} if timeout is None else {"maxTimeMS": mongodb_max_time_ms(timeout)}
+            total = collection.count_documents(query_dict, **count_options)
+        return QueryResult.from_rows("mongodb", result, total, elapsed_ms=_elapsed_ms(started_at))
+    except ExecutionTimeout:
+        return timeout_failure("mongodb", timeout, _elapsed_ms(started_at))
     except Exception as e:
-        return f"An error occurred during MongoDB query execution: {e}"
-
+        return QueryResult.failure("mongodb", ERROR_EXECUTION,
+                                   f"An error occurred during MongoDB query execution: {e}", _elapsed_ms(started_at))
 
-# --- Meilisearch Tools ---
-def get_meilisearch_client():
+@tool
+def run_mongodb_query(query_str: str) -> str: # ورودی را به str تغییر می‌دهیم
     """
-    Returns a client connection to the MeiliSearch instance.
+    Executes a query on the 'papers' collection in the 'research_db' MongoDB database.
+    The query must be provided as a string representation of a Python dictionary.
+    Use this to find research papers, authors, or topics.
+    Example query_str: "{'year': 2024, 'topic': 'Generative AI'}"
     """
+    return execute_mongodb_query(query_str).to_text()
+
+
+# --- Meilisearch Tools ---
+def _build_meilisearch_client():
     # Ensure your MeiliSearch server is running, typically on http://localhost:7700
-    # If you have set a master key, provide it as the second argument.
-    client = meilisearch.Client("http://localhost:7700")
-    return client
+    # If you have set a master key, provide it as the second argument to meilisearch.Client.
+    return SharedClient(
+        "meilisearch",
+        lambda: meilisearch.Client(MEILISEARCH_URL, timeout=QUERY_TIMEOUTS["meilisearch"]),
+        health_check=lambda client: client.health(),
+        dispose=lambda client: None,  # The HTTP client holds no persistent resources to release
+        idle_timeout=POOL_IDLE_TIMEOUT,
+        validate_after=POOL_VALIDATE_AFTER,
+    )
 
-@tool
-def run_meilisearch_query(search_query: str, index_name: str = "support_tickets", limit: int = 5) -> str:
+def get_meilisearch_client():
     """
-    Executes a search query on the specified MeiliSearch index (default: 'support_tickets').
-    'search_query' is the text string to search for.
-    'limit' specifies the maximum number of search results to return.
-    Use this to find support tickets based on their description or other text fields.
+    Returns the shared client for the MeiliSearch instance.
     """
+    return get_pool("meilisearch", _build_meilisearch_client).get()
+
+def execute_meilisearch_query(search_query: str, index_name: str = "support_tickets", limit: int = 5,
+                              timeout: float = None) -> QueryResult:
+    """Runs a full-text search on a MeiliSearch index and returns the hits."""
+    started_at = time.perf_counter()
     try:
         client = get_meilisearch_client()
-        index = client.get_index(index_name)
+        if timeout is None:
+            index = client.index(index_name)  # Local handle; avoids a GET /indexes round trip per search
+        else:
+            # The HTTP timeout lives in the client's config; this search gets its own copy
+            config = copy.copy(client.config)
+            config.timeout = timeout
+            index = Index(config, index_name)
         
         search_results = index.search(search_query, {'limit': limit})
         
-        # --- ADD THIS PRINT STATEMENT ---
-        print(f"MeiliSearch raw search_results: {search_results}") 
+        logger.debug("MeiliSearch raw search_results: %s", search_results) 
         
         hits = search_results.get('hits', [])
         
-        # --- ADD THIS PRINT STATEMENT ---
-        print(f"MeiliSearch extracted hits: {hits}")
+        logger.debug("MeiliSearch extracted hits: %s", hits)
 
-        if not hits:
-            return "No documents found matching the search query in MeiliSearch."
-            
-        return str(hits) 
+        total = search_results.get('estimatedTotalHits', len(hits))
+        return QueryResult.from_rows("meilisearch", hits, max(total, len(hits)), elapsed_ms=_elapsed_ms(started_at))
+    except MeilisearchTimeoutError:
+        return timeout_failure("meilisearch", timeout, _elapsed_ms(started_at))
     except Exception as e:
-        return f"An error occurred during MeiliSearch query execution: {e}"
+        return QueryResult.failure("meilisearch", ERROR_EXECUTION,
+                                   f"An error occurred during MeiliSearch query execution: {e}", _elapsed_ms(started_at))
 
-def get_neo4j_driver():
+@tool
+def run_meilisearch_query(search_query: str, index_name: str = "support_tickets", limit: int = 5) -> str:
     """
-    Returns a Neo4j driver instance.
-    Remember to close the driver when done: driver.close()
+    Executes a search query on the specified MeiliSearch index (default: 'support_tickets').
+    'search_query' is the text string to search for.
+    'limit' specifies the maximum number of search results to return.
+    Use this to find support tickets based on their description or other text fields.
     """
-    # Define your Neo4j connection details
-    NEO4J_URI = "bolt://localhost:7687"
-    NEO4J_USER = "neo4j"
-    NEO4J_PASSWORD = "12345678Az"
-    
-    driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+    return execute_meilisearch_query(search_query, index_name, limit).to_text()
+
+def _create_neo4j_driver():
+    driver = GraphDatabase.driver(
+        NEO4J_URI,
+        auth=(NEO4J_USER, NEO4J_PASSWORD),
+        max_connection_pool_size=NEO4J_MAX_POOL_SIZE,
+        max_connection_lifetime=3600,
+    )
     try:
+        # Verified once when the shared driver is created, not on every query.
         driver.verify_connectivity()
-        # print("Successfully connected to Neo4j for tool setup.") # Optional: for verbose logging
-    except Exception as e:
-        print(f"Error connecting to Neo4j for tool: {e}")
-        # If connection fails, we might want to raise an error or return None
-        # For now, the tool will fail later if the driver is None or connection fails
-        raise ConnectionError(f"Could not connect to Neo4j: {e}")
+    except Exception:
+        driver.close()
+        raise
     return driver
 
-@tool
-def run_neo4j_query(cypher_query: str, database: str = "myraggraphdb") -> str:
+def _build_neo4j_driver():
+    return SharedClient(
+        "neo4j",
+        _create_neo4j_driver,
+        health_check=lambda driver: driver.verify_connectivity(),
+        idle_timeout=POOL_IDLE_TIMEOUT,
+        validate_after=POOL_VALIDATE_AFTER,
+    )
+
+def get_neo4j_driver():
     """
-    Executes a Cypher query on the specified Neo4j database (default: 'myraggraphdb').
-    'cypher_query' is the Cypher query string to execute.
-    Use this to find information about researchers, their collaborations, and projects/topics they work on.
-    Example: "MATCH (r:Researcher {name: 'Arnab Mitra Utsab'})-[:COLLABORATES_WITH]->(collaborator:Researcher) RETURN collaborator.name"
+    Returns the shared, process-wide Neo4j driver.
+    Do not close it; it is closed by close_all_connections().
     """
-    driver = None
+    try:
+        return get_pool("neo4j", _build_neo4j_driver).get()
+    except Exception as e:
+        logger.warning("Error connecting to Neo4j for tool: %s", e)
+        raise ConnectionError(f"Could not connect to Neo4j: {e}")
+
+def is_neo4j_timeout(error: Exception) -> bool:
+    # Neo.ClientError.Transaction.TransactionTimedOut (TransactionTimedOutClientConfiguration on Neo4j 5)
+    return isinstance(error, ClientError) and "TransactionTimedOut" in (error.code or "")
+
+def execute_neo4j_query(cypher_query: str, database: str = "myraggraphdb", timeout: float = None) -> QueryResult:
+    """Runs a Cypher query and returns its records as dicts, capped at MAX_RESULT_ROWS."""
+    started_at = time.perf_counter()
     try:
         driver = get_neo4j_driver()
         records_list = []
+        total = 0
         # For Neo4j, operations that write data need an explicit transaction.
         # For read-only queries, session.run() can be used directly or within a transaction.
         # Using a session ensures resources are managed correctly.
+        # Literals are bound, so queries differing only in values reuse one cached plan.
+        template, params = parameterize_cypher(cypher_query)
         with driver.session(database=database) as session:
-            print(f"Executing Neo4j Cypher query: {cypher_query}") # For debugging
-            results = session.run(cypher_query)
+            logger.debug("Executing Neo4j Cypher query: %s params=%s", template, params)
+            # With a timeout, the server aborts the transaction when it runs longer
+            results = session.run(Query(template, timeout=timeout), params)
+            columns = list(results.keys())
             # Convert results to a list of dictionaries for easier processing/display
             for record in results:
-                records_list.append(record.data()) # record.data() converts each record to a dict
+                if total < MAX_RESULT_ROWS:
+                    records_list.append(record.data()) # record.data() converts each record to a dict
+                total += 1
 
-        if not records_list:
-            return "No records found matching the Cypher query in Neo4j."
-            
-        return str(records_list) # Return the results as a string representation of a list of dicts
+        return QueryResult.from_rows("neo4j", records_list, total, columns or None, _elapsed_ms(started_at))
     except ConnectionError as ce: # Catching the specific connection error from get_neo4j_driver
-        return f"Neo4j Connection Error: {ce}"
+        return QueryResult.failure("neo4j", ERROR_CONNECTION, f"Neo4j Connection Error: {ce}", _elapsed_ms(started_at))
     except Exception as e:
+        if is_neo4j_timeout(e):
+            return timeout_failure("neo4j", timeout, _elapsed_ms(started_at))
         # Catching other potential errors from Neo4j, e.g., CypherSyntaxError
-        return f"An error occurred during Neo4j Cypher query execution: {e}"
-    finally:
-        if driver:
-            driver.close()
-            # print("Neo4j driver connection closed for tool.") # Optional: for verbose logging
\ No newline at end of file
+        return QueryResult.failure("neo4j", ERROR_EXECUTION,
+                                   f"An error occurred during Neo4j Cypher query execution: {e}", _elapsed_ms(started_at))
+
+@tool
+def run_neo4j_query(cypher_query: str, database: str = "myraggraphdb") -> str:
+    """
+    Executes a Cypher query on the specified Neo4j database (default: 'myraggraphdb').
+    'cypher_query' is the Cypher query string to execute.
+    Use this to find information about researchers, their collaborations, and projects/topics they work on.
+    Example: "MATCH (r:Researcher {name: 'Arnab Mitra Utsab'})-[:COLLABORATES_WITH]->(collaborator:Researcher) RETURN collaborator.name"
+    """
+    return execute_neo4j_query(cypher_query, database).to_text() # String form of the list of dicts
+
+
+# Structured (QueryResult) entry points used by the query executor.
+QUERY_EXECUTORS = {
+    "sqlite": execute_sqlite_query,
+    "mongodb": execute_mongodb_query,
+    "meilisearch": execute_meilisearch_query,
+    "neo4j": execute_neo4j_query,
+}
@@ -0,0 +1,142 @@
+# tools/parameterize.py
+#
+# Turns the literal values of a generated SQL or Cypher query into bound parameters, so
+# queries that differ only in a name, status or year share one statement text: one entry
+# in SQLite's per-connection statement cache (sqlite3 `cached_statements`) and one plan in
+# Neo4j's query cache. The rewrite is purely lexical and deterministic; anything it does
+# not fully understand is executed unchanged.
+#
+#   QUERY_PARAMETERIZATION_ENABLED=0   execute the generated text as-is
+import os
+import re
+
+# --- Parameterization Settings ---
+QUERY_PARAMETERIZATION_ENABLED = os.getenv("QUERY_PARAMETERIZATION_ENABLED", "1") == "1"
+
+_NUMBER = r"(?<![\w.])\d+(?:\.\d+)?(?:[eE][+-]?\d+)?(?![\w.])"
+
+_SQL_TOKENS = re.compile(r"""
+    (?P<comment>--[^\n]*|/\*.*?\*/)
+  | (?P<string>'(?:[^']|'')*')
+  | (?P<identifier>"(?:[^"]|"")*"|`(?:[^`]|``)*`|\[[^\]]*\])
+  | (?P<placeholder>\?|[:@$][A-Za-z_])
+  | (?P<number>""" + _NUMBER + r""")
+  | (?P<word>[A-Za-z_]\w*)
+  | (?P<operator><>|!=|<=|>=|==|[=<>])
+  | (?P<other>\s+|.)
+""", re.VERBOSE | re.DOTALL)
+
+_CYPHER_TOKENS = re.compile(r"""
+    (?P<comment>//[^\n]*|/\*.*?\*/)
+  | (?P<string>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")
+  | (?P<identifier>`(?:[^`]|``)*`)
+  | (?P<placeholder>\$)
+  | (?P<number>""" + _NUMBER + r""")
+  | (?P<word>[A-Za-z_]\w*)
+  | (?P<operator><>|<=|>=|[=<>:])
+  | (?P<other>\s+|.)
+""", re.VERBOSE | re.DOTALL)
+
+# Clauses whose literals are bound. Literals elsewhere stay in the text: in a projection they
+# name the result column, and ORDER BY 1 / LIMIT 5 / variable-length patterns need constants.
+_SQL_CLAUSES = {"select", "from", "join", "on", "where", "group", "having", "order", "limit", "offset",
+                "union", "intersect", "except", "values", "set", "with"}
+_SQL_BOUND_CLAUSES = {"on", "where", "having"}
+_CYPHER_CLAUSES = {"match", "optional", "where", "with", "return", "order", "skip", "limit", "unwind",
+                   "create", "merge", "set", "delete", "remove", "call", "union"}
+_CYPHER_BOUND_CLAUSES = {"match", "optional", "where", "unwind"}
+
+_CYPHER_ESCAPES = {"\\": "\\", "'": "'", '"': '"', "n": "\n", "t": "\t", "r": "\r", "b": "\b", "f": "\f"}
+
+
+class _Unsupported(Exception):
+    """The query uses syntax the rewrite does not handle; it runs unchanged."""
+
+
+def _sql_string(token: str) -> str:
+    return token[1:-1].replace("''", "'")
+
+
+def _cypher_string(token: str) -> str:
+    body, value, i = token[1:-1], [], 0
+    while i < len(body):
+        if body[i] != "\\":
+            value.append(body[i])
+            i += 1
+            continue
+        escaped = body[i + 1:i + 2]
+        if escaped == "u" and re.fullmatch(r"[0-9a-fA-F]{4}", body[i + 2:i + 6]):
+            value.append(chr(int(body[i + 2:i + 6], 16)))
+            i += 6
+        elif escaped in _CYPHER_ESCAPES:
+            value.append(_CYPHER_ESCAPES[escaped])
+            i += 2
+        else:
+            raise _Unsupported(f"escape \\{escaped}")
+    return "".join(value)
+
+
+def _number(token: str):
+    return int(token) if token.isdigit() else float(token)
+
+
+def _rewrite(query: str, tokens, clauses: set, bound_clauses: set, unquote, placeholder) -> tuple:
+    """Shared scanner: returns (template, literal values in order)."""
+    parts, values = [], []
+    clause, clause_stack = None, []
+    previous = None  # Last significant token, as (kind, text)
+    for match in tokens.finditer(query):
+        kind, text = match.lastgroup, match.group()
+        if kind == "placeholder":
+            raise _Unsupported("the query already has parameters")
+        if kind == "other" and text in "'\"`":
+            raise _Unsupported("unterminated quote")
+        if kind == "word" and text.lower() in clauses:
+            clause = text.lower()
+        elif text == "(":
+            clause_stack.append(clause)
+        elif text == ")" and clause_stack:
+            clause = clause_stack.pop()
+
+        bound = clause in bound_clauses and (
+            kind == "string" or (kind == "number" and previous is not None and previous[0] == "operator"))
+        if bound:
+            values.append(unquote(text) if kind == "string" else _number(text))
+            parts.append(placeholder(len(values) - 1))
+        else:
+            parts.append(text)
+        if kind != "comment" and not text.isspace():
+            previous = (kind, text)
+    return "".join(parts), values
+
+
+def parameterize_sql(query: str) -> tuple:
+    """
+    (template, params) for a SQLite query: string literals, and numbers compared with an
+    operator, in WHERE/ON/HAVING become `?` placeholders. Returns (query, ()) when there is
+    nothing to bind or the query is not understood.
+    """
+    if not QUERY_PARAMETERIZATION_ENABLED or not query:
+        return query, ()
+    try:
+        template, values = _rewrite(query, _SQL_TOKENS, _SQL_CLAUSES, _SQL_BOUND_CLAUSES,
+                                    _sql_string, lambda index: "?")
+    except _Unsupported:
+        return query, ()
+    return template, tuple(values)
+
+
+def parameterize_cypher(query: str) -> tuple:
+    """
+    (template, params) for a Cypher query: string literals, and numbers compared with an
+    operator or given as a map value, in MATCH/WHERE/UNWIND become `$p0`, `$p1`, ...
+    Returns (query, {}) when there is nothing to bind or the query is not understood.
+    """
+    if not QUERY_PARAMETERIZATION_ENABLED or not query:
+        return query, {}
+    try:
+        template, values = _rewrite(query, _CYPHER_TOKENS, _CYPHER_CLAUSES, _CYPHER_BOUND_CLAUSES,
+                                    _cypher_string, lambda index: f"$p{index}")
+    except _Unsupported:
+        return query, {}
+    return template, {f"p{index}": value for index, value in enumerate(values)}
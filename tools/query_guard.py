@@ -0,0 +1,219 @@
+# tools/query_guard.py
+#
+# Pre-flight check of a generated query, run by the query executor before the query itself:
+# the backend's planner (SQLite EXPLAIN QUERY PLAN, Cypher EXPLAIN, MongoDB explain) estimates
+# how many rows the query examines. Queries above QUERY_GUARD_MAX_ROWS are rejected and go to
+# the refiner with the plan as feedback; unbounded queries above QUERY_GUARD_LIMIT_ABOVE get a
+# LIMIT. If the plan cannot be obtained the query runs unchanged and the executor reports any error.
+#
+#   QUERY_GUARD_ENABLED=0   run generated queries without the check
+import logging
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+
+from tools.db_tools import get_mongodb_client, get_neo4j_driver, get_sqlite_connection, parse_mongodb_query
+from tools.parameterize import parameterize_cypher, parameterize_sql
+
+logger = logging.getLogger(__name__)
+
+# --- Query Guard Settings ---
+QUERY_GUARD_ENABLED = os.getenv("QUERY_GUARD_ENABLED", "1") == "1"
+QUERY_GUARD_MAX_ROWS = 1_000_000    # Estimated rows examined above which a query is rejected
+QUERY_GUARD_LIMIT_ABOVE = 10_000    # Estimated rows above which a query without LIMIT gets one
+QUERY_GUARD_ADDED_LIMIT = 1000      # The LIMIT added; the executor still keeps only MAX_RESULT_ROWS of them
+MONGODB_DATABASE, MONGODB_COLLECTION = "research_db", "papers"
+NEO4J_DATABASE = "myraggraphdb"
+
+# Actions of a GuardVerdict.
+GUARD_RUN = "run"          # Run the query as generated
+GUARD_REWRITE = "rewrite"  # Run verdict.query (the query with a LIMIT added)
+GUARD_REJECT = "reject"    # Do not run; refine the query with verdict.plan as feedback
+
+_LIMIT_CLAUSE = re.compile(r"\blimit\b", re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class GuardVerdict:
+    action: str
+    query: str
+    estimated_rows: int = 0
+    reason: str = ""
+    plan: str = ""
+
+    def feedback(self) -> str:
+        """What the refiner is told about a rejected query."""
+        return f"Query rejected before execution: {self.reason}\nQuery plan:\n{self.plan}"
+
+
+def _verdict(query: str, estimated_rows: int, plan: str, can_limit: bool, append_limit) -> GuardVerdict:
+    if estimated_rows > QUERY_GUARD_MAX_ROWS:
+        return GuardVerdict(GUARD_REJECT, query, estimated_rows,
+                            f"the plan examines about {estimated_rows:,} rows (limit {QUERY_GUARD_MAX_ROWS:,}). "
+                            "Add selective conditions or join on keys instead of scanning or cross-joining.", plan)
+    if estimated_rows > QUERY_GUARD_LIMIT_ABOVE and can_limit:
+        return GuardVerdict(GUARD_REWRITE, append_limit(query), estimated_rows,
+                            f"about {estimated_rows:,} rows; added LIMIT {QUERY_GUARD_ADDED_LIMIT}", plan)
+    return GuardVerdict(GUARD_RUN, query, estimated_rows, plan=plan)
+
+
+def _append_limit(query: str) -> str:
+    return f"{query.strip().rstrip(';').rstrip()} LIMIT {QUERY_GUARD_ADDED_LIMIT};"
+
+
+# --- SQLite ---
+def _sqlite_table_rows(conn, name: str, query: str, tables: set) -> int:
+    """Row estimate for a table (or table alias) named in a plan step; MAX(rowid) avoids counting."""
+    if name not in tables:
+        # Plans name tables by their alias: "FROM employees AS T1" -> "SCAN T1"
+        match = re.search(rf"\b(\w+)\s+(?:AS\s+)?{re.escape(name)}\b", query, re.IGNORECASE)
+        if not match or match.group(1) not in tables:
+            return 0
+        name = match.group(1)
+    try:
+        rows = conn.execute(f'SELECT MAX(_rowid_) FROM "{name}"').fetchone()[0]
+    except Exception: # WITHOUT ROWID tables
+        rows = conn.execute(f'SELECT COUNT(*) FROM "{name}"').fetchone()[0]
+    return rows or 0
+
+
+def check_sqlite_query(query: str) -> GuardVerdict:
+    """
+    Estimate: the product of the scanned tables' sizes per nested loop (steps sharing a
+    parent), summed over subqueries; correlated subqueries multiply with their outer loop.
+    Indexed SEARCH steps count as one row.
+    """
+    template, params = parameterize_sql(query)
+    conn = get_sqlite_connection()
+    try:
+        steps = conn.execute(f"EXPLAIN QUERY PLAN {template}", params).fetchall()
+        tables = {row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'")}
+        loop_rows = defaultdict(lambda: 1)  # parent id -> rows of the nested loop under it
+        for step_id, parent, _, detail in steps:
+            scan = re.match(r"SCAN (\w+)", detail)
+            rows = 1
+            if scan and scan.group(1) != "CONSTANT":
+                rows = max(_sqlite_table_rows(conn, scan.group(1), query, tables), 1)
+            loop_rows[parent] *= rows
+    finally:
+        conn.close()
+
+    correlated = {step_id: parent for step_id, parent, _, detail in steps if detail.startswith("CORRELATED")}
+    estimated_rows = 0
+    for parent, rows in loop_rows.items():
+        if parent in correlated:
+            rows *= loop_rows.get(correlated[parent], 1)
+        estimated_rows += rows
+    depth = {}
+    lines = []
+    for step_id, parent, _, detail in steps:
+        depth[step_id] = depth.get(parent, -1) + 1
+        lines.append(f"{'  ' * depth[step_id]}{detail}")
+    can_limit = re.match(r"\s*(SELECT|WITH)\b", template, re.IGNORECASE) is not None \
+        and not _LIMIT_CLAUSE.search(template)
+    return _verdict(query, estimated_rows, "\n".join(lines), can_limit, _append_limit)
+
+
+# --- MongoDB ---
+def _mongodb_stages(plan: dict):
+    if not isinstance(plan, dict):
+        return
+    if "stage" in plan:
+        yield plan["stage"]
+    for key in ("queryPlan", "inputStage"):
+        yield from _mongodb_stages(plan.get(key))
+    for child in plan.get("inputStages", []):
+        yield from _mongodb_stages(child)
+
+
+def check_mongodb_query(query_str: str) -> GuardVerdict:
+    """A collection scan examines every document; index scans are not limited here."""
+    try:
+        query_dict = parse_mongodb_query(query_str)
+    except (ValueError, SyntaxError):
+        return GuardVerdict(GUARD_RUN, query_str) # The executor reports the parse error
+    database = get_mongodb_client()[MONGODB_DATABASE]
+    explained = database.command("explain", {"find": MONGODB_COLLECTION, "filter": query_dict},
+                                 verbosity="queryPlanner")
+    stages = list(_mongodb_stages(explained.get("queryPlanner", {}).get("winningPlan", {})))
+    estimated_rows = 0
+    if "COLLSCAN" in stages:
+        estimated_rows = database[MONGODB_COLLECTION].estimated_document_count()
+    # The executor already caps the documents it fetches, so there is nothing to add a limit to
+    return _verdict(query_str, estimated_rows, " <- ".join(stages), False, None)
+
+
+# --- Neo4j ---
+def _neo4j_operators(plan: dict, depth: int = 0):
+    yield depth, plan
+    for child in plan.get("children", []):
+        yield from _neo4j_operators(child, depth + 1)
+
+
+def check_neo4j_query(cypher_query: str) -> GuardVerdict:
+    """Estimate: the largest EstimatedRows of any operator in the EXPLAIN plan."""
+    template, params = parameterize_cypher(cypher_query)
+    with get_neo4j_driver().session(database=NEO4J_DATABASE) as session:
+        plan = session.run(f"EXPLAIN {template}", params).consume().plan
+    estimated_rows, lines = 0, []
+    for depth, operator in _neo4j_operators(plan or {}):
+        rows = int(operator.get("args", {}).get("EstimatedRows", 0))
+        estimated_rows = max(estimated_rows, rows)
+        lines.append(f"{'  ' * depth}{operator.get('operatorType', '').split('@')[0]} (estimated rows: {rows})")
+    can_limit = re.search(r"\bRETURN\b", template, re.IGNORECASE) is not None \
+        and not re.search(r"\b(LIMIT|UNION)\b", template, re.IGNORECASE)
+    return _verdict(cypher_query, estimated_rows, "\n".join(lines), can_limit, _append_limit)
+
+
+# MeiliSearch searches are already bounded by their `limit`, so they have no check.
+QUERY_GUARDS = {
+    "sqlite": check_sqlite_query,
+    "mongodb": check_mongodb_query,
+    "neo4j": check_neo4j_query,
+}
+
+
+class QueryGuardStats:
+    """Verdicts per backend and action."""
+
+    def __init__(self):
+        self._verdicts = defaultdict(Counter)
+        self._unchecked = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, data_source: str, action: str) -> None:
+        with self._lock:
+            self._verdicts[data_source][action] += 1
+
+    def record_unchecked(self, data_source: str) -> None:
+        with self._lock:
+            self._unchecked[data_source] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"verdicts": {ds: dict(actions) for ds, actions in self._verdicts.items()},
+                    "unchecked": dict(self._unchecked)}
+
+
+guard_stats = QueryGuardStats()
+
+
+def check_query(data_source: str, query: str) -> GuardVerdict:
+    """The guard's verdict for a query; GUARD_RUN when disabled, unsupported or the plan is unavailable."""
+    guard = QUERY_GUARDS.get(data_source)
+    if not QUERY_GUARD_ENABLED or guard is None:
+        return GuardVerdict(GUARD_RUN, query)
+    try:
+        verdict = guard(query)
+    except Exception as e:
+        logger.warning("Could not check the %s query plan (%s); running the query unchecked.", data_source, e)
+        guard_stats.record_unchecked(data_source)
+        return GuardVerdict(GUARD_RUN, query)
+    guard_stats.record(data_source, verdict.action)
+    if verdict.action != GUARD_RUN:
+        logger.info("Query guard (%s): %s, %s", data_source, verdict.action, verdict.reason)
+    logger.debug("Query plan for %s:\n%s", data_source, verdict.plan)
+    return verdict
@@ -0,0 +1,83 @@
+from dataclasses import dataclass, field
+from typing import Any, List, Optional
+
+# Kinds of failure a QueryResult can carry (QueryResult.error_kind).
+ERROR_PARSE = "parse"            # The generated query could not be parsed (e.g. MongoDB filter string)
+ERROR_CONNECTION = "connection"  # The backend could not be reached
+ERROR_EXECUTION = "execution"    # The backend rejected or failed the query
+ERROR_REJECTED = "rejected"      # The query guard refused to run it (plan too expensive); it can be refined
+ERROR_TIMEOUT = "timeout"        # The query was stopped at its time limit (tools/query_timeouts.py)
+
+# Text a tool returns for an empty result, per backend (kept identical to the old string API).
+EMPTY_RESULT_MESSAGES = {
+    "sqlite": "[]",
+    "mongodb": "No documents found matching the query.",
+    "meilisearch": "No documents found matching the search query in MeiliSearch.",
+    "neo4j": "No records found matching the Cypher query in Neo4j.",
+}
+
+# What a row is called in truncation markers.
+ROW_UNITS = {"sqlite": "rows", "mongodb": "documents", "meilisearch": "hits", "neo4j": "records"}
+
+
+def format_result_rows(rows: list, total: int, unit: str = "rows") -> str:
+    """
+    String form of a (possibly capped) result, as returned by the tools. When rows
+    were left out, a truncation marker with the total count is appended so the
+    response generator can say the answer is partial.
+    """
+    if total <= len(rows):
+        return str(rows)
+    return f"{rows}\n[Result truncated: showing the first {len(rows)} of {total} {unit}.]"
+
+
+@dataclass(frozen=True)
+class QueryResult:
+    """
+    Outcome of one database query as it flows from the tools through GraphState.context.
+    `rows` are tuples (SQLite) or dicts (MongoDB, MeiliSearch, Neo4j); `count` is the total
+    number of matching rows, which exceeds len(rows) when the result was capped.
+    Rendered to text only at the edges (LLM prompt, @tool string API) with to_text().
+    """
+    data_source: str
+    rows: List[Any] = field(default_factory=list)
+    columns: Optional[List[str]] = None
+    count: int = 0
+    truncated: bool = False
+    error_kind: Optional[str] = None
+    error: Optional[str] = None
+    elapsed_ms: float = 0.0
+
+    @classmethod
+    def from_rows(cls, data_source, rows, total=None, columns=None, elapsed_ms=0.0):
+        total = len(rows) if total is None else total
+        return cls(data_source, list(rows), columns, total, total > len(rows), elapsed_ms=elapsed_ms)
+
+    @classmethod
+    def failure(cls, data_source, error_kind, message, elapsed_ms=0.0):
+        return cls(data_source, error_kind=error_kind, error=message, elapsed_ms=elapsed_ms)
+
+    @property
+    def is_error(self) -> bool:
+        return self.error_kind is not None
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.is_error and not self.rows
+
+    def to_text(self) -> str:
+        if self.is_error:
+            return self.error
+        if not self.rows:
+            return EMPTY_RESULT_MESSAGES.get(self.data_source, "[]")
+        return format_result_rows(self.rows, self.count, ROW_UNITS.get(self.data_source, "rows"))
+
+    def __str__(self) -> str:
+        return self.to_text()
+
+
+def render_context(context) -> str:
+    """Text form of GraphState.context, whether it holds a QueryResult or a plain string."""
+    if isinstance(context, QueryResult):
+        return context.to_text()
+    return "[]" if context is None else str(context)
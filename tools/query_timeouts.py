@@ -0,0 +1,63 @@
+# tools/query_timeouts.py
+#
+# Time limit of one database query: the backend's own limit, shortened to what is left of the
+# turn's time budget (GraphState.turn_deadline) minus a reserve for writing the answer. Each
+# executor enforces it with the backend's mechanism: a SQLite progress handler, MongoDB
+# maxTimeMS, a Neo4j transaction timeout and an HTTP timeout for MeiliSearch.
+#
+#   QUERY_TIMEOUT_SQLITE=10 QUERY_TIMEOUT_MONGODB=15 QUERY_TIMEOUT_MEILISEARCH=5 QUERY_TIMEOUT_NEO4J=15   (seconds)
+import os
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+# --- Query Timeout Settings ---
+QUERY_TIMEOUTS = {
+    "sqlite": float(os.getenv("QUERY_TIMEOUT_SQLITE", "10")),
+    "mongodb": float(os.getenv("QUERY_TIMEOUT_MONGODB", "15")),
+    "meilisearch": float(os.getenv("QUERY_TIMEOUT_MEILISEARCH", "5")),
+    "neo4j": float(os.getenv("QUERY_TIMEOUT_NEO4J", "15")),
+}
+QUERY_TIMEOUT_DEFAULT = 10.0
+QUERY_TIMEOUT_MIN = 0.5        # Even a nearly spent turn gives its query this long
+RESPONSE_TIME_RESERVE = 5.0    # Seconds of the turn budget kept for the response after the query
+REFINE_MIN_REMAINING = 15.0    # A timed-out query is refined only if the turn has this much time left
+
+
+def remaining_time(deadline: Optional[float]) -> Optional[float]:
+    """Seconds left until the turn deadline, or None if the turn has no deadline."""
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def query_timeout(data_source: str, deadline: Optional[float] = None) -> float:
+    """Seconds the next query on `data_source` may run."""
+    timeout = QUERY_TIMEOUTS.get(data_source, QUERY_TIMEOUT_DEFAULT)
+    remaining = remaining_time(deadline)
+    if remaining is not None:
+        timeout = min(timeout, remaining - RESPONSE_TIME_RESERVE)
+    return max(timeout, QUERY_TIMEOUT_MIN)
+
+
+def can_refine_after_timeout(deadline: Optional[float]) -> bool:
+    remaining = remaining_time(deadline)
+    return remaining is None or remaining >= REFINE_MIN_REMAINING
+
+
+class QueryTimeoutStats:
+    """Queries stopped at their time limit, per backend."""
+
+    def __init__(self):
+        self._timeouts = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, data_source: str) -> None:
+        with self._lock:
+            self._timeouts[data_source] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._timeouts)
+
+
+timeout_stats = QueryTimeoutStats()
@@ -0,0 +1,185 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from tools.cache_utils import cache_path
+from tools.query_result import QueryResult
+from tools.store_versions import add_invalidation_listener, get_store_version
+
+logger = logging.getLogger(__name__)
+
+# --- Result Cache Settings ---
+RESULT_CACHE_MAX_ENTRIES = 512
+# Seconds a result stays fresh, per backend. Support tickets change most often.
+RESULT_CACHE_TTLS = {
+    "sqlite": 600.0,
+    "mongodb": 600.0,
+    "meilisearch": 60.0,
+    "neo4j": 600.0,
+}
+RESULT_CACHE_DEFAULT_TTL = 300.0
+# Optional second tier on disk, shared by processes on the same host (RESULT_CACHE_ON_DISK=1).
+RESULT_CACHE_ON_DISK = os.getenv("RESULT_CACHE_ON_DISK", "0") == "1"
+RESULT_CACHE_FILE = cache_path("result_cache.sqlite")
+
+
+class ResultCache:
+    """
+    Cache of query results keyed by (data_source, exact query text).
+    Entries expire after the backend's TTL and are dropped as soon as the backend's
+    store version changes (populate_db.py -> invalidate_store). The in-memory tier is
+    LRU-bounded; the optional disk tier is a small SQLite file holding results as JSON
+    (results with values JSON cannot represent stay in memory only).
+    """
+
+    def __init__(self, max_entries=RESULT_CACHE_MAX_ENTRIES, ttls=None, on_disk=RESULT_CACHE_ON_DISK,
+                 path=RESULT_CACHE_FILE):
+        self.max_entries = max_entries
+        self.ttls = dict(RESULT_CACHE_TTLS if ttls is None else ttls)
+        self.path = path
+        self._memory = OrderedDict()  # (data_source, query) -> (expires_at, store_version, result)
+        self._lock = threading.Lock()
+        self._disk = self._open_disk() if on_disk else None
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, data_source: str, query: str):
+        """Returns the cached result, or None if absent, expired or invalidated."""
+        key = (data_source, query)
+        version = get_store_version(data_source)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, entry_version, result = entry
+                if expires_at > now and entry_version == version:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return result
+                del self._memory[key]
+
+            result = self._disk_get_locked(key, version, now)
+            if result is not None:
+                self._insert_locked(key, (self._expiry(data_source, now), version, result))
+                self.hits += 1
+                return result
+            self.misses += 1
+            return None
+
+    def put(self, data_source: str, query: str, result) -> None:
+        key = (data_source, query)
+        entry = (self._expiry(data_source, time.time()), get_store_version(data_source), result)
+        with self._lock:
+            self._insert_locked(key, entry)
+            self._disk_put_locked(key, entry)
+
+    def invalidate(self, data_source: str = None) -> None:
+        """Drops cached results for one backend (or all backends)."""
+        with self._lock:
+            for key in [k for k in self._memory if data_source in (None, k[0])]:
+                del self._memory[key]
+            if self._disk is not None:
+                if data_source is None:
+                    self._disk.execute("DELETE FROM results")
+                else:
+                    self._disk.execute("DELETE FROM results WHERE data_source = ?", (data_source,))
+                self._disk.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._memory),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "on_disk": self._disk is not None,
+            }
+
+    # --- Internals ---
+    def _expiry(self, data_source, now):
+        return now + self.ttls.get(data_source, RESULT_CACHE_DEFAULT_TTL)
+
+    def _insert_locked(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _open_disk(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " data_source TEXT, query TEXT, expires_at REAL, store_version INTEGER, result TEXT,"
+            " PRIMARY KEY (data_source, query))"
+        )
+        conn.commit()
+        return conn
+
+    def _disk_get_locked(self, key, version, now):
+        if self._disk is None:
+            return None
+        row = self._disk.execute(
+            "SELECT result FROM results WHERE data_source = ? AND query = ? AND expires_at > ? AND store_version = ?",
+            (key[0], key[1], now, version),
+        ).fetchone()
+        if not row:
+            return None
+        try:
+            return result_from_json(row[0])
+        except (TypeError, ValueError, KeyError) as e:
+            logger.debug("Ignoring unreadable disk cache entry for %s: %s", key[0], e)
+            return None
+
+    def _disk_put_locked(self, key, entry):
+        if self._disk is None:
+            return
+        expires_at, version, result = entry
+        try:
+            payload = result_to_json(result)
+        except (TypeError, ValueError) as e:
+            logger.debug("Keeping %s result in memory only: %s", key[0], e)
+            return
+        self._disk.execute(
+            "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)",
+            (key[0], key[1], expires_at, version, payload),
+        )
+        self._disk.execute("DELETE FROM results WHERE expires_at <= ?", (time.time(),))
+        self._disk.commit()
+
+
+def result_to_json(result: QueryResult) -> str:
+    """Disk form of a QueryResult; raises TypeError for rows JSON cannot represent."""
+    return json.dumps({
+        "data_source": result.data_source,
+        "rows": result.rows,
+        "total": result.count,
+        "columns": result.columns,
+        "error_kind": result.error_kind,
+        "message": result.error,
+    })
+
+
+def result_from_json(payload: str) -> QueryResult:
+    data = json.loads(payload)
+    if data["error_kind"] is not None:
+        return QueryResult.failure(data["data_source"], data["error_kind"], data["message"])
+    rows = data["rows"]
+    if data["data_source"] == "sqlite":
+        rows = [tuple(row) for row in rows]  # JSON has no tuples; SQLite rows are tuples in memory
+    return QueryResult.from_rows(data["data_source"], rows, data["total"], data["columns"])
+
+
+# Process-wide instance used by the query executor.
+result_cache = ResultCache()
+add_invalidation_listener(result_cache.invalidate)
+
+
+def invalidate_results(data_source: str = None) -> None:
+    """Invalidation API: drops cached results for a backend in this process."""
+    result_cache.invalidate(data_source)
@@ -0,0 +1,232 @@
+# tools/schema_cache.py
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from tools.db_tools import (
+    describe_sqlite_schema, get_meilisearch_client, get_mongodb_client, get_neo4j_driver,
+    get_sqlite_schema_version,
+)
+from tools.store_versions import add_invalidation_listener, get_store_version
+
+logger = logging.getLogger(__name__)
+
+# --- Schema Cache Settings ---
+# Seconds between change checks for the remote stores. SQLite is checked on every call:
+# PRAGMA schema_version is a local read of the database header.
+SCHEMA_CHECK_INTERVAL = 30.0
+MONGODB_SCHEMA_SAMPLE_SIZE = 20   # Documents sampled to infer the MongoDB field types
+MONGODB_DATABASE, MONGODB_COLLECTION = "research_db", "papers"
+MEILISEARCH_INDEX = "support_tickets"
+NEO4J_DATABASE = "myraggraphdb"
+
+# Used when a store cannot be introspected (e.g. it is down), so prompts still get a description.
+FALLBACK_SCHEMAS = {
+    "mongodb": (
+        "MongoDB 'papers' collection fields: title (string), authors (list of strings), "
+        "year (integer), topic (string), keywords (list of strings), "
+        "publication (nested object with 'journal' and 'type' string fields)."
+    ),
+    "meilisearch": (
+        "MeiliSearch 'support_tickets' index fields: ticket_id (string, primaryKey), "
+        "description (text, searchable), raised_by (string, searchable), status (string, searchable/filterable)."
+    ),
+    "neo4j": (
+        "Neo4j Graph Database: Nodes: Researcher {name, field}, ProjectOrTopic {name, domain}. "
+        "Relationships: (Researcher)-[:COLLABORATES_WITH]->(Researcher), (Researcher)-[:WORKS_ON]->(ProjectOrTopic)."
+    ),
+}
+
+
+# --- MongoDB ---
+def _mongodb_collection():
+    return get_mongodb_client()[MONGODB_DATABASE][MONGODB_COLLECTION]
+
+
+def mongodb_schema_token():
+    # Collection metadata only; no documents are read
+    return _mongodb_collection().estimated_document_count()
+
+
+def _bson_type(value) -> str:
+    if isinstance(value, bool):
+        return "boolean"
+    if isinstance(value, int):
+        return "integer"
+    if isinstance(value, float):
+        return "number"
+    if isinstance(value, str):
+        return "string"
+    if isinstance(value, list):
+        item_types = sorted({_bson_type(item) for item in value})
+        return f"list of {'/'.join(item_types)}s" if item_types else "list"
+    if value is None:
+        return "null"
+    return type(value).__name__
+
+
+def _collect_field_types(document: dict, field_types: dict, prefix: str = "") -> None:
+    for key, value in document.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            _collect_field_types(value, field_types, f"{path}.")
+        else:
+            field_types[path].add(_bson_type(value))
+
+
+def describe_mongodb_schema() -> str:
+    """Field paths and types inferred from a random sample of documents."""
+    documents = list(_mongodb_collection().aggregate([
+        {"$sample": {"size": MONGODB_SCHEMA_SAMPLE_SIZE}}, {"$project": {"_id": 0}},
+    ]))
+    field_types = defaultdict(set)
+    for document in documents:
+        _collect_field_types(document, field_types)
+    fields = ", ".join(f"{path} ({' or '.join(sorted(types))})" for path, types in field_types.items())
+    return (f"MongoDB '{MONGODB_COLLECTION}' collection fields (sampled from {len(documents)} documents; "
+            f"nested fields in dot notation): {fields}.")
+
+
+# --- MeiliSearch ---
+def meilisearch_schema_token():
+    # Changes whenever documents or settings of the index are updated
+    return get_meilisearch_client().get_raw_index(MEILISEARCH_INDEX)["updatedAt"]
+
+
+def describe_meilisearch_schema() -> str:
+    """Index fields (from the index stats) and the searchable/filterable/sortable settings."""
+    client = get_meilisearch_client()
+    index = client.index(MEILISEARCH_INDEX)
+    settings = index.get_settings()
+    # FieldDistribution exposes the field names as attributes
+    fields = sorted(name for name in vars(index.get_stats().field_distribution) if not name.startswith("_"))
+    primary_key = client.get_raw_index(MEILISEARCH_INDEX)["primaryKey"]
+
+    def attributes(name):
+        values = settings.get(name) or []
+        return ", ".join(values) if values else "none"
+
+    return (f"MeiliSearch '{MEILISEARCH_INDEX}' index fields: {', '.join(fields)} (primaryKey: {primary_key}). "
+            f"Searchable attributes: {attributes('searchableAttributes')}. "
+            f"Filterable attributes: {attributes('filterableAttributes')}. "
+            f"Sortable attributes: {attributes('sortableAttributes')}.")
+
+
+# --- Neo4j ---
+def neo4j_schema_token():
+    # Both counts come from Neo4j's count store, without scanning the graph
+    with get_neo4j_driver().session(database=NEO4J_DATABASE) as session:
+        nodes = session.run("MATCH (n) RETURN count(n) AS count").single()["count"]
+        relationships = session.run("MATCH ()-[r]->() RETURN count(r) AS count").single()["count"]
+    return f"{nodes}:{relationships}"
+
+
+def describe_neo4j_schema() -> str:
+    """Node labels with their properties and the relationship patterns between labels."""
+    with get_neo4j_driver().session(database=NEO4J_DATABASE) as session:
+        properties = defaultdict(list)
+        for record in session.run("CALL db.schema.nodeTypeProperties()"):
+            label = ":".join(record["nodeLabels"])
+            if record["propertyName"]:
+                properties[label].append(record["propertyName"])
+        patterns = set()
+        schema = session.run("CALL db.schema.visualization()").single()
+        for relationship in schema["relationships"] if schema else []:
+            start = ":".join(relationship.start_node.labels)
+            end = ":".join(relationship.end_node.labels)
+            patterns.add(f"({start})-[:{relationship.type}]->({end})")
+    nodes = ", ".join(f"{label} {{{', '.join(props)}}}" for label, props in sorted(properties.items()))
+    return f"Neo4j Graph Database: Nodes: {nodes}. Relationships: {', '.join(sorted(patterns))}."
+
+
+# data_source -> (cheap change token, full introspection)
+SCHEMA_PROVIDERS = {
+    "sqlite": (get_sqlite_schema_version, describe_sqlite_schema),
+    "mongodb": (mongodb_schema_token, describe_mongodb_schema),
+    "meilisearch": (meilisearch_schema_token, describe_meilisearch_schema),
+    "neo4j": (neo4j_schema_token, describe_neo4j_schema),
+}
+
+
+class SchemaCache:
+    """
+    Schema descriptions per backend, rebuilt only when the backend changes. A change is
+    detected through a cheap token (SQLite PRAGMA schema_version, MongoDB estimated document
+    count, MeiliSearch index updatedAt, Neo4j node/relationship counts) together with the
+    store version bumped by populate_db.py. Remote tokens are checked at most every
+    SCHEMA_CHECK_INTERVAL seconds.
+    """
+
+    def __init__(self, providers=None, check_interval=SCHEMA_CHECK_INTERVAL):
+        self.providers = dict(SCHEMA_PROVIDERS if providers is None else providers)
+        self.check_interval = check_interval
+        self._entries = {}  # data_source -> (token, store_version, checked_at, description)
+        self._locks = defaultdict(threading.Lock)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.refreshes = 0
+        self.failures = 0
+        add_invalidation_listener(self.invalidate)
+
+    def get(self, data_source: str) -> str:
+        """The schema description of a backend, introspected again only if it changed."""
+        if data_source not in self.providers:
+            return "No schema description available for this data_source."
+        with self._lock:
+            source_lock = self._locks[data_source]
+        # One refresh per backend at a time; other callers wait for its result
+        with source_lock:
+            entry = self._entries.get(data_source)
+            store_version = get_store_version(data_source)
+            now = time.monotonic()
+            if entry is not None and entry[1] == store_version and \
+                    data_source != "sqlite" and now - entry[2] < self.check_interval:
+                return self._hit(entry[3])
+
+            token_of, describe = self.providers[data_source]
+            try:
+                token = token_of()
+                if entry is not None and entry[0] == token and entry[1] == store_version:
+                    self._entries[data_source] = (token, store_version, now, entry[3])
+                    return self._hit(entry[3])
+                description = describe()
+            except Exception as e:
+                logger.warning("Could not introspect the %s schema (%s); using the built-in description.", data_source, e)
+                with self._lock:
+                    self.failures += 1
+                description = FALLBACK_SCHEMAS.get(data_source, f"Could not retrieve {data_source} schema: {e}")
+                # Kept until the next check, so a store that is down is not asked again on every call
+                self._entries[data_source] = (None, store_version, now, description)
+                return description
+
+            logger.info("Schema cache refreshed for %s.", data_source)
+            with self._lock:
+                self.refreshes += 1
+            self._entries[data_source] = (token, store_version, now, description)
+            return description
+
+    def _hit(self, description: str) -> str:
+        with self._lock:
+            self.hits += 1
+        return description
+
+    def invalidate(self, data_source: str = None) -> None:
+        """Drops the cached description of one backend (or of all)."""
+        with self._lock:
+            if data_source is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(data_source, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "refreshes": self.refreshes, "failures": self.failures,
+                    "cached": sorted(self._entries)}
+
+
+schema_cache = SchemaCache()
+
+
+def get_cached_schema(data_source: str) -> str:
+    return schema_cache.get(data_source)
@@ -0,0 +1,60 @@
+import logging
+import os
+import threading
+
+from tools.cache_utils import cache_path, load_json, save_json_atomic
+
+logger = logging.getLogger(__name__)
+
+# Per-backend generation counters, shared between processes through a small JSON file.
+# database/populate_db.py bumps a backend's counter whenever it rebuilds that store,
+# which invalidates every cache entry derived from the old contents.
+STORE_VERSIONS_FILE = cache_path("store_versions.json")
+
+_lock = threading.Lock()
+_versions = {}
+_loaded_mtime = None
+_listeners = []
+
+
+def _reload_if_changed_locked():
+    global _versions, _loaded_mtime
+    try:
+        mtime = os.stat(STORE_VERSIONS_FILE).st_mtime_ns
+    except FileNotFoundError:
+        mtime = None
+    if mtime != _loaded_mtime:
+        _versions = load_json(STORE_VERSIONS_FILE, {}) if mtime is not None else {}
+        _loaded_mtime = mtime
+
+
+def get_store_version(data_source: str) -> int:
+    """Current generation of a backend's data. Cheap: one stat() call unless the file changed."""
+    with _lock:
+        _reload_if_changed_locked()
+        return int(_versions.get(data_source, 0))
+
+
+def invalidate_store(data_source: str) -> int:
+    """
+    Marks a backend's data as changed: bumps its generation (visible to other processes)
+    and notifies in-process caches so they can drop their entries right away.
+    """
+    global _loaded_mtime
+    with _lock:
+        _reload_if_changed_locked()
+        _versions[data_source] = int(_versions.get(data_source, 0)) + 1
+        new_version = _versions[data_source]
+        save_json_atomic(STORE_VERSIONS_FILE, _versions)
+        _loaded_mtime = os.stat(STORE_VERSIONS_FILE).st_mtime_ns
+        listeners = list(_listeners)
+    logger.info("Invalidated caches for '%s' (store version %s).", data_source, new_version)
+    for listener in listeners:
+        listener(data_source)
+    return new_version
+
+
+def add_invalidation_listener(listener) -> None:
+    """Registers `listener(data_source)` to be called by invalidate_store in this process."""
+    with _lock:
+        _listeners.append(listener)
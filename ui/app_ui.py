@@ -2,19 +2,25 @@
 import sys
 import os
 import streamlit as st
-import ast 
 import pandas as pd 
-import io 
-import contextlib 
 import time 
+import atexit
+import threading
 
 # --- Add the project root to the Python path ---
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
-from graph.builder import app as rag_app 
-from tools.db_tools import get_sqlite_connection, get_schema_sqlite
+from logging_config import LogCapture, configure_logging
+from graph.builder import app as rag_app, GRAPH_RUN_CONFIG
+from graph.state import initial_state
+from tools.db_tools import get_sqlite_connection, close_all_connections
+from tools.schema_cache import get_cached_schema
+from agents.llm_registry import close_llm_clients
+from tools.query_result import QueryResult
+from agents.response_streaming import TokenStreamHandler
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 
 # --- Page Configuration ---
 st.set_page_config(
@@ -23,6 +29,18 @@ st.set_page_config(
     layout="wide"
 )
 
+# --- Connection Pool / LLM Client Shutdown ---
+# Streamlit re-runs this script on every interaction; cache_resource makes sure the
+# shutdown hook is registered only once per server process.
+@st.cache_resource
+def register_connection_shutdown_hook():
+    atexit.register(close_all_connections)
+    atexit.register(close_llm_clients)
+    return True
+
+register_connection_shutdown_hook()
+configure_logging() # The agents' log records are also collected per turn for the processing journey
+
 # --- Session State Initialization ---
 default_session_state = {
     "messages": [], "processing_details": {},
@@ -36,6 +54,22 @@ for key, default_value in default_session_state.items():
 
 # --- UI Component Functions (Merged into this file) ---
 
+def make_streaming_handler(placeholder):
+    """
+    TokenStreamHandler that renders the answer into `placeholder` as tokens arrive.
+    Graph nodes run on worker threads, so each one is attached to this script run first.
+    """
+    script_ctx = get_script_run_ctx()
+    streamed_text = []
+
+    def render_token(token):
+        add_script_run_ctx(threading.current_thread(), script_ctx)
+        streamed_text.append(token)
+        placeholder.markdown("".join(streamed_text) + "▌")
+
+    return TokenStreamHandler(render_token)
+
+
 def display_sidebar():
     st.sidebar.header("About this RAG System")
     st.sidebar.info(
@@ -110,6 +144,18 @@ def display_processing_journey(processing_details_dict):
         else: st.info(f"{emoji} Router decision: {str(chosen_ds).upper()}")
         st.markdown("---")
 
+    fanout_state = details.get("fanout_merger")
+    if fanout_state and isinstance(fanout_state, dict) and fanout_state.get("fanout_branches"):
+        st.subheader("🔀 Speculative Fan-out")
+        st.caption("The routing decision was uncertain, so several backends were queried in parallel:")
+        for branch in fanout_state["fanout_branches"]:
+            branch_result = branch.get("context")
+            if branch.get("error") or not isinstance(branch_result, QueryResult) or branch_result.is_error: outcome = "error"
+            elif branch_result.is_empty: outcome = "no results"
+            else: outcome = f"{branch_result.count} row(s) in {branch_result.elapsed_ms:.0f} ms"
+            st.markdown(f"- **{str(branch.get('data_source')).upper()}**: {outcome} — `{branch.get('generated_query')}`")
+        st.markdown("---")
+
     qg_state = details.get("query_generator")
     if qg_state and isinstance(qg_state, dict):
         data_source_for_qg = qg_state.get("data_source", "unknown_ds") 
@@ -140,27 +186,22 @@ def display_processing_journey(processing_details_dict):
     qe_state = details.get("query_executor")
     if qe_state and isinstance(qe_state, dict):
         data_source_for_qe = qe_state.get("data_source", "unknown_ds") 
-        retrieved_context_str = qe_state.get("context", "No context retrieved.") 
+        query_result = qe_state.get("context")
         attempt_count = qe_state.get("refinement_attempt_count", 1)
         if data_source_for_qe not in ["end", "general", "clarification_needed", None]:
             st.subheader(f"3️⃣ Query Execution ({str(data_source_for_qe).upper()} - Attempt {attempt_count})")
             executor_error = qe_state.get("error")
-            no_results_messages = ["No documents found", "No records found", "[]"]
-            is_no_results_str = str(retrieved_context_str)
-            is_no_results = is_no_results_str.strip() in no_results_messages or \
-                            any(msg.lower() in is_no_results_str.lower() for msg in no_results_messages if "no d" in msg.lower() or "no r" in msg.lower())
             if executor_error and "Query and its refinement(s) returned no results." in executor_error:
                  st.warning("No data found even after query refinement.")
             elif executor_error: st.error(f"Execution Error: {executor_error}")
-            elif is_no_results: st.warning("No data found matching the query from the database.")
+            elif not isinstance(query_result, QueryResult) or query_result.is_empty: st.warning("No data found matching the query from the database.")
             else:
-                st.success("Data successfully retrieved!")
+                st.success(f"Data successfully retrieved! {query_result.count} row(s) in {query_result.elapsed_ms:.0f} ms"
+                           + (f" (showing the first {len(query_result.rows)})" if query_result.truncated else ""))
                 with st.popover("View Raw Retrieved Data (JSON/Text)"):
-                    try:
-                        parsed_context = ast.literal_eval(is_no_results_str) 
-                        if isinstance(parsed_context, list) and not parsed_context: st.warning("Retrieved context was an empty list.")
-                        else: st.json(parsed_context) 
-                    except: st.text(is_no_results_str) 
+                    if query_result.columns and all(isinstance(row, (tuple, list)) for row in query_result.rows):
+                        st.dataframe(pd.DataFrame(query_result.rows, columns=query_result.columns))
+                    else: st.json(query_result.rows) 
             st.markdown("---")
     
     rg_state = details.get("response_generator")
@@ -172,7 +213,7 @@ def display_processing_journey(processing_details_dict):
 def display_sqlite_for_normal_user(): st.markdown("DB info: Employees, Departments, Projects. Ask about roles, project statuses, etc.")
 def display_sqlite_for_pro_user():
     st.subheader("SQLite Schema & Sample Data")
-    try: st.text(get_schema_sqlite.invoke({}))
+    try: st.text(get_cached_schema("sqlite"))
     except Exception as e: st.error(f"SQLite schema error: {e}")
     st.markdown("---"); st.write("Sample Data (First 5 Rows per Table):")
     conn = None
@@ -262,26 +303,18 @@ if query_to_process_this_run and st.session_state.is_processing:
             accumulated_logs_for_this_run = "" 
             status_updates_for_this_run = []   
 
+            # The answer is rendered here token by token while the response node streams it.
+            answer_placeholder = st.empty()
+            token_handler = make_streaming_handler(answer_placeholder)
+
             with st.status("🚀 Starting RAG process...", expanded=True) as status_ui:
-                log_capture_string = io.StringIO()
-                with contextlib.redirect_stdout(log_capture_string):
+                with LogCapture() as log_capture:
                     try: 
-                        inputs = {
-                            "query": query_to_process_this_run, "data_source": None, "generated_query": None,
-                            "context": None, "response": None, "error": None,
-                            "original_user_query": query_to_process_this_run,
-                            "initial_generated_query": None, "last_failed_query": None,
-                            "needs_query_refinement": False, "refinement_attempt_count": 0,
-                            "clarification_question_needed": False, "clarification_question_text": None,
-                            "user_clarification_response": None, "original_query_before_clarification": None
-                        }
+                        inputs = initial_state(query_to_process_this_run)
                         final_graph_state = None
                         
-                        for output_chunk in rag_app.stream(inputs, {"recursion_limit": 25}):
-                            new_logs = log_capture_string.getvalue()
-                            if new_logs:
-                                accumulated_logs_for_this_run += new_logs
-                                log_capture_string.seek(0); log_capture_string.truncate(0)
+                        for output_chunk in rag_app.stream(inputs, {**GRAPH_RUN_CONFIG, "callbacks": [token_handler]}):
+                            accumulated_logs_for_this_run += log_capture.drain()
                             
                             for node_name, node_data in output_chunk.items():
                                 status_message = f"Finished node: {node_name}"
@@ -290,6 +323,9 @@ if query_to_process_this_run and st.session_state.is_processing:
                                 elif node_name == "query_refiner": status_message = "✨ Query Refiner: Refining..."
                                 elif node_name == "query_executor": status_message = f"⏳ Executor: Attempt {node_data.get('refinement_attempt_count', 1) if isinstance(node_data, dict) else 1} done"
                                 elif node_name == "response_generator": status_message = "✍️ Response Gen: Formulating..."
+                                elif node_name == "context_compactor": status_message = f"🗜️ Compactor: {(node_data.get('context_stats') or {}).get('compression_ratio', 1.0) if isinstance(node_data, dict) else 1.0}x smaller context"
+                                elif node_name == "fanout": status_message = f"🔀 Fan-out: Tried {len(node_data.get('fanout_branches') or []) if isinstance(node_data, dict) else 0} backend(s) in parallel"
+                                elif node_name == "fanout_merger": status_message = f"🔀 Fan-out: Kept {node_data.get('data_source') if isinstance(node_data, dict) else 'N/A'}"
                                 
                                 status_ui.update(label=status_message)
                                 st.session_state.processing_details.setdefault("status_history", []).append(status_message)
@@ -297,8 +333,7 @@ if query_to_process_this_run and st.session_state.is_processing:
                                 if isinstance(node_data, dict): st.session_state.processing_details[node_name] = node_data.copy()
                                 final_graph_state = node_data
                         
-                        new_logs = log_capture_string.getvalue() 
-                        if new_logs: accumulated_logs_for_this_run += new_logs
+                        accumulated_logs_for_this_run += log_capture.drain()
                         
                         st.session_state.processing_details["backend_log"] = accumulated_logs_for_this_run
                         st.session_state.processing_details["status_history"] = status_updates_for_this_run 
@@ -324,14 +359,17 @@ if query_to_process_this_run and st.session_state.is_processing:
                         status_ui.update(label=f"⚠️ Error during graph execution: {str(e_graph)}", state="error", expanded=True)
                         final_response_for_display = f"A critical application error occurred during graph processing: {str(e_graph)}"
                         st.session_state.processing_details["application_error"] = str(e_graph)
-                        accumulated_logs_for_this_run += log_capture_string.getvalue()
+                        accumulated_logs_for_this_run += log_capture.drain()
                         st.session_state.processing_details["backend_log"] = accumulated_logs_for_this_run
                         st.session_state.processing_details.setdefault("status_history", []).append(f"ERROR: {str(e_graph)}")
             
-            # This block is now OUTSIDE 'with st.status' and 'with contextlib.redirect_stdout'
+            # This block is now OUTSIDE 'with st.status' and 'with LogCapture()'
             # but still INSIDE 'with st.chat_message("assistant")' and the outer 'try'
             
-            st.markdown(final_response_for_display)
+            answer_placeholder.markdown(final_response_for_display)
+            if token_handler.streamed:
+                st.caption(f"⏱️ First token after {token_handler.time_to_first_token:.2f}s · "
+                           f"full answer after {token_handler.total_time:.2f}s")
             st.session_state.messages.append({"role": "assistant", "content": final_response_for_display})
 
             # If clarification was NOT needed, display the full processing journey